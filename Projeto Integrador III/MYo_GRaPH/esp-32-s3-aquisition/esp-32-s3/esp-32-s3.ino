@@ -11,6 +11,26 @@
   uint8_t selectedPins[maxPins];
   uint8_t channelsToSend = maxPins;  // inicia com todos
 
+  // Formato de saída: texto (valores decimais separados por TAB, uma linha
+  // por amostra) ou binário em quadros. Comandos pela Serial: 't' / 'b'.
+  //
+  // Quadro binário (little-endian):
+  //   0xA5 0x5A | contador u16 | canais u8 | amostras u8 |
+  //   amostras * canais * u16 (intercalado: a0c0 a0c1 ... a1c0 ...) | checksum u16
+  // contador = índice da 1ª amostra do quadro (módulo 65536), para o leitor
+  // detectar perdas; checksum = soma dos bytes do contador até o último
+  // dado (módulo 65536).
+  #define SYNC0 0xA5
+  #define SYNC1 0x5A
+  #define SAMPLES_PER_FRAME 16
+  #define FRAME_HEADER 6
+  const size_t maxFrameBytes = FRAME_HEADER + SAMPLES_PER_FRAME * maxPins * 2 + 2;
+
+  bool binaryMode = false;
+  uint8_t frameBuf[maxFrameBytes];
+  uint8_t frameSamples = 0;     // amostras já no quadro em montagem
+  uint16_t sampleCounter = 0;   // índice da próxima amostra
+
   // Flag disparada pela ISR quando uma nova amostra está pronta
   volatile bool adc_conversion_done = false;
   adc_continuous_data_t * result = nullptr;
@@ -34,13 +54,17 @@
       &adcComplete
     );
     analogContinuousStart();
+    frameSamples = 0;           // quadro em montagem era do nº de canais anterior
   }
 
-  // Lê da Serial se o usuário digitou '1', '2' ou '3'
+  // Lê da Serial se o usuário digitou '1', '2' ou '3' (canais) ou 't'/'b' (formato)
   void processSerialInput() {
     while (Serial.available()) {  
       char c = Serial.read();
-      if (c >= '1' && c <= '0' + maxPins) {
+      if (c == 'b' || c == 't') {
+        binaryMode = (c == 'b');
+        frameSamples = 0;
+      } else if (c >= '1' && c <= '0' + maxPins) {
         uint8_t n = c - '0';
         if (n != channelsToSend) {
           channelsToSend = n;
@@ -50,6 +74,34 @@
     }
   }
 
+  // Acrescenta uma amostra (todos os canais) ao quadro e o envia quando completo
+  void pushSample(adc_continuous_data_t *r) {
+    if (frameSamples == 0) {
+      frameBuf[0] = SYNC0;
+      frameBuf[1] = SYNC1;
+      frameBuf[2] = sampleCounter & 0xFF;
+      frameBuf[3] = sampleCounter >> 8;
+      frameBuf[4] = channelsToSend;
+    }
+    size_t pos = FRAME_HEADER + (size_t)frameSamples * channelsToSend * 2;
+    for (uint8_t i = 0; i < channelsToSend; i++) {
+      uint16_t v = r[i].avg_read_raw;
+      frameBuf[pos++] = v & 0xFF;
+      frameBuf[pos++] = v >> 8;
+    }
+    sampleCounter++;
+    if (++frameSamples < SAMPLES_PER_FRAME) return;
+
+    frameBuf[5] = frameSamples;
+    uint16_t sum = 0;
+    for (size_t k = 2; k < pos; k++) sum += frameBuf[k];
+    frameBuf[pos++] = sum & 0xFF;
+    frameBuf[pos++] = sum >> 8;
+    // um único write por quadro em vez de um print por valor
+    Serial.write(frameBuf, pos);
+    frameSamples = 0;
+  }
+
   void setup() {
     Serial.begin(115200);
     // Configura ADC de 12 bits e atenuação máxima (0–3.6 V)
@@ -68,6 +120,10 @@
 
       // Lê o bloco de resultados (aqui só há 1 conversão por pino)
       if (analogContinuousRead(&result, 0)) {
+        if (binaryMode) {
+          pushSample(result);
+          return;
+        }
         // Imprime imediatamente uma linha com N valores
         for (uint8_t i = 0; i < channelsToSend; i++) {
           Serial.print(result[i].avg_read_raw);
@@ -1,9 +1,14 @@
 import sys
 import os
+import json
+import queue
+import shutil
+import threading
+from datetime import datetime
 import numpy as np
 import soundfile as sf
 import serial
-from collections import deque
+from scipy import signal
 from PyQt5 import QtWidgets, QtCore
 import pyqtgraph as pg
 
@@ -11,38 +16,509 @@ import pyqtgraph as pg
 SERIAL_PORT = "COM7"      # Ajuste para sua porta, ex. "/dev/ttyUSB0"
 BAUDRATE = 115200
 FS = 1000                 # taxa de amostragem esperada (Hz)
-BUFFER_SIZE = 500         # janela deslizante
+WINDOW_S = 10.0           # janela deslizante inicial (s); ajustável na tela
+MAX_WINDOW_S = 120
 PLOT_INTERVAL_MS = 20     # redesenho em ms
 NUM_CANAIS = 3            # máximo suportado pelo ESP32
+SERIAL_PROTOCOL = "binary"  # "binary" (quadros) | "text" (firmware antigo, uma linha por amostra)
+READ_INTERVAL_MS = 5      # pausa entre leituras em bloco (limita sinais para a GUI)
 RECORDINGS_ROOT = "recordings"
+RECORD_FORMAT = "FLAC"    # "FLAC" (contagens inteiras, sem perdas, menor) | "WAV" (float32)
+RECORD_QUEUE_CHUNKS = 2000  # chunks em espera para o disco (~10 s a 5 ms/chunk)
+ADC_PINS = (5, 6, 7)      # adc_pins do firmware, canal 1..3 (vai para o sidecar)
+NOTCH_HZ = 60             # notch digital com o projeto do Duplo-T de simulations/notch_filter:
+NOTCH_Q = 10              #   R=133k, C=20n -> 59.8 Hz; realimentação 3.91k/100R -> Q ~ 10
+BANDPASS_HZ = (20, 450)   # faixa útil do EMG de superfície
+BANDPASS_ORDER = 4        # Butterworth
+HIGHPASS_HZ = 0.5         # Remove DC: passa-altas Butterworth de 2ª ordem
+LOD_BASE = 16             # amostras por balde no nível mais fino da pirâmide de visualização
+LOD_FACTOR = 4            # baldes do nível anterior por balde do seguinte
+LOD_BLOCK = 1 << 18       # amostras lidas por vez ao construir a pirâmide
 
 # Garante existência do diretório de gravações
 os.makedirs(RECORDINGS_ROOT, exist_ok=True)
 
 
+class BinaryFrameDecoder:
+    """Quadros binários do firmware (ver esp-32-s3.ino):
+
+    0xA5 0x5A | contador u16 | canais u8 | amostras u8 | amostras*canais u16 | checksum u16
+
+    feed() recebe os bytes lidos e devolve as amostras dos quadros completos
+    como array (amostras, canais). Quadros consecutivos do mesmo tamanho são
+    validados e convertidos de uma vez com np.frombuffer; bytes inválidos são
+    descartados até o próximo sync.
+    """
+    SYNC = b"\xA5\x5A"
+    HEADER = 6
+
+    def __init__(self):
+        self.buf = bytearray()
+        self.next_counter = None
+        self.lost = 0           # amostras perdidas (saltos do contador)
+        self.bad = 0            # quadros com checksum inválido
+
+    def feed(self, data):
+        self.buf += data
+        chunks = []
+        pos = 0
+        buf = self.buf
+        while True:
+            start = buf.find(self.SYNC, pos)
+            if start < 0:
+                # pode ter sobrado o primeiro byte do sync
+                pos = len(buf) - 1 if buf.endswith(self.SYNC[:1]) else len(buf)
+                break
+            if len(buf) - start < self.HEADER:
+                pos = start
+                break
+            nch, n = buf[start + 4], buf[start + 5]
+            if not 1 <= nch <= NUM_CANAIS or n == 0:
+                pos = start + 1
+                continue
+            size = self.HEADER + 2 * nch * n + 2
+            count = (len(buf) - start) // size
+            if count == 0:
+                pos = start
+                break
+            good, samples = self._decode(start, count, size, nch, n)
+            if samples is not None:
+                chunks.append(samples)
+            if good == count:
+                pos = start + count * size
+            elif good == 0:
+                # o próprio quadro em `start` não confere: pula o sync falso/corrompido
+                self.bad += 1
+                pos = start + 1
+            else:
+                # o seguinte tem outro tamanho (troca de canais) ou é inválido: revalida sozinho
+                pos = start + good * size
+        del buf[:pos]
+        if not chunks:
+            return None
+        if len(chunks) == 1:
+            return chunks[0].astype(np.float64)
+        # troca de nº de canais no meio da leitura: fica o formato mais recente
+        last = chunks[-1].shape[1]
+        return np.concatenate([c for c in chunks if c.shape[1] == last]).astype(np.float64)
+
+    def _decode(self, start, count, size, nch, n):
+        # bloco de `count` quadros contíguos de mesmo tamanho, validados juntos;
+        # devolve quantos são válidos em sequência e as amostras deles (cópia,
+        # para o bytearray poder ser encurtado depois)
+        frames = np.frombuffer(self.buf, np.uint8, count * size, start).reshape(count, size)
+        ok = (frames[:, 0] == 0xA5) & (frames[:, 1] == 0x5A) & \
+             (frames[:, 4] == nch) & (frames[:, 5] == n)
+        csum = frames[:, 2:-2].sum(axis=1, dtype=np.uint32) & 0xFFFF
+        ok &= csum == (frames[:, -2].astype(np.uint32) | (frames[:, -1].astype(np.uint32) << 8))
+        good = count if ok.all() else int(np.argmin(ok))
+        if not good:
+            return 0, None
+        block = frames[:good]
+        counters = block[:, 2].astype(np.int64) | (block[:, 3].astype(np.int64) << 8)
+        self._track(counters, n)
+        return good, block[:, self.HEADER:-2].copy().view("<u2").reshape(good * n, nch)
+
+    def _track(self, counters, n):
+        expected = np.empty_like(counters)
+        expected[0] = counters[0] if self.next_counter is None else self.next_counter
+        expected[1:] = (counters[:-1] + n) & 0xFFFF
+        self.lost += int(((counters - expected) & 0xFFFF).sum())
+        self.next_counter = int(counters[-1] + n) & 0xFFFF
+
+    def reset(self):
+        self.buf.clear()
+        self.next_counter = None
+
+
+class TextLineDecoder:
+    """Firmware em modo texto: linhas com valores separados por TAB."""
+
+    def __init__(self):
+        self.buf = bytearray()
+        self.lost = 0
+        self.bad = 0
+
+    def feed(self, data):
+        self.buf += data
+        end = self.buf.rfind(b"\n")
+        if end < 0:
+            return None
+        lines = self.buf[:end].decode("ascii", errors="ignore").split("\n")
+        del self.buf[:end + 1]
+        rows = []
+        for line in lines:
+            try:
+                rows.append([float(v) for v in line.strip().split("\t")[:NUM_CANAIS]])
+            except ValueError:
+                self.bad += 1
+        # mantém só as linhas com o nº de canais mais recente
+        rows = [r for r in rows if r and len(r) == len(rows[-1])] if rows else []
+        if not rows:
+            return None
+        return np.array(rows, dtype=np.float64)
+
+    def reset(self):
+        self.buf.clear()
+
+
+class FilterChain:
+    """Filtros IIR em série (seções SOS do SciPy) aplicados chunk a chunk.
+
+    O estado das seções (zi, por canal) passa de um chunk para o seguinte,
+    então filtrar em blocos dá o mesmo resultado que filtrar o sinal inteiro:
+    o custo é proporcional às amostras novas, e não à janela, e a saída vale
+    também para a gravação. sosfilt processa todos os canais numa chamada só.
+    Roda na thread do SerialReader; mudar a configuração é trocar o objeto.
+    """
+
+    def __init__(self, fs, notch=False, bandpass=False, highpass=False):
+        sections = []
+        self.stages = []        # descrição, vai para o sidecar da gravação
+        nyq = fs / 2
+        if highpass:
+            sections.append(signal.butter(2, HIGHPASS_HZ, "highpass", fs=fs, output="sos"))
+            self.stages.append(f"passa-altas {HIGHPASS_HZ:g} Hz (ordem 2)")
+        if notch and NOTCH_HZ < nyq:
+            sections.append(signal.tf2sos(*signal.iirnotch(NOTCH_HZ, NOTCH_Q, fs=fs)))
+            self.stages.append(f"notch {NOTCH_HZ:g} Hz (Q={NOTCH_Q:g})")
+        if bandpass:
+            lo, hi = BANDPASS_HZ[0], min(BANDPASS_HZ[1], 0.95 * nyq)
+            if lo < hi:
+                sections.append(signal.butter(BANDPASS_ORDER, (lo, hi), "bandpass", fs=fs, output="sos"))
+                self.stages.append(f"passa-faixa {lo:g}-{hi:g} Hz (ordem {BANDPASS_ORDER})")
+        self.sos = np.concatenate(sections) if sections else None
+        self.zi = None
+
+    def process(self, chunk):
+        """Filtra um chunk (amostras, canais), continuando do estado anterior."""
+        if self.sos is None:
+            return chunk
+        if self.zi is None or self.zi.shape[2] != chunk.shape[1]:
+            # regime permanente para a 1ª amostra: sem o transiente do offset do ADC
+            self.zi = signal.sosfilt_zi(self.sos)[:, :, None] * chunk[0]
+        out, self.zi = signal.sosfilt(self.sos, chunk, axis=0, zi=self.zi)
+        return out
+
+    def reset(self):
+        self.zi = None
+
+
+class ChannelRing:
+    """Últimas `size` amostras de cada canal num array NumPy pré-alocado.
+
+    Cada amostra é gravada duas vezes (posições i e i+size), então a janela
+    inteira é sempre a fatia contígua data[:, head:head+size]: o plot usa essa
+    view direto, sem cópia nem realocação. Mínimo e máximo ficam guardados por
+    blocos de BLOCK amostras (só os blocos tocados por um chunk são
+    recalculados).
+    """
+    BLOCK = 64
+
+    def __init__(self, channels, size):
+        self.channels = channels
+        self.size = size
+        self.nblocks = -(-size // self.BLOCK)
+        self.data = np.zeros((channels, 2 * size))
+        self.bmin = np.zeros((channels, self.nblocks))
+        self.bmax = np.zeros((channels, self.nblocks))
+        self.head = 0           # posição da amostra mais antiga
+        self.count = 0          # amostras recebidas desde o último clear()
+
+    def clear(self):
+        self.data.fill(0.0)
+        self.bmin.fill(0.0)
+        self.bmax.fill(0.0)
+        self.head = 0
+        self.count = 0
+
+    def extend(self, chunk):
+        """Acrescenta um bloco (amostras, canais); canais ausentes recebem 0."""
+        self.count += len(chunk)
+        n = min(len(chunk), self.size)
+        if n == 0:
+            return
+        x = np.zeros((self.channels, n))
+        k = min(chunk.shape[1], self.channels)
+        x[:k] = chunk[-n:, :k].T
+        start = self.head
+        first = min(n, self.size - start)      # até o fim do anel, o resto volta ao início
+        for a, b, src in ((start, start + first, x[:, :first]), (0, n - first, x[:, first:])):
+            if a == b:
+                continue
+            self.data[:, a:b] = src
+            self.data[:, a + self.size:b + self.size] = src
+            self._refresh(a // self.BLOCK, -(-b // self.BLOCK))
+        self.head = (start + n) % self.size
+
+    def _refresh(self, k0, k1):
+        a, b = k0 * self.BLOCK, min(k1 * self.BLOCK, self.size)
+        seg = self.data[:, a:b]
+        full = (b - a) // self.BLOCK
+        if full:
+            v = seg[:, :full * self.BLOCK].reshape(self.channels, full, self.BLOCK)
+            self.bmin[:, k0:k0 + full] = v.min(axis=2)
+            self.bmax[:, k0:k0 + full] = v.max(axis=2)
+        if full * self.BLOCK < b - a:
+            self.bmin[:, k0 + full] = seg[:, full * self.BLOCK:].min(axis=1)
+            self.bmax[:, k0 + full] = seg[:, full * self.BLOCK:].max(axis=1)
+
+    def view(self, c):
+        """Janela do canal c, da amostra mais antiga à mais nova (view, sem cópia)."""
+        return self.data[c, self.head:self.head + self.size]
+
+    def min(self, c):
+        return self.bmin[c].min()
+
+    def max(self, c):
+        return self.bmax[c].max()
+
+    def window(self):
+        """Janela de todos os canais (canais, size), view sem cópia."""
+        return self.data[:, self.head:self.head + self.size]
+
+
+class MinMaxDecimator:
+    """Mínimo e máximo por balde de `bucket` amostras, para plotar janelas
+    longas com ~2 pontos por pixel sem perder picos.
+
+    Os baldes são alinhados ao índice absoluto da amostra (não à janela),
+    então a cada chunk só o balde mais novo muda e os fechados são calculados
+    uma vez, em bloco (reshape + min/max). Como no ChannelRing, cada balde é
+    gravado duas vezes e view() é uma fatia contígua [min0, max0, min1, ...]
+    do mais antigo ao mais novo.
+    """
+
+    def __init__(self, channels, window, bucket, fs):
+        self.channels = channels
+        self.bucket = bucket
+        self.nb = -(-window // bucket) + 1          # + o balde parcial
+        self.out = np.zeros((channels, 4 * self.nb))
+        self.slot = 0                               # balde atual (parcial)
+        self.fill = 0                               # amostras no balde atual
+        self.cur_min = np.full(channels, np.inf)
+        self.cur_max = np.full(channels, -np.inf)
+        # eixo x: início de cada balde em relação ao início do balde atual
+        starts = (np.arange(self.nb) - (self.nb - 1)) * bucket / fs
+        self.x_base = np.repeat(starts, 2)
+        self.x = np.empty_like(self.x_base)
+        self.fs = fs
+
+    @classmethod
+    def from_ring(cls, ring, bucket, fs):
+        """Decimador já com a janela atual do anel."""
+        dec = cls(ring.channels, ring.size, bucket, fs)
+        dec.fill = (ring.count - ring.size) % bucket    # alinha ao índice absoluto
+        dec.extend(ring.window().T)
+        return dec
+
+    def _write(self, first, mins, maxs):
+        # m baldes consecutivos a partir do slot `first`, com a volta do anel
+        slots = (first + np.arange(mins.shape[1])) % self.nb
+        for base in (0, 2 * self.nb):
+            self.out[:, base + 2 * slots] = mins
+            self.out[:, base + 2 * slots + 1] = maxs
+
+    def extend(self, chunk):
+        n = len(chunk)
+        if n == 0:
+            return
+        x = np.zeros((self.channels, n))
+        k = min(chunk.shape[1], self.channels)
+        x[:k] = chunk[:, :k].T
+        B = self.bucket
+        # completa o balde atual
+        take = min(n, B - self.fill)
+        np.minimum(self.cur_min, x[:, :take].min(axis=1), out=self.cur_min)
+        np.maximum(self.cur_max, x[:, :take].max(axis=1), out=self.cur_max)
+        self.fill += take
+        self._write(self.slot, self.cur_min[:, None], self.cur_max[:, None])
+        if self.fill < B:
+            return
+        # baldes completos do chunk, de uma vez
+        full = (n - take) // B
+        if full:
+            blk = x[:, take:take + full * B].reshape(self.channels, full, B)
+            keep = min(full, self.nb)
+            self._write((self.slot + 1 + full - keep) % self.nb,
+                        blk[:, -keep:].min(axis=2), blk[:, -keep:].max(axis=2))
+        self.slot = (self.slot + full + 1) % self.nb
+        # novo balde parcial (resto do chunk)
+        rest = n - take - full * B
+        self.fill = rest
+        if rest:
+            self.cur_min = x[:, n - rest:].min(axis=1)
+            self.cur_max = x[:, n - rest:].max(axis=1)
+            self._write(self.slot, self.cur_min[:, None], self.cur_max[:, None])
+        else:
+            self.cur_min = np.full(self.channels, np.inf)
+            self.cur_max = np.full(self.channels, -np.inf)
+            last = x[:, -1:]
+            self._write(self.slot, last, last)
+
+    def view(self, c):
+        a = 2 * (self.slot + 1)
+        return self.out[c, a:a + 2 * self.nb]
+
+    def xdata(self):
+        """Tempos (s, 0 = amostra mais nova) dos pontos de view()."""
+        return np.subtract(self.x_base, self.fill / self.fs, out=self.x)
+
+
+class RecordingWriter(QtCore.QThread):
+    """Grava os chunks adquiridos em disco numa thread própria.
+
+    submit() é chamado na thread da GUI e nunca bloqueia: o chunk entra numa
+    fila limitada (RECORD_QUEUE_CHUNKS) e, se o disco atrasar a ponto de
+    enchê-la, as amostras são descartadas e contadas em vez de travar a
+    aquisição. A thread escreve um arquivo mono por canal (canal_N.flac/.wav)
+    com soundfile.SoundFile em blocos, na pasta da sessão, mais o sidecar
+    session.json (taxa, mapa de canais, filtros, amostras
+    gravadas/descartadas), atualizado ao final. As amostras chegam já
+    filtradas pela FilterChain do SerialReader.
+    """
+
+    def __init__(self, folder, channels, fs, duration_s=0, fmt=RECORD_FORMAT, filters=()):
+        super().__init__()
+        self.folder = folder
+        self.channels = channels
+        self.fs = fs
+        self.duration_s = duration_s
+        self.target = int(duration_s * fs) if duration_s > 0 else None   # None = até parar
+        self.fmt = fmt.upper()
+        self.subtype = "FLOAT" if self.fmt == "WAV" else "PCM_16"
+        self.ext = ".wav" if self.fmt == "WAV" else ".flac"
+        self.filters = list(filters)
+        self.queue = queue.Queue(maxsize=RECORD_QUEUE_CHUNKS)
+        self._closing = threading.Event()
+        self.started = datetime.now()
+        self.accepted = 0       # amostras por canal entregues a submit() (tempo gravado)
+        self.written = 0        # amostras por canal já em disco
+        self.dropped = 0        # descartadas com a fila cheia
+        self.serial_lost = 0    # perdidas no link serial durante a gravação
+        self.error = None
+
+    def submit(self, chunk):
+        """Enfileira um chunk (amostras, canais); False quando a duração foi atingida."""
+        if self._closing.is_set() or (self.target is not None and self.accepted >= self.target):
+            return False
+        if self.target is not None:
+            chunk = chunk[:self.target - self.accepted]
+        try:
+            self.queue.put_nowait(chunk[:, :self.channels])
+        except queue.Full:
+            self.dropped += len(chunk)
+        self.accepted += len(chunk)
+        return self.target is None or self.accepted < self.target
+
+    def close(self):
+        """Encerra depois de gravar o que já está na fila (não bloqueia)."""
+        self._closing.set()
+
+    def closing(self):
+        return self._closing.is_set()
+
+    def run(self):
+        os.makedirs(self.folder, exist_ok=True)
+        files = []
+        try:
+            for c in range(self.channels):
+                files.append(sf.SoundFile(self._path(c), "w", samplerate=self.fs, channels=1,
+                                          format=self.fmt, subtype=self.subtype))
+            self._sidecar(complete=False)
+            while True:
+                try:
+                    block = self.queue.get(timeout=0.2)
+                except queue.Empty:
+                    if self._closing.is_set():
+                        break
+                    continue
+                if self.subtype == "PCM_16":
+                    # contagens do ADC (12 bits) gravadas como inteiros, sem escala
+                    block = np.clip(np.rint(block), -32768, 32767).astype(np.int16)
+                else:
+                    block = block.astype(np.float32)
+                for c, f in enumerate(files):
+                    f.write(block[:, c] if c < block.shape[1] else np.zeros(len(block), block.dtype))
+                self.written += len(block)
+        except (OSError, RuntimeError) as e:
+            self.error = str(e)
+            self._closing.set()
+        finally:
+            for f in files:
+                f.close()
+            self._sidecar(complete=self.error is None)
+
+    def _path(self, c):
+        return os.path.join(self.folder, f"canal_{c + 1}{self.ext}")
+
+    def _sidecar(self, complete):
+        meta = {
+            "fs": self.fs,
+            "channels": self.channels,
+            "format": self.fmt,
+            "subtype": self.subtype,
+            "units": "contagens do ADC (12 bits)" + (" / 32768 ao ler como float" if self.subtype == "PCM_16" else ""),
+            "channel_map": [{"channel": c + 1, "pin": ADC_PINS[c] if c < len(ADC_PINS) else None,
+                             "file": os.path.basename(self._path(c))} for c in range(self.channels)],
+            "filters": self.filters,
+            "started": self.started.isoformat(timespec="seconds"),
+            "requested_duration_s": self.duration_s or None,
+            "samples_written": self.written,
+            "duration_s": self.written / self.fs,
+            "dropped_samples": self.dropped,
+            "serial_lost_samples": self.serial_lost,
+            "complete": complete,
+            "error": self.error,
+        }
+        tmp = os.path.join(self.folder, "session.json.tmp")
+        with open(tmp, "w", encoding="utf-8") as fh:
+            json.dump(meta, fh, indent=2, ensure_ascii=False)
+        os.replace(tmp, os.path.join(self.folder, "session.json"))
+
+
 class SerialReader(QtCore.QThread):
-    newData = QtCore.pyqtSignal(list)
+    # bloco de amostras: array (amostras, canais)
+    newData = QtCore.pyqtSignal(object)
 
-    def __init__(self, port, baud):
+    def __init__(self, port, baud, protocol=SERIAL_PROTOCOL):
         super().__init__()
         self.ser = serial.Serial(port, baud, timeout=1)
+        self.protocol = protocol
+        self.decoder = BinaryFrameDecoder() if protocol == "binary" else TextLineDecoder()
+        self.filters = FilterChain(FS)      # trocado pela GUI (setFilters)
+        self._commands = queue.SimpleQueue()
         self._running = True
 
+    def command(self, n):
+        """Formato + nº de canais para o firmware ('b'/'t' seguido de '1'..'3').
+
+        Chamado da GUI: só enfileira. run() aplica entre duas leituras, já
+        que porta e decodificador são usados pela thread serial.
+        """
+        self._commands.put(n)
+
+    def _apply(self, n):
+        self.ser.reset_input_buffer()
+        self.decoder.reset()
+        self.filters.reset()             # nº de canais muda o formato do zi
+        mode = "b" if self.protocol == "binary" else "t"
+        self.ser.write(f"{mode}{n}\n".encode())
+
     def run(self):
         while self._running:
             try:
-                raw = self.ser.readline()
-                line = raw.decode('ascii', errors='ignore').strip()
+                while not self._commands.empty():
+                    self._apply(self._commands.get_nowait())
+                # lê tudo o que já chegou (ou espera pelo menos 1 byte)
+                data = self.ser.read(self.ser.in_waiting or 1)
             except (serial.SerialException, PermissionError, OSError):
                 continue
-            if not line:
-                continue
-            parts = line.split('\t')[:NUM_CANAIS]
-            try:
-                vals = [float(v) for v in parts]
-                self.newData.emit(vals)
-            except ValueError:
-                continue
+            if data:
+                chunk = self.decoder.feed(data)
+                if chunk is not None:
+                    self.newData.emit(self.filters.process(chunk))
+            self.msleep(READ_INTERVAL_MS)
 
     def stop(self):
         self._running = False
@@ -50,19 +526,210 @@ class SerialReader(QtCore.QThread):
         self.ser.close()
 
 
+def _read_dtype(info):
+    # formatos inteiros ficam nas unidades do arquivo (contagens do ADC nas gravações FLAC)
+    if info.subtype in ("PCM_16", "PCM_S8", "PCM_U8"):
+        return "int16"
+    if info.subtype.startswith("PCM_"):
+        return "int32"
+    return "float64"
+
+
+def _wav_memmap(path, info):
+    """Amostras de um WAV sem compressão mapeadas em memória, ou None."""
+    dtype = {"FLOAT": "<f4", "DOUBLE": "<f8", "PCM_16": "<i2", "PCM_32": "<i4"}.get(info.subtype)
+    if info.format != "WAV" or dtype is None:
+        return None
+    with open(path, "rb") as fh:
+        head = fh.read(12)
+        if head[:4] != b"RIFF" or head[8:12] != b"WAVE":
+            return None
+        while True:
+            chunk = fh.read(8)
+            if len(chunk) < 8:
+                return None
+            size = int.from_bytes(chunk[4:], "little")
+            if chunk[:4] == b"data":
+                offset = fh.tell()
+                break
+            fh.seek(size + (size & 1), 1)
+    return np.memmap(path, dtype=dtype, mode="r", offset=offset, shape=(info.frames, info.channels))
+
+
+class LodPyramid:
+    """Pirâmide de mínimo/máximo de um arquivo de áudio, em cache no disco.
+
+    Construída numa única passada em blocos (sf.blocks, nunca o arquivo
+    inteiro na memória): o nível 0 tem min/max a cada LOD_BASE amostras e
+    cada nível seguinte junta LOD_FACTOR baldes do anterior. Fica em
+    <arquivo>.lod/ (um .npy por nível, aberto com mmap) e é refeita se o
+    arquivo mudar. query() devolve só o trecho visível no nível em que há
+    ~1 balde por pixel; trechos curtos vêm das amostras originais (memmap no
+    WAV sem compressão, leitura com seek no FLAC).
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.dir = path + ".lod"
+        self.info = sf.info(path)
+        self.sr = self.info.samplerate
+        self.frames = self.info.frames
+        self.channels = self.info.channels
+        self.levels = []        # (amostras por balde, mins, maxs) do mais fino ao mais grosso
+        self._raw = _wav_memmap(path, self.info)
+
+    def _stamp(self):
+        st = os.stat(self.path)
+        return {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "base": LOD_BASE, "factor": LOD_FACTOR}
+
+    def load(self):
+        """Abre o cache se ainda corresponde ao arquivo."""
+        try:
+            with open(os.path.join(self.dir, "meta.json"), encoding="utf-8") as fh:
+                meta = json.load(fh)
+        except (OSError, ValueError):
+            return False
+        if meta.get("stamp") != self._stamp():
+            return False
+        self.levels = [(b, np.load(os.path.join(self.dir, f"min_{k}.npy"), mmap_mode="r"),
+                        np.load(os.path.join(self.dir, f"max_{k}.npy"), mmap_mode="r"))
+                       for k, b in enumerate(meta["buckets"])]
+        return True
+
+    def build(self, progress=None):
+        mins, maxs = [], []
+        done = 0
+        for blk in sf.blocks(self.path, blocksize=LOD_BLOCK, dtype=_read_dtype(self.info), always_2d=True):
+            full = len(blk) // LOD_BASE * LOD_BASE
+            v = blk[:full].reshape(-1, LOD_BASE, self.channels)
+            mins.append(v.min(axis=1).astype(np.float32))
+            maxs.append(v.max(axis=1).astype(np.float32))
+            if full < len(blk):         # só no último bloco
+                mins.append(blk[full:].min(axis=0, keepdims=True).astype(np.float32))
+                maxs.append(blk[full:].max(axis=0, keepdims=True).astype(np.float32))
+            done += len(blk)
+            if progress is not None:
+                progress(int(100 * done / max(1, self.frames)))
+        lo = np.concatenate(mins) if mins else np.zeros((0, self.channels), np.float32)
+        hi = np.concatenate(maxs) if maxs else np.zeros((0, self.channels), np.float32)
+        levels = [(LOD_BASE, lo, hi)]
+        while len(lo) > LOD_FACTOR:
+            pad = (-len(lo)) % LOD_FACTOR
+            lo = np.concatenate([lo, np.repeat(lo[-1:], pad, axis=0)]).reshape(-1, LOD_FACTOR, self.channels).min(axis=1)
+            hi = np.concatenate([hi, np.repeat(hi[-1:], pad, axis=0)]).reshape(-1, LOD_FACTOR, self.channels).max(axis=1)
+            levels.append((levels[-1][0] * LOD_FACTOR, lo, hi))
+
+        tmp = self.dir + ".tmp"
+        shutil.rmtree(tmp, ignore_errors=True)
+        os.makedirs(tmp)
+        for k, (_, lo, hi) in enumerate(levels):
+            np.save(os.path.join(tmp, f"min_{k}.npy"), lo)
+            np.save(os.path.join(tmp, f"max_{k}.npy"), hi)
+        with open(os.path.join(tmp, "meta.json"), "w", encoding="utf-8") as fh:
+            json.dump({"stamp": self._stamp(), "buckets": [b for b, _, _ in levels],
+                       "sr": self.sr, "frames": self.frames, "channels": self.channels}, fh)
+        shutil.rmtree(self.dir, ignore_errors=True)
+        os.replace(tmp, self.dir)
+        self.load()
+
+    def _read_raw(self, i0, i1):
+        if self._raw is not None:
+            return np.asarray(self._raw[i0:i1], dtype=np.float64)
+        with sf.SoundFile(self.path) as f:
+            f.seek(i0)
+            return f.read(i1 - i0, dtype=_read_dtype(self.info), always_2d=True).astype(np.float64)
+
+    def query(self, t0, t1, width):
+        """(x, y[amostras, canais]) do intervalo [t0, t1] s para ~width pixels."""
+        i0 = max(0, int(t0 * self.sr))
+        i1 = min(self.frames, int(np.ceil(t1 * self.sr)) + 1)
+        if i1 <= i0:
+            return np.zeros(0), np.zeros((0, self.channels))
+        span = i1 - i0
+        for bucket, lo, hi in reversed(self.levels):
+            if span // bucket >= width:
+                b0, b1 = i0 // bucket, min(len(lo), -(-i1 // bucket))
+                y = np.empty((2 * (b1 - b0), self.channels))
+                y[0::2] = lo[b0:b1]
+                y[1::2] = hi[b0:b1]
+                x = np.repeat((np.arange(b0, b1) + 0.5) * bucket / self.sr, 2)
+                return x, y
+        # zoom maior que o nível mais fino: amostras originais
+        return np.arange(i0, i1) / self.sr, self._read_raw(i0, i1)
+
+
+class LodBuilder(QtCore.QThread):
+    progress = QtCore.pyqtSignal(int)
+
+    def __init__(self, lod):
+        super().__init__()
+        self.lod = lod
+        self.error = None
+
+    def run(self):
+        try:
+            self.lod.build(self.progress.emit)
+        except (OSError, RuntimeError) as e:
+            self.error = str(e)
+
+
 class AudioPlotWindow(QtWidgets.QWidget):
     def __init__(self, files, folder_name):
         super().__init__()
         self.setWindowTitle(f"MYo_PLoT ({folder_name})")
         layout = QtWidgets.QVBoxLayout(self)
+        self.views = []         # (PlotWidget, LodPyramid, curvas)
+        self.builders = []
+        first = None
         for f in files:
-            data, sr = sf.read(f)
-            t = np.arange(len(data)) / sr
+            lod = LodPyramid(f)
             pw = pg.PlotWidget(title=os.path.basename(f))
-            pw.plot(t, data, pen='b')
             pw.setLabel('bottom', 'Tempo (s)')
             pw.setLabel('left', 'Amplitude')
+            curves = [pw.plot(pen=pg.intColor(c, max(3, lod.channels)) if lod.channels > 1 else 'b')
+                      for c in range(lod.channels)]
+            pw.setXRange(0, lod.frames / lod.sr, padding=0)
+            pw.getViewBox().disableAutoRange(axis=pg.ViewBox.XAxis)
+            if first is None:
+                first = pw
+            else:
+                pw.setXLink(first)
             layout.addWidget(pw)
+            view = (pw, lod, curves)
+            self.views.append(view)
+            pw.getViewBox().sigXRangeChanged.connect(lambda *_, v=view: self.refresh(v))
+            if lod.load():
+                self.refresh(view)
+            else:
+                # primeira abertura: pirâmide construída fora da thread da GUI
+                builder = LodBuilder(lod)
+                builder.progress.connect(lambda pct, pw=pw, f=f: pw.setTitle(f"{os.path.basename(f)} (indexando {pct}%)"))
+                builder.finished.connect(lambda v=view, b=builder, f=f: self.onBuilt(v, b, f))
+                self.builders.append(builder)
+                builder.start()
+
+    def onBuilt(self, view, builder, f):
+        pw = view[0]
+        if builder.error:
+            pw.setTitle(f"{os.path.basename(f)} (erro: {builder.error})")
+            return
+        pw.setTitle(os.path.basename(f))
+        self.refresh(view)
+
+    def refresh(self, view):
+        # só o trecho visível, na resolução da largura do plot
+        pw, lod, curves = view
+        if not lod.levels:
+            return
+        t0, t1 = pw.getViewBox().viewRange()[0]
+        x, y = lod.query(t0, t1, max(1, int(pw.getViewBox().width())))
+        for c, curve in enumerate(curves):
+            curve.setData(x, y[:, c])
+
+    def closeEvent(self, event):
+        for b in self.builders:
+            b.wait()
+        super().closeEvent(event)
 
 
 class MainWindow(QtWidgets.QMainWindow):
@@ -71,11 +738,13 @@ class MainWindow(QtWidgets.QMainWindow):
         self.setWindowTitle("MYo_GRaPH")
         self.dark_mode = False
         self.audio_windows = []
+        self.recorder = None
+        self.rec_lost0 = 0
 
-        # Buffers circulares e eixo de tempo
-        self.buffers = [deque([0.0] * BUFFER_SIZE, maxlen=BUFFER_SIZE)
-                        for _ in range(NUM_CANAIS)]
-        self.t = np.linspace(-BUFFER_SIZE/FS, 0, BUFFER_SIZE)
+        # Buffer circular (canais x janela), eixo de tempo e decimação
+        self.ring = ChannelRing(NUM_CANAIS, int(WINDOW_S * FS))
+        self.t = np.linspace(-self.ring.size/FS, 0, self.ring.size)
+        self.dec = None                   # MinMaxDecimator; criado no redraw conforme a largura
 
         # Thread serial
         try:
@@ -100,7 +769,10 @@ class MainWindow(QtWidgets.QMainWindow):
         cfg.addWidget(self.channel_spin)
         cfg.addSpacing(20)
         self.dc_checkbox = QtWidgets.QCheckBox("Remove DC")
-        cfg.addWidget(self.dc_checkbox)
+        self.notch_checkbox = QtWidgets.QCheckBox(f"Notch {NOTCH_HZ} Hz")
+        self.band_checkbox = QtWidgets.QCheckBox(f"Band-pass {BANDPASS_HZ[0]}-{BANDPASS_HZ[1]} Hz")
+        for w in (self.dc_checkbox, self.notch_checkbox, self.band_checkbox):
+            cfg.addWidget(w)
         cfg.addSpacing(20)
         # Campo para duração em segundos, sem valores negativos
         cfg.addWidget(QtWidgets.QLabel("Duration (s):"))
@@ -108,6 +780,13 @@ class MainWindow(QtWidgets.QMainWindow):
         self.duration_spin.setRange(0, 10000)  # permite de 0 até 10000 segundos
         self.duration_spin.setValue(3)  # valor inicial agora 3 segundos
         cfg.addWidget(self.duration_spin)
+        cfg.addSpacing(20)
+        cfg.addWidget(QtWidgets.QLabel("Window (s):"))
+        self.window_spin = QtWidgets.QDoubleSpinBox()
+        self.window_spin.setRange(0.5, MAX_WINDOW_S)
+        self.window_spin.setDecimals(1)
+        self.window_spin.setValue(WINDOW_S)
+        cfg.addWidget(self.window_spin)
         cfg.addStretch()
         vbox.addLayout(cfg)
 
@@ -121,7 +800,8 @@ class MainWindow(QtWidgets.QMainWindow):
             pw.setLabel('left', 'Amplitude', 'V')
             pw.getAxis('bottom').setStyle(showValues=False)
             pw.setBackground('w')
-            curve = pw.plot(self.t, list(self.buffers[i]), pen='b')
+            pw.setXRange(-self.ring.size/FS, 0, padding=0)
+            curve = pw.plot(self.t, self.ring.view(i), pen='b')
             vbox.addWidget(pw, 1)
             self.plotWidgets.append(pw)
             self.curves.append(curve)
@@ -152,6 +832,9 @@ class MainWindow(QtWidgets.QMainWindow):
 
         # Conexões de sinal
         self.channel_spin.valueChanged.connect(self.changeChannels)
+        self.window_spin.valueChanged.connect(self.setWindow)
+        for w in (self.dc_checkbox, self.notch_checkbox, self.band_checkbox):
+            w.toggled.connect(self.setFilters)
         self.start_btn.clicked.connect(self.start)
         self.stop_btn.clicked.connect(self.stop)
         self.record_btn.clicked.connect(self.record)
@@ -164,7 +847,7 @@ class MainWindow(QtWidgets.QMainWindow):
 
     def open_files(self):
         files, _ = QtWidgets.QFileDialog.getOpenFileNames(
-            self, "Open WAV files", RECORDINGS_ROOT, "WAV Files (*.wav)"
+            self, "Open WAV files", RECORDINGS_ROOT, "Audio Files (*.wav *.flac)"
         )
         if not files:
             return
@@ -174,13 +857,28 @@ class MainWindow(QtWidgets.QMainWindow):
         win.show()
 
     def changeChannels(self, n):
-        self.ser.reset_input_buffer()
-        self.ser.write(f"{n}\n".encode())
+        self.reader.command(n)
+        self.ring.clear()
+        self.dec = None
         for i, pw in enumerate(self.plotWidgets):
-            self.buffers[i].clear()
-            self.buffers[i].extend([0.0] * BUFFER_SIZE)
             pw.setVisible(i < n)
 
+    def setWindow(self, seconds):
+        # novo anel do tamanho da janela, já com as amostras do anterior
+        old = self.ring
+        self.ring = ChannelRing(NUM_CANAIS, max(1, int(seconds * FS)))
+        self.ring.extend(old.window().T)
+        self.t = np.linspace(-self.ring.size/FS, 0, self.ring.size)
+        self.dec = None
+        for pw in self.plotWidgets:
+            pw.setXRange(-self.ring.size/FS, 0, padding=0)
+
+    def setFilters(self):
+        # cadeia nova (estado zerado) entra na thread serial no próximo chunk
+        self.reader.filters = FilterChain(FS, notch=self.notch_checkbox.isChecked(),
+                                          bandpass=self.band_checkbox.isChecked(),
+                                          highpass=self.dc_checkbox.isChecked())
+
     def start(self):
         self.changeChannels(self.channel_spin.value())
         self.plot_timer.start()
@@ -195,31 +893,77 @@ class MainWindow(QtWidgets.QMainWindow):
         self.record_btn.setEnabled(False)
 
     def record(self):
+        # o mesmo botão encerra a gravação (obrigatório com duração 0 = sem limite)
+        if self.recorder is not None:
+            self.stopRecording()
+            return
+        folder = os.path.join(RECORDINGS_ROOT, datetime.now().strftime("%Y%m%d_%H%M%S"))
+        self.recorder = RecordingWriter(folder, self.channel_spin.value(), FS, self.duration_spin.value(),
+                                        filters=self.reader.filters.stages)
+        self.recorder.finished.connect(self.onRecordingFinished)
+        self.rec_lost0 = self.reader.decoder.lost
+        self.recorder.start()
         # Desabilita Start e Stop ao iniciar gravação
         self.start_btn.setEnabled(False)
         self.stop_btn.setEnabled(False)
-        # Aqui você pode usar self.duration_spin.value() para definir a duração
-
-    @QtCore.pyqtSlot(list)
-    def onSerialData(self, vals):
-        for i, v in enumerate(vals):
-            self.buffers[i].append(v)
+        self.channel_spin.setEnabled(False)
+        for w in (self.dc_checkbox, self.notch_checkbox, self.band_checkbox):
+            w.setEnabled(False)           # a gravação inteira com os mesmos filtros
+        self.record_btn.setText("Stop Rec")
+
+    def stopRecording(self):
+        rec = self.recorder
+        rec.serial_lost = self.reader.decoder.lost - self.rec_lost0
+        rec.close()
+        self.record_btn.setEnabled(False)     # volta quando a fila for gravada
+
+    def onRecordingFinished(self):
+        rec, self.recorder = self.recorder, None
+        self.stop_btn.setEnabled(True)
+        self.channel_spin.setEnabled(True)
+        for w in (self.dc_checkbox, self.notch_checkbox, self.band_checkbox):
+            w.setEnabled(True)
+        self.record_btn.setEnabled(True)
+        self.record_btn.setText("Record")
+        msg = f"Gravado {rec.written / FS:.1f} s em {rec.folder}"
+        if rec.dropped:
+            msg += f" ({rec.dropped} amostras descartadas)"
+        self.statusBar().showMessage(msg)
+        if rec.error:
+            QtWidgets.QMessageBox.warning(self, "Erro na gravação", rec.error)
+
+    @QtCore.pyqtSlot(object)
+    def onSerialData(self, chunk):
+        if self.recorder is not None and not self.recorder.submit(chunk):
+            if not self.recorder.closing():
+                self.stopRecording()          # duração atingida
+        self.ring.extend(chunk)
+        if self.dec is not None:
+            self.dec.extend(chunk)
 
     def redrawPlots(self):
         vis = [i for i, pw in enumerate(self.plotWidgets) if pw.isVisible()]
         if not vis:
             return
-        processed = []
+        # janela maior que a largura do plot: min/max por balde (~2 pontos
+        # por pixel), mantidos incrementalmente a cada chunk
+        width = max(1, self.plotWidgets[vis[0]].width())
+        bucket = self.ring.size // width
+        if bucket < 2:
+            self.dec = None
+        elif self.dec is None or self.dec.bucket != bucket:
+            self.dec = MinMaxDecimator.from_ring(self.ring, bucket, FS)
+        x = self.t if self.dec is None else self.dec.xdata()
+
+        # views sem cópia (já filtradas na thread serial); min/max da janela
+        # já mantidos pelo anel
+        y0 = min(self.ring.min(i) for i in vis)
+        y1 = max(self.ring.max(i) for i in vis)
         for i in vis:
-            data = np.array(self.buffers[i])
-            if self.dc_checkbox.isChecked():
-                data = data - data.mean()
-            processed.append(data)
-        all_data = np.hstack(processed)
-        y0, y1 = all_data.min(), all_data.max()
-        for idx, i in enumerate(vis):
             self.plotWidgets[i].setYRange(y0, y1)
-            self.curves[i].setData(self.t, processed[idx])
+            self.curves[i].setData(x, self.ring.view(i) if self.dec is None else self.dec.view(i))
+        if self.recorder is not None and not self.recorder.closing():
+            self.record_btn.setText(f"Stop Rec ({self.recorder.accepted / FS:.0f} s)")
 
     def toggleMode(self):
         self.dark_mode = not self.dark_mode
@@ -234,6 +978,9 @@ class MainWindow(QtWidgets.QMainWindow):
         self.mode_btn.setText("Light Mode" if self.dark_mode else "Dark Mode")
 
     def closeEvent(self, event):
+        if self.recorder is not None:
+            self.stopRecording()
+            self.recorder.wait()
         self.reader.stop()
         super().closeEvent(event)
 
@@ -0,0 +1,337 @@
+#!/usr/bin/env python3
+"""
+Benchmark ponta a ponta do gateway OPC UA ⇆ MQTT.
+
+Sobe, na própria máquina:
+  - um simulador OPC UA (asyncua, processo separado) com N tags Float que
+    mudam a `--rate` Hz, gravadas em lote com SourceTimestamp;
+  - um broker MQTT em processo (amqtt), ou um externo via --broker;
+  - o gateway (src/main.py) como subprocesso, com config gerado
+    (GATEWAY_CONFIG) — o processo medido é só o dele.
+
+Para cada cenário (modo on_change/cyclic x segurança none/sign) mede, na
+janela após o aquecimento:
+  - vazão recebida no broker (msgs/s) e a esperada;
+  - latência SourceTimestamp -> chegada ao assinante (p50/p99/máx, ms);
+  - CPU (% de um núcleo) e pico de RSS do gateway;
+  - descartes/conflações informados pelo /metrics do gateway.
+
+Uso (a partir de TCC/gateway):
+    pip install -r requirements.txt -r bench/requirements.txt
+    python bench/bench.py --tags 1000 --rate 2 --duration 20
+    python bench/bench.py --modes on_change cyclic --security none sign --json bench.json
+
+O amqtt é lento para milhares de msgs/s; para cargas altas use um
+mosquitto local: --broker 127.0.0.1:1883.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import platform
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from datetime import datetime, timezone
+from pathlib import Path
+
+if sys.platform.startswith("win"):
+    asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
+
+import psutil
+import yaml
+from asyncua import Server, ua
+from asyncio_mqtt import Client as MqttClient
+
+GW_DIR = Path(__file__).resolve().parent.parent
+SRC = GW_DIR / "src"
+SENS = "bench/sensores"
+HOST = socket.gethostname()
+SERVER_URI = f"urn:{HOST}:bench-server"
+CLIENT_URI = f"urn:{HOST}:gateway-client"     # o gateway usa este ApplicationUri
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+# ----------------- Certificados (cenário "sign") -----------------
+def make_certs(out: Path) -> dict:
+    from cryptography import x509
+    from cryptography.hazmat.primitives.serialization import Encoding
+    from cryptography.x509.oid import ExtendedKeyUsageOID
+    from asyncua.crypto.cert_gen import (dump_private_key_as_pem, generate_private_key,
+                                         generate_self_signed_app_certificate)
+
+    paths = {}
+    for role, uri, usage in (("server", SERVER_URI, ExtendedKeyUsageOID.SERVER_AUTH),
+                             ("client", CLIENT_URI, ExtendedKeyUsageOID.CLIENT_AUTH)):
+        key = generate_private_key()
+        cert = generate_self_signed_app_certificate(
+            key, f"bench-{role}", {"organizationName": "IFSC"},
+            [x509.UniformResourceIdentifier(uri), x509.DNSName("localhost"), x509.DNSName(HOST)],
+            [usage])
+        paths[f"{role}_key"] = out / f"{role}_key.pem"
+        paths[f"{role}_cert"] = out / f"{role}_cert.pem"
+        paths[f"{role}_key"].write_bytes(dump_private_key_as_pem(key))
+        paths[f"{role}_cert"].write_bytes(cert.public_bytes(Encoding.PEM))
+    return paths
+
+
+# ----------------- Simulador OPC UA -----------------
+async def _simulate(port: int, n_tags: int, rate: float, certs: dict | None, ready, stop):
+    server = Server()
+    await server.init()
+    server.set_endpoint(f"opc.tcp://127.0.0.1:{port}")
+    await server.set_application_uri(SERVER_URI)
+    if certs:
+        await server.load_certificate(str(certs["server_cert"]))
+        await server.load_private_key(str(certs["server_key"]))
+        server.set_security_policy([ua.SecurityPolicyType.NoSecurity,
+                                    ua.SecurityPolicyType.Basic256Sha256_SignAndEncrypt])
+    idx = await server.register_namespace("urn:bench")
+    obj = await server.nodes.objects.add_object(idx, "Bench")
+    nodeids = []
+    for i in range(n_tags):
+        node = await obj.add_variable(ua.NodeId(f"T{i}", idx), f"T{i}", ua.Variant(0.0, ua.VariantType.Float))
+        nodeids.append(node.nodeid)
+
+    async with server:
+        ready.set()
+        loop = asyncio.get_running_loop()
+        period = 1 / rate
+        deadline = loop.time()
+        k = 0
+        while not stop.is_set():
+            k += 1
+            now = datetime.now(timezone.utc)
+            for i, nid in enumerate(nodeids):
+                dv = ua.DataValue(ua.Variant(float(k + i), ua.VariantType.Float), SourceTimestamp=now)
+                await server.write_attribute_value(nid, dv)
+            deadline += period
+            await asyncio.sleep(max(0.0, deadline - loop.time()))
+
+
+def sim_main(port, n_tags, rate, certs, ready, stop):
+    if sys.platform.startswith("win"):
+        asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
+    asyncio.run(_simulate(port, n_tags, rate, certs, ready, stop))
+
+
+# ----------------- Gateway -----------------
+def write_gateway_config(tmp: Path, args, mode: str, opc_port: int, broker: tuple[str, int],
+                         metrics_port: int, certs: dict | None) -> Path:
+    tags = {f"T{i}": {"nodeId": f"ns=2;s=T{i}", "type": "Float", "topic": f"Bench/T{i}"}
+            for i in range(args.tags)}
+    (tmp / "tags.yaml").write_text(yaml.safe_dump(tags), encoding="utf-8")
+    security = "None"
+    if certs:
+        security = f"Basic256Sha256,SignAndEncrypt,{certs['client_cert']},{certs['client_key']}"
+    cfg = {
+        "tags_map": str(tmp / "tags.yaml"),
+        "opcua": {"endpoint": f"opc.tcp://127.0.0.1:{opc_port}", "security": security,
+                  "username": None, "password": None, "keepalive_ms": 10000},
+        "mqtt": {"host": broker[0], "port": broker[1], "qos": 0, "retain": False,
+                 "base_topics": {"sensors": SENS, "commands": "bench/comandos",
+                                 "command_status": "bench/status/comandos"}},
+        "publish_mode": mode,
+        "publish_interval_ms": args.cyclic_ms,
+        "subscription": {"default_publishing_ms": args.publishing_ms},
+        "pipeline": {"maxsize": args.queue, "overflow": "conflate", "workers": 4},
+        "encoding": {"default": "json", "timestamp": "source"},
+        "metrics": {"host": "127.0.0.1", "http_port": metrics_port, "per_tag": False},
+        "outbox": {"enabled": False},
+    }
+    path = tmp / "config.yaml"
+    path.write_text(yaml.safe_dump(cfg), encoding="utf-8")
+    return path
+
+
+def scrape(port: int) -> dict[str, float]:
+    try:
+        body = urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics", timeout=2).read().decode()
+    except OSError:
+        return {}
+    out = {}
+    for line in body.splitlines():
+        if line and not line.startswith("#") and "_bucket" not in line:
+            name, _, value = line.rpartition(" ")
+            out[name.split("{", 1)[0]] = float(value)
+    return out
+
+
+def pct(sorted_vals: list[float], q: float) -> float | None:
+    if not sorted_vals:
+        return None
+    return sorted_vals[min(len(sorted_vals) - 1, int(q * len(sorted_vals)))]
+
+
+def ts_ms(payload: bytes) -> float:
+    ts = json.loads(payload)["ts"]
+    return datetime.fromisoformat(ts.replace("Z", "+00:00")).timestamp() * 1000
+
+
+async def run_scenario(args, mode: str, security: str, broker: tuple[str, int], tmp: Path) -> dict:
+    name = f"{mode}/{security}"
+    certs = make_certs(tmp) if security == "sign" else None
+    opc_port, metrics_port = free_port(), free_port()
+
+    ctx = multiprocessing.get_context("spawn")
+    ready, stop = ctx.Event(), ctx.Event()
+    sim = ctx.Process(target=sim_main, args=(opc_port, args.tags, args.rate, certs, ready, stop),
+                      name="bench-sim", daemon=True)
+    sim.start()
+    if not await asyncio.to_thread(ready.wait, 60):
+        raise RuntimeError("simulador OPC UA não subiu")
+
+    cfg_path = write_gateway_config(tmp, args, mode, opc_port, broker, metrics_port, certs)
+    received: list[tuple[int, bytes]] = []
+    first = asyncio.Event()
+
+    async with MqttClient(*broker) as mqtt:
+        async with mqtt.unfiltered_messages() as messages:
+            await mqtt.subscribe(f"{SENS}/#")
+
+            async def collect():
+                async for msg in messages:
+                    received.append((time.time_ns(), msg.payload))
+                    first.set()
+
+            collector = asyncio.create_task(collect())
+            log = open(tmp / f"gateway-{mode}-{security}.log", "wb")
+            gw = subprocess.Popen([sys.executable, str(SRC / "main.py")], cwd=tmp,
+                                  env={**os.environ, "GATEWAY_CONFIG": str(cfg_path)},
+                                  stdout=log, stderr=subprocess.STDOUT)
+            proc = psutil.Process(gw.pid)
+            try:
+                await asyncio.wait_for(first.wait(), 60)
+                await asyncio.sleep(args.warmup)
+
+                # janela de medição
+                start_idx = len(received)
+                before = scrape(metrics_port)
+                cpu0 = proc.cpu_times()
+                t0 = time.monotonic()
+                rss_peak = 0
+                while time.monotonic() - t0 < args.duration:
+                    rss_peak = max(rss_peak, proc.memory_info().rss)
+                    await asyncio.sleep(0.25)
+                cpu1 = proc.cpu_times()
+                wall = time.monotonic() - t0
+                window = received[start_idx:]
+                after = scrape(metrics_port)
+            finally:
+                gw.terminate()
+                try:
+                    await asyncio.to_thread(gw.wait, 10)
+                except subprocess.TimeoutExpired:
+                    gw.kill()
+                log.close()
+                collector.cancel()
+                stop.set()
+                await asyncio.to_thread(sim.join, 10)
+
+    lat = sorted(arr / 1e6 - ts_ms(p) for arr, p in window)
+    delta = {k: after.get(k, 0) - before.get(k, 0) for k in
+             ("gateway_notifications_total", "gateway_dropped_total",
+              "gateway_conflated_total", "gateway_publish_failed_total")}
+    expected = args.tags * (args.rate if mode == "on_change" else 1000 / args.cyclic_ms)
+    cpu = (cpu1.user + cpu1.system - cpu0.user - cpu0.system) / wall * 100
+    return {
+        "scenario": name, "mode": mode, "security": security,
+        "tags": args.tags, "rate_hz": args.rate,
+        "expected_msgs_s": round(expected, 1),
+        "msgs_s": round(len(window) / wall, 1),
+        "latency_ms": {"p50": pct(lat, 0.50), "p99": pct(lat, 0.99), "max": lat[-1] if lat else None},
+        "cpu_pct": round(cpu, 1),
+        "rss_peak_mb": round(rss_peak / 2**20, 1),
+        "queue_depth_end": after.get("gateway_queue_depth"),
+        "notifications": delta["gateway_notifications_total"],
+        "dropped": delta["gateway_dropped_total"],
+        "conflated": delta["gateway_conflated_total"],
+        "failed": delta["gateway_publish_failed_total"],
+    }
+
+
+def print_table(results: list[dict]) -> None:
+    head = f"{'cenário':<18}{'msgs/s':>10}{'esperado':>10}{'p50 ms':>9}{'p99 ms':>9}" \
+           f"{'máx ms':>9}{'CPU %':>8}{'RSS MB':>8}{'conflat.':>10}{'desc.':>7}"
+    print(head)
+    print("-" * len(head))
+    fmt = lambda v: "-" if v is None else f"{v:.1f}"
+    for r in results:
+        lat = r["latency_ms"]
+        print(f"{r['scenario']:<18}{r['msgs_s']:>10.1f}{r['expected_msgs_s']:>10.1f}"
+              f"{fmt(lat['p50']):>9}{fmt(lat['p99']):>9}{fmt(lat['max']):>9}"
+              f"{r['cpu_pct']:>8.1f}{r['rss_peak_mb']:>8.1f}{r['conflated']:>10.0f}{r['dropped']:>7.0f}")
+
+
+def git_rev() -> str | None:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=GW_DIR,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def main(args):
+    broker_srv = None
+    if args.broker:
+        host, _, port = args.broker.partition(":")
+        broker = (host, int(port or 1883))
+    else:
+        from amqtt.broker import Broker
+        broker = ("127.0.0.1", free_port())
+        broker_srv = Broker({"listeners": {"default": {"type": "tcp", "bind": f"{broker[0]}:{broker[1]}"}},
+                             "sys_interval": 0, "auth": {"allow-anonymous": True}})
+        await broker_srv.start()
+
+    results = []
+    try:
+        for mode in args.modes:
+            for security in args.security:
+                print(f"== {mode}/{security}: {args.tags} tags a {args.rate} Hz, "
+                      f"{args.warmup}+{args.duration} s", flush=True)
+                with tempfile.TemporaryDirectory(prefix="gwbench-") as tmp:
+                    results.append(await run_scenario(args, mode, security, broker, Path(tmp)))
+    finally:
+        if broker_srv is not None:
+            await broker_srv.shutdown()
+
+    print()
+    print_table(results)
+    if args.json:
+        report = {"rev": git_rev(), "python": platform.python_version(), "platform": platform.platform(),
+                  "cpu_count": os.cpu_count(), "args": vars(args), "results": results}
+        Path(args.json).write_text(json.dumps(report, indent=2), encoding="utf-8")
+        print(f"\nResultados em {args.json}")
+
+
+def parse_args(argv=None):
+    ap = argparse.ArgumentParser(description="Benchmark ponta a ponta do gateway OPC UA ⇆ MQTT")
+    ap.add_argument("--tags", type=int, default=500, help="nº de tags simuladas")
+    ap.add_argument("--rate", type=float, default=2.0, help="mudanças por segundo de cada tag")
+    ap.add_argument("--duration", type=float, default=15.0, help="janela de medição (s)")
+    ap.add_argument("--warmup", type=float, default=3.0, help="aquecimento após a 1ª mensagem (s)")
+    ap.add_argument("--modes", nargs="+", default=["on_change", "cyclic"], choices=["on_change", "cyclic"])
+    ap.add_argument("--security", nargs="+", default=["none"], choices=["none", "sign"],
+                    help="sign = Basic256Sha256 SignAndEncrypt com certificados gerados na hora")
+    ap.add_argument("--publishing-ms", type=float, default=100, help="publishing interval (on_change)")
+    ap.add_argument("--cyclic-ms", type=float, default=500, help="período de leitura (cyclic)")
+    ap.add_argument("--queue", type=int, default=10000, help="pipeline.maxsize do gateway")
+    ap.add_argument("--broker", help="host:porta de um broker externo (padrão: amqtt em processo)")
+    ap.add_argument("--json", help="grava os resultados neste arquivo")
+    return ap.parse_args(argv)
+
+
+if __name__ == "__main__":
+    asyncio.run(main(parse_args()))
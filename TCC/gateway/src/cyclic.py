@@ -0,0 +1,98 @@
+"""
+Modo de publicação cíclica (publish_mode: cyclic).
+
+A cada ciclo todas as tags são lidas com Read em lote (um ReadRequest por
+bloco de MaxNodesPerRead, enviados em paralelo) e o lote inteiro vai para a
+fila de publicação. O agendamento usa deadlines absolutos, então o período
+não acumula deriva; ciclos que estouram o prazo são contados e os deadlines
+perdidos são pulados em vez de executados em rajada.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import math
+from typing import Awaitable, Callable
+
+from asyncua import Client, ua
+from loguru import logger
+
+from oplimits import chunked
+
+
+class CyclicReader:
+    def __init__(self, registry, period: float, emit: Callable[..., Awaitable[None]]):
+        self.registry = registry
+        self.period = period
+        self.emit = emit
+        self._chunks: list[tuple[list, list[ua.ReadValueId]]] = []
+
+        # estatísticas
+        self.cycles = 0
+        self.overruns = 0
+        self.skipped = 0
+        self.bad_reads = 0
+        self.last_cycle_s = 0.0
+
+    def prepare(self, max_nodes_per_read: int = 0) -> None:
+        """Monta os ReadValueId uma vez; os ciclos só reenviam os blocos."""
+        self._chunks = []
+        tags = list(self.registry)
+        for block in chunked(tags, max_nodes_per_read):
+            if not block:
+                # chunked() devolve a lista vazia inteira: um Read sem nós
+                # seria respondido com BadNothingToDo
+                continue
+            rvs = []
+            for tag in block:
+                rv = ua.ReadValueId()
+                rv.NodeId = tag.node_id
+                rv.AttributeId = ua.AttributeIds.Value
+                rvs.append(rv)
+            self._chunks.append((list(block), rvs))
+        logger.info(f"Modo cíclico: {len(tags)} tags em {len(self._chunks)} Read(s) "
+                    f"a cada {self.period * 1000:.0f} ms")
+
+    async def _read_chunk(self, client: Client, rvs: list[ua.ReadValueId]) -> list[ua.DataValue]:
+        params = ua.ReadParameters()
+        params.MaxAge = 0
+        params.TimestampsToReturn = ua.TimestampsToReturn.Both
+        params.NodesToRead = rvs
+        return await client.uaclient.read(params)
+
+    async def read_all(self, client: Client) -> list[tuple]:
+        results = await asyncio.gather(*(self._read_chunk(client, rvs) for _, rvs in self._chunks))
+        batch = []
+        for (tags, _), dvs in zip(self._chunks, results):
+            for tag, dv in zip(tags, dvs):
+                if not dv.StatusCode.is_good() or dv.Value is None:
+                    self.bad_reads += 1
+                    continue
+                batch.append((tag, dv.Value.Value, dv))
+        return batch
+
+    async def run(self, client: Client) -> None:
+        loop = asyncio.get_running_loop()
+        deadline = loop.time()
+        while True:
+            start = loop.time()
+            # registry vazio (mapa sem tags, recarga ou descoberta sem
+            # resultado): só espera o período, sem Read
+            batch = await self.read_all(client) if self._chunks else []
+            for tag, value, dv in batch:
+                await self.emit(tag, value, dv)
+            self.cycles += 1
+            now = loop.time()
+            self.last_cycle_s = now - start
+
+            deadline += self.period
+            if now > deadline:
+                # estourou: pula os deadlines perdidos, mantendo a grade fixa
+                missed = math.ceil((now - deadline) / self.period)
+                self.overruns += 1
+                self.skipped += missed
+                deadline += missed * self.period
+                logger.warning(f"Ciclo estourou: {self.last_cycle_s * 1000:.1f} ms "
+                               f"(período {self.period * 1000:.0f} ms, {missed} ciclo(s) pulado(s), "
+                               f"{self.overruns} overruns no total)")
+            await asyncio.sleep(deadline - now)
@@ -0,0 +1,262 @@
+"""
+Descoberta automática de tags por browse do address space OPC UA.
+
+Em vez de escrever cada tag à mão no tags.yaml, o gateway percorre as
+variáveis abaixo dos nós raiz configurados (ex.: PLCData), lê DataType e
+ValueRank em lote e monta o mesmo dicionário do tags.yaml:
+
+    PLCData/Linha1/Temp  ->  PLCData.Linha1.Temp:
+                               nodeId: "ns=4;s=..."
+                               type: Float
+                               topic: PLCData/Linha1/Temp
+
+O browse é feito em largura, um BrowseRequest por nível com vários nós (em
+blocos de MaxNodesPerBrowse), e não um por nó. Mesmo assim, numa symbol
+configuration grande do CODESYS ele leva minutos, então o resultado é
+gravado num índice em cache (JSON) com uma chave calculada a partir do
+NamespaceArray do servidor, da NodeVersion das raízes (quando o servidor a
+expõe), do valor de `version_node` (ex.: uma variável de versão/CRC da
+aplicação do CLP) e da própria configuração da descoberta. Na partida
+seguinte, se a chave bate, o browse é pulado: só essas poucas leituras.
+
+Só variáveis escalares de tipos built-in viram tags; estruturas, arrays e
+tipos próprios do servidor são ignorados (podem ser mapeados à mão no
+tags.yaml, que sempre tem prioridade).
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import time
+from fnmatch import fnmatchcase
+from pathlib import Path
+
+from asyncua import Client, ua
+from loguru import logger
+
+from oplimits import chunked
+
+# DataType (ns=0) -> tipo do tags.yaml (registry.UA_TYPES)
+BUILTIN_TYPES = {
+    ua.ObjectIds.Boolean: "Boolean",
+    ua.ObjectIds.SByte: "SByte",
+    ua.ObjectIds.Byte: "Byte",
+    ua.ObjectIds.Int16: "Int16",
+    ua.ObjectIds.UInt16: "UInt16",
+    ua.ObjectIds.Int32: "Int32",
+    ua.ObjectIds.UInt32: "UInt32",
+    ua.ObjectIds.Int64: "Int64",
+    ua.ObjectIds.UInt64: "UInt64",
+    ua.ObjectIds.Float: "Float",
+    ua.ObjectIds.Double: "Double",
+    ua.ObjectIds.String: "String",
+    ua.ObjectIds.Enumeration: "Int32",
+}
+
+CACHE_VERSION = 1
+_TOPIC_BAD = str.maketrans({c: "_" for c in "/#+ \t"})
+
+
+def _looks_like_nodeid(s: str) -> bool:
+    return s.startswith(("ns=", "nsu=", "i=", "s=", "g=", "b="))
+
+
+def _segment(name: str) -> str:
+    # um nível do tópico MQTT: sem separador nem curingas
+    return name.translate(_TOPIC_BAD) or "_"
+
+
+async def _browse(client: Client, node_ids: list[ua.NodeId], batch: int) -> list[list[ua.ReferenceDescription]]:
+    """Filhos hierárquicos (Objects e Variables) de vários nós, em blocos."""
+    out: list[list[ua.ReferenceDescription]] = []
+    for block in chunked(node_ids, batch):
+        params = ua.BrowseParameters()
+        params.View = ua.ViewDescription()
+        params.RequestedMaxReferencesPerNode = 0
+        for nid in block:
+            desc = ua.BrowseDescription()
+            desc.NodeId = nid
+            desc.BrowseDirection = ua.BrowseDirection.Forward
+            desc.ReferenceTypeId = ua.NodeId(ua.ObjectIds.HierarchicalReferences)
+            desc.IncludeSubtypes = True
+            desc.NodeClassMask = ua.NodeClass.Object | ua.NodeClass.Variable
+            desc.ResultMask = ua.BrowseResultMask.All
+            params.NodesToBrowse.append(desc)
+        for res in await client.uaclient.browse(params):
+            refs = list(res.References) if res.StatusCode.is_good() else []
+            cp = res.ContinuationPoint
+            while cp:
+                nxt = ua.BrowseNextParameters()
+                nxt.ContinuationPoints = [cp]
+                more = (await client.uaclient.browse_next(nxt))[0]
+                refs.extend(more.References)
+                cp = more.ContinuationPoint
+            out.append(refs)
+    return out
+
+
+async def _read(client: Client, node_ids: list[ua.NodeId], attr: ua.AttributeIds, batch: int) -> list[ua.DataValue]:
+    out: list[ua.DataValue] = []
+    for block in chunked(node_ids, batch):
+        out.extend(await client.uaclient.read_attributes(list(block), attr))
+    return out
+
+
+class Discovery:
+    """Browse das raízes configuradas + índice em cache (config.yaml -> discovery)."""
+
+    def __init__(self, disc_cfg: dict, cache_path: Path):
+        self.roots: list[str] = list(disc_cfg.get("roots", []) or [])
+        self.max_depth = int(disc_cfg.get("max_depth", 10))
+        self.include: list[str] = list(disc_cfg.get("include", ["*"]) or ["*"])
+        self.exclude: list[str] = list(disc_cfg.get("exclude", []) or [])
+        self.topic_prefix = (disc_cfg.get("topic_prefix") or "").strip("/")
+        self.version_node = disc_cfg.get("version_node")
+        self.cache_path = cache_path
+        self.key: str | None = None
+        self.tags: dict[str, dict] = {}
+
+    # ----- chave do cache -----
+    async def compute_key(self, client: Client, browse_batch: int = 0) -> str:
+        ns = await client.get_namespace_array()
+        roots = await self.resolve_roots(client, browse_batch)
+        versions = []
+        for nid in roots:
+            try:
+                prop = await client.get_node(nid).get_child("0:NodeVersion")
+                versions.append(str(await prop.read_value()))
+            except ua.UaError:
+                versions.append(None)
+        extra = None
+        if self.version_node:
+            dv = await client.get_node(self.version_node).read_data_value()
+            extra = str(dv.Value.Value) if dv.Value is not None else None
+        material = json.dumps({
+            "v": CACHE_VERSION, "ns": ns, "roots": [r.to_string() for r in roots],
+            "node_versions": versions, "version_node": extra,
+            "cfg": [self.max_depth, self.include, self.exclude, self.topic_prefix],
+        }, sort_keys=True)
+        return hashlib.sha256(material.encode()).hexdigest()
+
+    async def resolve_roots(self, client: Client, browse_batch: int = 0) -> list[ua.NodeId]:
+        """NodeIds das raízes: NodeId direto ou caminho de BrowseNames a partir de Objects."""
+        out = []
+        for root in self.roots:
+            if _looks_like_nodeid(root):
+                out.append(ua.NodeId.from_string(root))
+                continue
+            nid = ua.NodeId(ua.ObjectIds.ObjectsFolder)
+            for name in root.strip("/").split("/"):
+                refs = (await _browse(client, [nid], browse_batch))[0]
+                match = [r for r in refs if r.BrowseName.Name == name]
+                if not match:
+                    raise ValueError(f"Raiz de descoberta não encontrada: {root} (em {name})")
+                nid = match[0].NodeId
+            out.append(nid)
+        return out
+
+    # ----- cache -----
+    def load_cache(self, key: str) -> dict[str, dict] | None:
+        try:
+            data = json.loads(self.cache_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+        if data.get("key") != key:
+            return None
+        return data.get("tags") or {}
+
+    def save_cache(self, key: str, tags: dict[str, dict]) -> None:
+        self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.cache_path.with_suffix(".tmp")
+        tmp.write_text(json.dumps({
+            "key": key, "created": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "roots": self.roots, "tags": tags,
+        }, indent=1), encoding="utf-8")
+        os.replace(tmp, self.cache_path)
+
+    # ----- browse -----
+    def _wanted(self, name: str) -> bool:
+        return any(fnmatchcase(name, p) for p in self.include) \
+            and not any(fnmatchcase(name, p) for p in self.exclude)
+
+    async def browse(self, client: Client, browse_batch: int = 0, read_batch: int = 0) -> dict[str, dict]:
+        roots = await self.resolve_roots(client, browse_batch)
+        names = await _read(client, roots, ua.AttributeIds.BrowseName, read_batch)
+        # fronteira do browse: (NodeId, caminho de BrowseNames)
+        level = [(nid, [dv.Value.Value.Name]) for nid, dv in zip(roots, names)]
+        variables: list[tuple[ua.NodeId, list[str]]] = []
+        seen = set(roots)
+        for depth in range(self.max_depth):
+            if not level:
+                break
+            children = await _browse(client, [nid for nid, _ in level], browse_batch)
+            nxt = []
+            for (_, path), refs in zip(level, children):
+                for ref in refs:
+                    nid = ref.NodeId
+                    # propriedades (EngineeringUnits, NodeVersion...) não são tags
+                    if nid in seen or ref.ReferenceTypeId == ua.NodeId(ua.ObjectIds.HasProperty):
+                        continue
+                    seen.add(nid)
+                    child = path + [ref.BrowseName.Name]
+                    if ref.NodeClass == ua.NodeClass.Variable:
+                        variables.append((nid, child))
+                    nxt.append((nid, child))       # variáveis de estrutura têm membros
+            level = nxt
+            logger.debug(f"Descoberta: nível {depth + 1}, {len(level)} nós, {len(variables)} variáveis")
+
+        nids = [nid for nid, _ in variables]
+        dtypes = await _read(client, nids, ua.AttributeIds.DataType, read_batch)
+        ranks = await _read(client, nids, ua.AttributeIds.ValueRank, read_batch)
+        tags: dict[str, dict] = {}
+        skipped = 0
+        for (nid, path), dt, rank in zip(variables, dtypes, ranks):
+            dt_id = dt.Value.Value if dt.StatusCode.is_good() and dt.Value is not None else None
+            vtype = BUILTIN_TYPES.get(dt_id.Identifier) if dt_id is not None and dt_id.NamespaceIndex == 0 else None
+            scalar = rank.StatusCode.is_good() and rank.Value is not None and rank.Value.Value == -1
+            if vtype is None or not scalar:
+                skipped += 1
+                continue
+            segments = [_segment(p) for p in path]
+            name = ".".join(segments)
+            if not self._wanted(name) or name in tags:
+                continue
+            topic = "/".join(([self.topic_prefix] if self.topic_prefix else []) + segments)
+            tags[name] = {"nodeId": nid.to_string(), "type": vtype, "topic": topic}
+        logger.info(f"Descoberta: {len(tags)} tags em {len(variables)} variáveis "
+                    f"({skipped} sem tipo escalar built-in)")
+        return tags
+
+    async def run(self, client: Client, limits: dict[str, int]) -> dict[str, dict]:
+        """Tags descobertas: do cache se a chave bate, senão browse e grava o cache."""
+        browse_batch = limits.get("MaxNodesPerBrowse", 0)
+        read_batch = limits.get("MaxNodesPerRead", 0)
+        key = await self.compute_key(client, browse_batch)
+        if key == self.key:
+            return self.tags
+        cached = self.load_cache(key)
+        if cached is not None:
+            logger.info(f"Descoberta: {len(cached)} tags do cache {self.cache_path.name}")
+            self.key, self.tags = key, cached
+            return cached
+        t0 = time.monotonic()
+        tags = await self.browse(client, browse_batch, read_batch)
+        self.save_cache(key, tags)
+        logger.info(f"Descoberta concluída em {time.monotonic() - t0:.1f} s; cache em {self.cache_path}")
+        self.key, self.tags = key, tags
+        return tags
+
+
+def merge_tags(manual: dict, discovered: dict) -> dict:
+    """tags.yaml + descobertas; as do tags.yaml vencem (nome, nodeId ou tópico)."""
+    manual = manual or {}
+    merged = dict(manual)
+    nodes = {ua.NodeId.from_string(info["nodeId"]) for info in manual.values()}
+    topics = {info["topic"].strip("/") for info in manual.values()}
+    for name, info in discovered.items():
+        if name in merged or info["topic"] in topics or ua.NodeId.from_string(info["nodeId"]) in nodes:
+            continue
+        merged[name] = info
+    return merged
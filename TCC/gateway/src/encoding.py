@@ -0,0 +1,150 @@
+"""
+Codificação dos payloads de sensor publicados no MQTT.
+
+Encoders disponíveis (config.yaml -> encoding):
+
+- json:    {"value": ..., "type": "Float", "ts": "2025-01-01T12:00:00.123Z"}
+           (mesmas chaves de antes, agora com milissegundos)
+- msgpack: mesmo mapa em MessagePack, com "ts" em ms desde a epoch (int);
+           requer o pacote opcional `msgpack`
+- struct:  layout fixo little-endian, sem chaves:
+             B  versão do layout (1)
+             B  tipo (0=Int32, 1=Float, 2=Boolean, 3=String, 4=Double,
+                5=Int64, 6=sem valor)
+             q  timestamp, ms desde a epoch (UTC)
+             .. valor: i | f | ? | H + bytes UTF-8 | d | q | nada
+           inteiros menores (SByte..UInt16) vão como Int32 e UInt32 como
+           Int64; UInt64 vai como String. Notificação com status Bad chega
+           com valor None e sai com tipo 6 (o null do json/msgpack)
+
+O encoder é escolhido por prefixo do tópico da tag (o mais longo vence) e
+resolvido uma vez na partida. O timestamp vem da notificação OPC UA
+(SourceTimestamp, ou ServerTimestamp na falta dele); sem DataValue
+(ex.: heartbeat) usa o relógio do gateway.
+"""
+
+from __future__ import annotations
+
+import json
+import struct
+import time
+from datetime import datetime, timezone
+
+try:
+    import msgpack
+except ImportError:  # opcional: só necessário com encoder "msgpack"
+    msgpack = None
+
+# ----------------- Timestamps -----------------
+_last_sec = -1
+_last_prefix = ""
+
+
+def iso_ms(ts_ms: int) -> str:
+    """ISO-8601 UTC com milissegundos; o strftime só roda uma vez por segundo."""
+    global _last_sec, _last_prefix
+    sec, ms = divmod(ts_ms, 1000)
+    if sec != _last_sec:
+        _last_prefix = time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(sec))
+        _last_sec = sec
+    return f"{_last_prefix}.{ms:03d}Z"
+
+
+def _dt_ms(dt: datetime | None) -> int | None:
+    if dt is None:
+        return None
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return int(dt.timestamp() * 1000)
+
+
+def data_ts_ms(data, prefer: str = "source") -> int:
+    """Timestamp (ms) do DataValue da notificação/leitura, ou agora."""
+    dv = getattr(data, "monitored_item", None)
+    dv = dv.Value if dv is not None else data       # DataChangeNotif | DataValue | None
+    ts = None
+    if dv is not None and prefer != "gateway":
+        first, second = ("SourceTimestamp", "ServerTimestamp") if prefer == "source" \
+            else ("ServerTimestamp", "SourceTimestamp")
+        ts = _dt_ms(getattr(dv, first, None)) or _dt_ms(getattr(dv, second, None))
+    return ts if ts is not None else time.time_ns() // 1_000_000
+
+
+# ----------------- Encoders -----------------
+class JsonEncoder:
+    name = "json"
+
+    def encode(self, tag, value, ts_ms: int) -> bytes:
+        return json.dumps(
+            {"value": value, "type": tag.vtype, "ts": iso_ms(ts_ms)},
+            separators=(",", ":"),
+        ).encode()
+
+
+class MsgpackEncoder:
+    name = "msgpack"
+
+    def __init__(self):
+        if msgpack is None:
+            raise RuntimeError("encoder 'msgpack' requer o pacote msgpack (pip install msgpack)")
+        self._packer = msgpack.Packer()
+
+    def encode(self, tag, value, ts_ms: int) -> bytes:
+        return self._packer.pack({"value": value, "type": tag.vtype, "ts": ts_ms})
+
+
+class StructEncoder:
+    name = "struct"
+    VERSION = 1
+    TYPE_CODES = {"Int32": 0, "Float": 1, "Boolean": 2, "String": 3, "Double": 4, "Int64": 5,
+                  "SByte": 0, "Byte": 0, "Int16": 0, "UInt16": 0, "UInt32": 5}
+    _head = struct.Struct("<BBq")
+    _values = {0: struct.Struct("<i"), 1: struct.Struct("<f"), 2: struct.Struct("<?"),
+               4: struct.Struct("<d"), 5: struct.Struct("<q")}
+    _strlen = struct.Struct("<H")
+    NO_VALUE = 6
+
+    def encode(self, tag, value, ts_ms: int) -> bytes:
+        if value is None:
+            return self._head.pack(self.VERSION, self.NO_VALUE, ts_ms)
+        code = self.TYPE_CODES.get(tag.vtype, 3)
+        head = self._head.pack(self.VERSION, code, ts_ms)
+        if code == 3:
+            raw = str(value).encode()[:0xFFFF]
+            return head + self._strlen.pack(len(raw)) + raw
+        return head + self._values[code].pack(value)
+
+
+ENCODERS = {
+    "json": JsonEncoder,
+    "msgpack": MsgpackEncoder,
+    "struct": StructEncoder,
+}
+
+
+class EncoderMap:
+    """Resolve o encoder de cada tópico por prefixo (o mais longo vence)."""
+
+    def __init__(self, enc_cfg: dict | None):
+        enc_cfg = enc_cfg or {}
+        self._instances: dict[str, object] = {}
+        self.default = self._get(enc_cfg.get("default", "json"))
+        self.timestamp = enc_cfg.get("timestamp", "source")   # source | server | gateway
+        prefixes = enc_cfg.get("prefixes", {}) or {}
+        self._prefixes = sorted(
+            ((p.strip("/"), self._get(name)) for p, name in prefixes.items()),
+            key=lambda kv: len(kv[0]), reverse=True,
+        )
+
+    def _get(self, name: str):
+        if name not in ENCODERS:
+            raise ValueError(f"Encoder desconhecido: {name} (use {', '.join(ENCODERS)})")
+        if name not in self._instances:
+            self._instances[name] = ENCODERS[name]()
+        return self._instances[name]
+
+    def for_topic(self, topic: str):
+        for prefix, enc in self._prefixes:
+            if topic == prefix or topic.startswith(prefix + "/"):
+                return enc
+        return self.default
@@ -0,0 +1,202 @@
+"""
+Filtros de mudança por tag (deadband, intervalo mínimo e heartbeat).
+
+Configuração no tags.yaml (todas opcionais):
+
+    Temperatura:
+      nodeId: "ns=2;i=5"
+      type: Float
+      topic: "PLCData/Temperatura"
+      deadband: 0.5            # absoluto, em unidade de engenharia
+      # deadband_pct: 1.0      # ou % do EURange (eu_range p/ fallback no cliente)
+      # eu_range: [0, 150]
+      min_interval_ms: 200     # no máximo 1 publish a cada 200 ms (guarda o último)
+      max_silence_ms: 10000    # republica o último valor após 10 s sem mudança
+
+O deadband vai para o servidor como DataChangeFilter; se o servidor recusar
+o filtro, ele é aplicado aqui no cliente. Intervalo mínimo e heartbeat são
+sempre do lado do cliente.
+"""
+
+from __future__ import annotations
+
+import asyncio
+from dataclasses import dataclass
+from typing import Awaitable, Callable
+
+from asyncua import ua
+from loguru import logger
+
+# status de create_monitored_items que indicam "filtro não suportado"
+FILTER_REJECTED = {
+    ua.StatusCodes.BadMonitoredItemFilterUnsupported,
+    ua.StatusCodes.BadMonitoredItemFilterInvalid,
+    ua.StatusCodes.BadFilterNotAllowed,
+    ua.StatusCodes.BadDeadbandFilterInvalid,
+}
+
+
+@dataclass(slots=True)
+class FilterSpec:
+    deadband: float = 0.0
+    deadband_pct: float = 0.0
+    eu_range: tuple[float, float] | None = None
+    min_interval: float = 0.0   # s
+    max_silence: float = 0.0    # s
+
+    @classmethod
+    def from_cfg(cls, name: str, info: dict) -> FilterSpec | None:
+        spec = cls(
+            deadband=float(info.get("deadband", 0) or 0),
+            deadband_pct=float(info.get("deadband_pct", 0) or 0),
+            min_interval=float(info.get("min_interval_ms", 0) or 0) / 1000,
+            max_silence=float(info.get("max_silence_ms", 0) or 0) / 1000,
+        )
+        if spec.deadband and spec.deadband_pct:
+            raise ValueError(f"{name}: use deadband OU deadband_pct, não os dois")
+        if info.get("eu_range") is not None:
+            lo, hi = info["eu_range"]
+            spec.eu_range = (float(lo), float(hi))
+        if not (spec.deadband or spec.deadband_pct or spec.min_interval or spec.max_silence):
+            return None
+        return spec
+
+    def ua_filter(self) -> ua.DataChangeFilter | None:
+        if self.deadband:
+            kind, value = ua.DeadbandType.Absolute, self.deadband
+        elif self.deadband_pct:
+            kind, value = ua.DeadbandType.Percent, self.deadband_pct
+        else:
+            return None
+        return ua.DataChangeFilter(
+            Trigger=ua.DataChangeTrigger.StatusValue,
+            DeadbandType=kind,
+            DeadbandValue=value,
+        )
+
+    def client_deadband(self) -> float:
+        """Deadband absoluto equivalente para aplicar no cliente (0 = sem)."""
+        if self.deadband:
+            return self.deadband
+        if self.deadband_pct and self.eu_range:
+            lo, hi = self.eu_range
+            return abs(hi - lo) * self.deadband_pct / 100
+        return 0.0
+
+
+class ChangeFilter:
+    """Estado por tag; vive em tag.filter."""
+
+    __slots__ = ("spec", "deadband", "last_value", "last_pub", "pending", "timer", "hb")
+
+    def __init__(self, spec: FilterSpec):
+        self.spec = spec
+        self.deadband = 0.0         # > 0 só quando o servidor não aplica o filtro
+        self.last_value = None
+        self.last_pub = float("-inf")
+        self.pending: tuple | None = None
+        self.timer: asyncio.TimerHandle | None = None
+        self.hb: asyncio.TimerHandle | None = None
+
+    def passes_deadband(self, value) -> bool:
+        if not self.deadband or self.last_value is None:
+            return True
+        try:
+            return abs(value - self.last_value) > self.deadband
+        except TypeError:
+            return value != self.last_value
+
+
+class FilterBank:
+    def __init__(self, emit: Callable[..., Awaitable[None]]):
+        self.emit = emit
+        self.suppressed = 0
+        self.heartbeats = 0
+        self._bg: set[asyncio.Task] = set()
+
+    def attach(self, tag) -> None:
+        spec = FilterSpec.from_cfg(tag.name, tag.cfg)
+        tag.filter = ChangeFilter(spec) if spec else None
+
+    def server_result(self, tag, accepted: bool) -> None:
+        """Chamado após criar o monitored item: decide onde o deadband roda."""
+        f = tag.filter
+        if f is None:
+            return
+        f.deadband = 0.0 if accepted else f.spec.client_deadband()
+        if not accepted and f.spec.deadband_pct and not f.spec.eu_range:
+            logger.warning(f"{tag.name}: servidor recusou deadband_pct e não há eu_range; "
+                           f"deadband desativado")
+
+    # ----- caminho quente -----
+    async def on_change(self, tag, value, data=None) -> None:
+        f = tag.filter
+        if f is None:
+            await self.emit(tag, value, data)
+            return
+        if not f.passes_deadband(value):
+            self.suppressed += 1
+            return
+        f.last_value = value
+        loop = asyncio.get_running_loop()
+        now = loop.time()
+        due = f.last_pub + f.spec.min_interval
+        if now < due:
+            # segura o mais recente e publica quando o intervalo vencer
+            if f.pending is not None:
+                self.suppressed += 1
+            f.pending = (value, data)
+            if f.timer is None:
+                f.timer = loop.call_at(due, self._flush, tag)
+            return
+        f.pending = None
+        self._mark_published(tag, now)
+        await self.emit(tag, value, data)
+
+    # ----- timers -----
+    def _mark_published(self, tag, now: float) -> None:
+        f = tag.filter
+        f.last_pub = now
+        if f.spec.max_silence and f.hb is None:
+            f.hb = asyncio.get_running_loop().call_at(now + f.spec.max_silence, self._heartbeat, tag)
+
+    def _spawn(self, coro) -> None:
+        task = asyncio.get_running_loop().create_task(coro)
+        self._bg.add(task)
+        task.add_done_callback(self._bg.discard)
+
+    def _flush(self, tag) -> None:
+        f = tag.filter
+        f.timer = None
+        if f.pending is None:
+            return
+        value, data = f.pending
+        f.pending = None
+        self._mark_published(tag, asyncio.get_running_loop().time())
+        self._spawn(self.emit(tag, value, data))
+
+    def _heartbeat(self, tag) -> None:
+        # timer "preguiçoso": só reagenda se houve publish no meio do caminho,
+        # evitando cancelar/recriar timer a cada mudança
+        f = tag.filter
+        f.hb = None
+        loop = asyncio.get_running_loop()
+        now = loop.time()
+        due = f.last_pub + f.spec.max_silence
+        if now + 1e-3 < due:
+            f.hb = loop.call_at(due, self._heartbeat, tag)
+            return
+        if f.last_value is None:
+            return
+        self.heartbeats += 1
+        self._mark_published(tag, now)
+        self._spawn(self.emit(tag, f.last_value, None))
+
+    def cancel(self, tag) -> None:
+        f = tag.filter
+        if f is None:
+            return
+        for h in (f.timer, f.hb):
+            if h is not None:
+                h.cancel()
+        f.timer = f.hb = None
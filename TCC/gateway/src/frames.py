@@ -0,0 +1,115 @@
+"""
+Quadros agregados por grupo de tags para o gêmeo digital.
+
+Cada mudança de tag já sai como uma mensagem MQTT própria; o cliente Unity
+desenfileira e faz o parse de uma por uma na thread principal. Com
+frames.enabled o gateway também publica, a `rate_hz` fixo, um quadro por
+grupo com todos os valores que mudaram desde o quadro anterior (o último de
+cada tag, os intermediários são descartados):
+
+    tópico:  <base_topic>/<grupo>                 ex.: planta/twin/PLCData
+    payload: {"seq": 812, "ts": 1729240000123, "key": false,
+              "tags": ["Linha1/Temp", "Linha1/Nivel"], "values": [71.5, 0.42]}
+
+`tags` são os tópicos das tags relativos ao grupo ("" quando o tópico é o
+próprio grupo) e `values` os valores na mesma ordem (Boolean vira 0/1; tags
+String ficam só nos tópicos por tag). Layout em colunas, legível direto pelo
+JsonUtility do Unity.
+
+Grupos: os `group_depth` primeiros níveis do tópico da tag (1 = objeto OPC UA
+raiz, ex.: PLCData), ou `groups` explícitos {nome: prefixo do tópico}, em que
+cada tag cai no prefixo mais longo que casar e as que não casam ficam de fora.
+Um FrameBuilder por processo (main.MqttLink) recebe as tags de todos os
+endpoints dele, então um grupo pode juntar tags de PLCs diferentes.
+
+A cada `keyframe_s` (e no primeiro quadro após conectar no MQTT) o quadro
+leva todos os valores conhecidos do grupo, com "key": true e retain, para um
+cliente novo começar do estado completo. Quadros não passam pelo outbox:
+com o MQTT fora eles são descartados e o próximo keyframe repõe o estado.
+"""
+
+from __future__ import annotations
+
+import json
+import time
+
+
+class FrameBuilder:
+    def __init__(self, cfg: dict):
+        self.rate_hz = float(cfg.get("rate_hz", 30))
+        self.keyframe_s = float(cfg.get("keyframe_s", 5))
+        self.depth = max(1, int(cfg.get("group_depth", 1)))
+        groups = cfg.get("groups") or {}
+        # prefixo mais longo primeiro
+        self.groups = sorted(((p.strip("/"), name) for name, p in groups.items()),
+                             key=lambda g: len(g[0]), reverse=True)
+        self._where: dict[str, tuple[str, str] | None] = {}   # tópico -> (grupo, chave)
+        self.state: dict[str, dict[str, float]] = {}          # grupo -> chave -> valor
+        self.changed: dict[str, dict[str, float]] = {}        # idem, desde o último quadro
+        self.seq: dict[str, int] = {}
+        self._next_key = 0.0
+        self.frames = 0
+        self.values = 0
+        self.updates = 0
+
+    def _locate(self, topic: str) -> tuple[str, str] | None:
+        if self.groups:
+            for prefix, name in self.groups:
+                if topic == prefix or topic.startswith(prefix + "/"):
+                    return name, topic[len(prefix) + 1:]
+            return None
+        parts = topic.split("/")
+        group = "/".join(parts[:self.depth])
+        return group, "/".join(parts[self.depth:])
+
+    def group_of(self, topic: str) -> str | None:
+        """Grupo em que a tag de `topic` entra (None: fora dos quadros)."""
+        where = self._locate(topic.strip("/"))
+        return where[0] if where else None
+
+    def update(self, tag, value) -> None:
+        if tag.vtype == "String" or value is None:
+            return
+        where = self._where.get(tag.topic, False)
+        if where is False:
+            where = self._where[tag.topic] = self._locate(tag.topic)
+        if where is None:
+            return
+        group, key = where
+        v = float(value)
+        self.state.setdefault(group, {})[key] = v
+        self.changed.setdefault(group, {})[key] = v
+        self.updates += 1
+
+    def forget(self, tags) -> None:
+        """Tags removidas (recarga do tags.yaml) saem dos keyframes."""
+        for tag in tags:
+            where = self._where.pop(tag.topic, None)
+            if where:
+                self.state.get(where[0], {}).pop(where[1], None)
+                self.changed.get(where[0], {}).pop(where[1], None)
+
+    def force_keyframe(self) -> None:
+        self._next_key = 0.0
+
+    def build(self) -> list[tuple[str, str, bool]]:
+        """(grupo, payload, keyframe) dos grupos com algo a enviar."""
+        now = time.monotonic()
+        key = now >= self._next_key
+        if key:
+            self._next_key = now + self.keyframe_s
+        source = self.state if key else self.changed
+        ts = time.time_ns() // 1_000_000
+        out = []
+        for group, values in source.items():
+            if not values:
+                continue
+            seq = self.seq[group] = self.seq.get(group, 0) + 1
+            payload = json.dumps({"seq": seq, "ts": ts, "key": key,
+                                  "tags": list(values), "values": list(values.values())},
+                                 separators=(",", ":"))
+            out.append((group, payload, key))
+            self.values += len(values)
+        self.changed = {}
+        self.frames += len(out)
+        return out
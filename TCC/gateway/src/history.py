@@ -0,0 +1,158 @@
+"""
+Histórico recente por tag em memória, consultável por MQTT.
+
+Cada tag numérica ganha um ring buffer NumPy (timestamp em ms int64 + valor
+float64, 16 bytes por amostra), alocado na primeira amostra. Clientes como o
+gêmeo digital pedem a janela que precisam em vez de montar a tendência do
+zero a cada conexão (ou ler histórico do CLP):
+
+    pedido:   <base>/req/<tópico da tag>     ex.: planta/historico/req/PLCData/T1
+              {"id": 7, "last_s": 600, "points": 300, "method": "lttb"}
+              ou "from"/"to" em ms desde a epoch no lugar de last_s
+    resposta: <base>/resp/<tópico da tag>, ou o "reply_to" do pedido, ou o
+              ResponseTopic (MQTT v5, com a CorrelationData devolvida)
+              {"id": 7, "tag": "T1", "method": "lttb", "count": 5400,
+               "ts": [...], "value": [...]}
+
+Redução no servidor para `points` pontos:
+    minmax: mínimo e máximo de cada balde, points // 2 baldes (preserva
+            picos; bom para sinais ruidosos); com points = 1, o último valor
+    lttb:   Largest-Triangle-Three-Buckets (preserva a forma visual)
+    raw:    sem redução (cortado nos últimos `points`)
+
+Tags String não têm histórico.
+"""
+
+from __future__ import annotations
+
+import time
+
+try:
+    import numpy as np
+except ImportError:  # opcional: só necessário com history.enabled
+    np = None
+
+METHODS = ("minmax", "lttb", "raw")
+
+
+class Ring:
+    __slots__ = ("ts", "val", "n", "i")
+
+    def __init__(self, depth: int):
+        self.ts = np.empty(depth, np.int64)
+        self.val = np.empty(depth, np.float64)
+        self.n = 0          # amostras válidas
+        self.i = 0          # próxima posição de escrita
+
+    def append(self, ts_ms: int, value: float) -> None:
+        i = self.i
+        self.ts[i] = ts_ms
+        self.val[i] = value
+        self.i = i + 1 if i + 1 < len(self.ts) else 0
+        if self.n < len(self.ts):
+            self.n += 1
+
+    def ordered(self) -> tuple[np.ndarray, np.ndarray]:
+        """Cópias em ordem cronológica de chegada."""
+        if self.n < len(self.ts):
+            return self.ts[:self.n].copy(), self.val[:self.n].copy()
+        return np.roll(self.ts, -self.i), np.roll(self.val, -self.i)
+
+
+def minmax(ts: np.ndarray, val: np.ndarray, points: int) -> tuple[np.ndarray, np.ndarray]:
+    # 2 amostras por balde: points // 2 baldes nunca passam de `points`
+    n = len(val)
+    if n <= points:
+        return ts, val
+    if points == 1:
+        return ts[-1:], val[-1:]        # um balde só daria mín e máx: fica o último valor
+    buckets = points // 2
+    edges = np.linspace(0, n, buckets + 1).astype(np.int64)
+    idx = []
+    for a, b in zip(edges[:-1], edges[1:]):
+        seg = val[a:b]
+        lo, hi = a + int(np.argmin(seg)), a + int(np.argmax(seg))
+        idx.extend((lo, hi) if lo < hi else (hi, lo) if hi < lo else (lo,))
+    idx = np.asarray(idx)
+    return ts[idx], val[idx]
+
+
+def lttb(ts: np.ndarray, val: np.ndarray, points: int) -> tuple[np.ndarray, np.ndarray]:
+    n = len(val)
+    if n <= points:
+        return ts, val
+    if points < 3:
+        # sem baldes internos: extremos da janela (ou só o último valor)
+        idx = [n - 1] if points == 1 else [0, n - 1]
+        return ts[idx], val[idx]
+    x = ts.astype(np.float64)
+    edges = np.linspace(1, n - 1, points - 1).astype(np.int64)   # baldes internos
+    idx = np.empty(points, np.int64)
+    idx[0], idx[-1] = 0, n - 1
+    a = 0
+    for k in range(points - 2):
+        lo, hi = edges[k], edges[k + 1]
+        # média do próximo balde (ou o último ponto)
+        nlo, nhi = hi, edges[k + 2] if k + 2 < len(edges) else n
+        cx, cy = x[nlo:nhi].mean(), val[nlo:nhi].mean()
+        area = np.abs((x[a] - cx) * (val[lo:hi] - val[a]) - (x[a] - x[lo:hi]) * (cy - val[a]))
+        a = lo + int(np.argmax(area))
+        idx[k + 1] = a
+    return ts[idx], val[idx]
+
+
+class History:
+    def __init__(self, depth: int = 600, max_points: int = 5000):
+        if np is None:
+            raise RuntimeError("history requer o pacote numpy (pip install numpy)")
+        self.depth = depth
+        self.max_points = max_points
+        self.queries = 0
+
+    def record(self, tag, value, ts_ms: int) -> None:
+        if tag.vtype == "String" or value is None:
+            return
+        ring = tag.history
+        if ring is None:
+            ring = tag.history = Ring(self.depth)
+        ring.append(ts_ms, float(value))
+
+    def nbytes(self, tags) -> int:
+        return sum(t.history.ts.nbytes + t.history.val.nbytes for t in tags if t.history is not None)
+
+    def query(self, tag, req: dict) -> dict:
+        """Resposta a um pedido (ver docstring do módulo); ValueError/TypeError/
+        OverflowError se inválido."""
+        method = req.get("method", "minmax")
+        if method not in METHODS:
+            raise ValueError(f"method inválido: {method} (use {', '.join(METHODS)})")
+        points = min(int(req.get("points", self.max_points)), self.max_points)
+        if points < 1:
+            raise ValueError("points deve ser >= 1")
+        if "last_s" in req:
+            t1 = time.time_ns() // 1_000_000
+            t0 = t1 - int(float(req["last_s"]) * 1000)
+        else:
+            t0 = int(req.get("from", 0))
+            t1 = int(req.get("to", 2 ** 62))
+        # os timestamps são int64: limites fora da faixa não podem chegar ao numpy
+        t0, t1 = (min(max(t, -2 ** 63), 2 ** 63 - 1) for t in (t0, t1))
+        self.queries += 1
+
+        out = {"id": req.get("id"), "tag": tag.name, "topic": tag.topic, "method": method,
+               "count": 0, "ts": [], "value": []}
+        if tag.history is None:
+            return out
+        ts, val = tag.history.ordered()
+        mask = (ts >= t0) & (ts <= t1)
+        ts, val = ts[mask], val[mask]
+        out["count"] = int(len(ts))
+        if method == "minmax":
+            ts, val = minmax(ts, val, points)
+        elif method == "lttb":
+            ts, val = lttb(ts, val, points)
+        else:
+            ts, val = ts[-points:], val[-points:]
+        out["ts"] = ts.tolist()
+        out["value"] = val.tolist()
+        return out
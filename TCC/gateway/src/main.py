@@ -1,5 +1,10 @@
+from __future__ import annotations
+
 import asyncio
 import json
+import math
+import multiprocessing
+import os
 import time
 import sys
 from pathlib import Path
@@ -10,56 +15,63 @@ if sys.platform.startswith("win"):
 
 import yaml
 from loguru import logger
-from tenacity import retry, wait_fixed, stop_after_attempt
 from asyncua import Client, ua
+from asyncua.common.subscription import Subscription
 from asyncio_mqtt import Client as MqttClient, MqttError
 
-def _resolve_sec_string(raw: str | None) -> str | None:
-    if not raw or raw == "None":
-        return None
-    parts = [p.strip() for p in raw.split(",")]
-    if len(parts) < 4:
-        raise ValueError(f"SEC inválido: {raw}")
-    policy, mode, cert, key = parts[:4]
-    cert_p = Path(cert)
-    key_p  = Path(key)
-    if not cert_p.is_absolute():
-        cert_p = (BASE_DIR / cert).resolve()
-    if not key_p.is_absolute():
-        key_p  = (BASE_DIR / key).resolve()
-    if not cert_p.exists():
-        logger.error(f"Certificado do cliente não encontrado: {cert_p}")
-        raise FileNotFoundError(cert_p)
-    if not key_p.exists():
-        logger.error(f"Chave do cliente não encontrada: {key_p}")
-        raise FileNotFoundError(key_p)
-    # mantém qualquer parâmetro extra após os 4 primeiros
-    tail = parts[4:]
-    return ",".join([policy, mode, str(cert_p), str(key_p), *tail])
+from cyclic import CyclicReader
+from discovery import Discovery, merge_tags
+from encoding import EncoderMap, data_ts_ms
+from filters import FILTER_REJECTED, FilterBank, FilterSpec
+from frames import FrameBuilder
+from history import History
+from metrics import Histogram, serve_metrics, snapshot
+from mqtt5 import MqttV5Client, TopicAliases, reply_props, shared
+from oplimits import chunked, read_operation_limits
+from outbox import Outbox
+from pipeline import PublishPipeline
+from reconnect import Backoff, resume_session
+from registry import Tag, TagRegistry, group_by_interval
+from security import SecurityProfile
+from writes import WriteCoalescer
 
 # ----------------- Util -----------------
-UA_TYPES = {
-    "Int32": ua.VariantType.Int32,
-    "Float": ua.VariantType.Float,
-    "Boolean": ua.VariantType.Boolean,
-    "String": ua.VariantType.String,
-}
-def to_variant(value, vtype_str):
-    return ua.Variant(value, UA_TYPES.get(vtype_str, ua.VariantType.String))
-
 def utc_iso():
     return time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
 
+async def run_all(*coros):
+    # roda juntos; a primeira falha cancela os demais e sobe para quem chamou
+    # (força reconectar)
+    tasks = [asyncio.create_task(c) for c in coros]
+    try:
+        done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+        for t in done:
+            t.result()
+    finally:
+        for t in tasks:
+            t.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
 # ----------------- Config -----------------
 BASE_DIR = Path(__file__).resolve().parent
-cfg = yaml.safe_load((BASE_DIR / "config.yaml").read_text(encoding="utf-8"))
-tags_cfg = yaml.safe_load((BASE_DIR / cfg["tags_map"]).read_text(encoding="utf-8"))
+# GATEWAY_CONFIG aponta outro arquivo (ex.: bench/bench.py); caminhos
+# relativos dentro dele continuam relativos a src/
+CFG_PATH = Path(os.environ.get("GATEWAY_CONFIG", BASE_DIR / "config.yaml"))
+cfg = yaml.safe_load(CFG_PATH.read_text(encoding="utf-8"))
 
-OPC_EP   = cfg["opcua"]["endpoint"]
-SEC      = cfg["opcua"]["security"]
-USER     = cfg["opcua"]["username"]
-PASS     = cfg["opcua"]["password"]
-KEEPALIVE= cfg["opcua"]["keepalive_ms"]/1000
+def load_tags(tags_map: str) -> dict:
+    return yaml.safe_load((BASE_DIR / tags_map).read_text(encoding="utf-8")) or {}
+
+# endpoint único (opcua + tags_map) ou lista em "endpoints"
+tags_cfg = load_tags(cfg["tags_map"]) if cfg.get("tags_map") else {}
+
+OPC_EP   = cfg["opcua"].get("endpoint")
+SEC      = cfg["opcua"].get("security")
+USER     = cfg["opcua"].get("username")
+PASS     = cfg["opcua"].get("password")
+KEEPALIVE= cfg["opcua"].get("keepalive_ms", 10000)/1000
+
+PROCS    = cfg.get("processes", 1)
 
 MQTT_HOST= cfg["mqtt"]["host"]
 MQTT_PORT= cfg["mqtt"]["port"]
@@ -67,152 +79,889 @@ MQTT_QOS = cfg["mqtt"]["qos"]
 MQTT_RET = cfg["mqtt"]["retain"]
 TOP_SENS = cfg["mqtt"]["base_topics"]["sensors"]
 TOP_CMD  = cfg["mqtt"]["base_topics"]["commands"]
+TOP_CST  = cfg["mqtt"]["base_topics"].get("command_status", "planta/status/comandos")
+MQTT_VER = cfg["mqtt"].get("protocol", 3)        # 3 (3.1.1) | 5
+MQTT5    = cfg["mqtt"].get("v5", {}) or {}
+MQTT_ALI = MQTT5.get("topic_alias_max", 1000)     # limitado pelo TopicAliasMaximum do broker
+MQTT_EXP = MQTT5.get("message_expiry_s", 0)       # 0 = valores não expiram
+MQTT_SHR = MQTT5.get("shared_group")              # comandos via $share/<grupo>/...
 
-PUB_MODE = cfg["publish_mode"]
+PUB_MODE = cfg["publish_mode"]          # on_change | cyclic
 PUB_INT  = cfg["publish_interval_ms"]/1000
 
+SUB_CFG  = cfg.get("subscription", {}) or {}
+SUB_MS   = SUB_CFG.get("default_publishing_ms", 100)
+SUB_BATCH= SUB_CFG.get("monitored_items_per_call", 1000)
+
+ENC_CFG  = cfg.get("encoding", {}) or {}
+
+WR_CFG   = cfg.get("writes", {}) or {}
+WR_WIN   = WR_CFG.get("window_ms", 20)/1000
+WR_MAX   = WR_CFG.get("max_batch", 500)
+
+OB_CFG   = cfg.get("outbox", {}) or {}
+OB_ON    = OB_CFG.get("enabled", False)
+OB_DIR   = BASE_DIR / OB_CFG.get("dir", "outbox")
+OB_RATE  = OB_CFG.get("replay_rate", 500)          # msgs/s na republicação
+
+RC_CFG   = cfg.get("reconnect", {}) or {}
+RC_MIN   = RC_CFG.get("initial_ms", 100)/1000
+RC_MAX   = RC_CFG.get("max_ms", 10000)/1000
+RC_OK    = RC_CFG.get("healthy_s", 10)              # sessão estável: zera o backoff
+
+MET_CFG  = cfg.get("metrics", {}) or {}
+MET_HOST = MET_CFG.get("host", "127.0.0.1")
+MET_PORT = MET_CFG.get("http_port", 9108)         # 0/null desliga; +índice do worker
+MET_TAGS = MET_CFG.get("per_tag", True)
+MET_TOP  = MET_CFG.get("status_topic")            # ex.: planta/status/gateway
+MET_INT  = MET_CFG.get("status_interval_s", 10)
+
+TR_CFG   = cfg.get("tags_reload", {}) or {}
+TR_ON    = TR_CFG.get("enabled", True)
+TR_INT   = TR_CFG.get("interval_s", 2)              # verificação do mtime do tags.yaml
+
+DISC_CFG = cfg.get("discovery", {}) or {}
+DISC_DIR = BASE_DIR / DISC_CFG.get("cache_dir", "discovery")
+
+HIST_CFG = cfg.get("history", {}) or {}
+HIST_ON  = HIST_CFG.get("enabled", False)
+HIST_TOP = HIST_CFG.get("base_topic", "planta/historico")
+HIST_REQ = f"{HIST_TOP}/req/"
+
+FR_CFG   = cfg.get("frames", {}) or {}
+FR_ON    = FR_CFG.get("enabled", False)
+FR_TOP   = FR_CFG.get("base_topic", "planta/twin")
+
+PIPE_CFG = cfg.get("pipeline", {}) or {}
+PIPE_MAX = PIPE_CFG.get("maxsize", 10000)
+PIPE_POL = PIPE_CFG.get("overflow", "conflate")
+PIPE_WRK = PIPE_CFG.get("workers", 4)
+
+
+def load_endpoints() -> list[dict]:
+    """Endpoints OPC UA do config; security/username/password herdam de `opcua`."""
+    if not cfg.get("endpoints"):
+        return [{"name": "main", "endpoint": OPC_EP, "security": SEC,
+                 "username": USER, "password": PASS, "tags": tags_cfg,
+                 "tags_map": cfg.get("tags_map"), "discovery": DISC_CFG}]
+    eps = []
+    for i, raw in enumerate(cfg["endpoints"]):
+        ep = {"name": raw.get("name", f"ep{i}"), "endpoint": raw["endpoint"],
+              "security": raw.get("security", SEC),
+              "username": raw.get("username", USER), "password": raw.get("password", PASS),
+              "tags": load_tags(raw["tags_map"]) if raw.get("tags_map") else {},
+              "tags_map": raw.get("tags_map"),
+              # raízes próprias do endpoint; o resto herda de "discovery"
+              "discovery": {**DISC_CFG, **(raw.get("discovery") or {})}}
+        eps.append(ep)
+    names = [ep["name"] for ep in eps]
+    if len(set(names)) != len(names):
+        raise ValueError(f"Nomes de endpoint repetidos: {names}")
+    return eps
+
+
+def shard_endpoints(eps: list[dict], n: int) -> list[list[dict]]:
+    """Distribui os endpoints em n processos balanceando pelo nº de tags."""
+    shards: list[list[dict]] = [[] for _ in range(n)]
+    load = [0] * n
+    for ep in sorted(eps, key=lambda e: len(e["tags"]), reverse=True):
+        i = load.index(min(load))
+        shards[i].append(ep)
+        load[i] += len(ep["tags"])
+    return [s for s in shards if s]
+
+# ----------------- MQTT compartilhado -----------------
+class MqttLink:
+    """Conexão MQTT única de um worker, compartilhada pelos seus endpoints.
+
+    Assina a união dos ramos de comando/histórico dos gateways e entrega
+    cada mensagem ao gateway cujo registry tem o tópico, então um endpoint
+    não vê (nem reclama de) comandos de outro do mesmo ramo. Os quadros
+    agregados saem de um FrameBuilder só, com as tags de todos os endpoints:
+    o keyframe retido de um grupo tem o grupo inteiro, e não só a parte do
+    último endpoint que publicou.
+    """
+
+    def __init__(self, workers: int = 1):
+        self.gateways: list[OpcUaMqttGateway] = []
+        self.workers = workers                       # >1: outro worker pode atender o comando
+        self.mqtt: MqttClient | None = None
+        self.up = False
+        self.aliases = TopicAliases(MQTT_ALI, MQTT_EXP) if MQTT_VER == 5 else None
+        self.frames = FrameBuilder(FR_CFG) if FR_ON else None
+        self._topics: list[str] = []                 # assinados na conexão atual
+
+    async def connect(self):
+        logger.debug("-> MqttLink.connect() chamado")
+        if MQTT_VER == 5:
+            self.mqtt = MqttV5Client(MQTT_HOST, MQTT_PORT)
+            await self.mqtt.connect()
+            self.aliases.reset(self.mqtt.server_alias_max)
+            logger.success(f"MQTT v5 conectado ({self.aliases.maximum} topic aliases).")
+        else:
+            self.mqtt = MqttClient(MQTT_HOST, MQTT_PORT)
+            await self.mqtt.connect()
+            logger.success("MQTT conectado.")
+        self.up = True
+
+    def subscribe_topics(self) -> list[str]:
+        topics = list(dict.fromkeys(t for gw in self.gateways for t in gw.subscribe_topics()))
+        # v5 com shared_group: réplicas do gateway dividem os comandos
+        return [shared(t, MQTT_SHR) for t in topics] if MQTT_VER == 5 else topics
+
+    def route(self, topic: str) -> tuple[OpcUaMqttGateway | None, Tag | None]:
+        for gw in self.gateways:
+            tag = gw.registry.by_topic(topic)
+            if tag is not None:
+                return gw, tag
+        return None, None
+
+    async def publish_sensor(self, topic: str, payload):
+        if self.aliases is None:
+            await self.mqtt.publish(topic, payload, qos=MQTT_QOS, retain=MQTT_RET)
+            return
+        # alias + expiry; resolve() e o publish do paho rodam sem await no
+        # meio, então a ordem dos aliases é a ordem no socket
+        topic, props = self.aliases.resolve(topic)
+        await self.mqtt.publish(topic, payload, qos=MQTT_QOS, retain=MQTT_RET, properties=props)
+
+    async def supervisor(self):
+        # só o lado MQTT: as sessões OPC UA seguem de pé durante a queda. Sem
+        # outbox os publicadores param e a fila segura as mensagens (conforme
+        # a política de overflow); com outbox eles seguem rodando desde
+        # gw.run() e as mensagens vão para o disco
+        loop = asyncio.get_running_loop()
+        backoff = Backoff(RC_MIN, RC_MAX)
+        while True:
+            started = loop.time()
+            try:
+                await self.connect()
+                tasks = [self.listener()]
+                for gw in self.gateways:
+                    with logger.contextualize(ep=gw.name):
+                        gw.pipeline.start()
+                    if gw.outbox is not None:
+                        tasks.append(self._as(gw, gw.replay_outbox()))
+                    if MET_TOP:
+                        tasks.append(self._as(gw, gw.publish_status()))
+                if self.frames is not None:
+                    tasks.append(self.publish_frames())
+                await run_all(*tasks)
+            except Exception as e:
+                logger.warning(f"MQTT caiu: {e!r}")
+            self.up = False
+            for gw in self.gateways:
+                if gw.outbox is None:
+                    await gw.pipeline.stop()
+            try:
+                await self.mqtt.disconnect()
+            except Exception:
+                pass
+            if loop.time() - started >= RC_OK:
+                backoff.reset()
+            delay = backoff.next()
+            logger.info(f"MQTT: nova tentativa em {delay:.2f} s")
+            await asyncio.sleep(delay)
+
+    @staticmethod
+    async def _as(gw: OpcUaMqttGateway, coro):
+        # tarefa do gateway rodando no supervisor: log com o endpoint dele
+        with logger.contextualize(ep=gw.name):
+            return await coro
+
+    async def listener(self):
+        assert self.mqtt is not None
+        async with self.mqtt.unfiltered_messages() as messages:
+            topics = self.subscribe_topics()
+            await self.mqtt.subscribe([(t, MQTT_QOS) for t in topics])
+            self._topics = topics
+            logger.info(f"Subscrito em {', '.join(topics)}")
+            async for msg in messages:
+                history = HIST_ON and msg.topic.startswith(HIST_REQ)
+                # topic = planta/comandos/<topicTag> | <HIST_REQ><topicTag>
+                gw, tag = self.route(msg.topic[len(HIST_REQ):] if history else msg.topic[len(TOP_CMD) + 1:])
+                if tag is None:
+                    # com vários workers no mesmo ramo, quem tem a tag atende
+                    log = logger.debug if history or self.workers > 1 else logger.warning
+                    log(f"{'Histórico' if history else 'Comando'} para tópico desconhecido: {msg.topic}")
+                    continue
+                with logger.contextualize(ep=gw.name):
+                    if history:
+                        await gw.answer_history(msg, tag)
+                    else:
+                        await gw.on_command(tag, msg.payload)
+
+    async def update_subscriptions(self):
+        # MQTT fora: listener() assina a lista atual ao reconectar
+        if not self.up:
+            return
+        topics = self.subscribe_topics()
+        gone = [t for t in self._topics if t not in topics]
+        new = [t for t in topics if t not in self._topics]
+        if new:
+            await self.mqtt.subscribe([(t, MQTT_QOS) for t in new])
+        if gone:
+            await self.mqtt.unsubscribe(gone)
+        self._topics = topics
+        if new or gone:
+            logger.info(f"Comandos: +{', '.join(new) or '-'} / -{', '.join(gone) or '-'}")
+
+    async def publish_frames(self):
+        # um quadro por grupo a cada 1/rate_hz (frames.py), com as tags de
+        # todos os endpoints; o primeiro depois de conectar é keyframe,
+        # retido para quem assinar depois
+        fb = self.frames
+        period = 1 / fb.rate_hz
+        fb.force_keyframe()
+        loop = asyncio.get_running_loop()
+        due = loop.time()
+        while True:
+            for group, payload, key in fb.build():
+                await self.mqtt.publish(f"{FR_TOP}/{group}", payload, qos=MQTT_QOS, retain=key)
+            due += period
+            if due < loop.time():
+                due = loop.time()           # atrasou: não tenta compensar em rajada
+            await asyncio.sleep(due - loop.time())
+
+
 # ----------------- Gateway -----------------
 class OpcUaMqttGateway:
-    def __init__(self):
+    def __init__(self, ep: dict | None = None, link: MqttLink | None = None):
+        self.ep = ep or load_endpoints()[0]
+        self.name = self.ep["name"]
+        self._manual = self.ep["tags"]                   # tags.yaml, sem as descobertas
+        disc = self.ep.get("discovery") or {}
+        self.discovery: Discovery | None = None
+        if disc.get("enabled") and disc.get("roots"):
+            self.discovery = Discovery(disc, DISC_DIR / f"{self.name}.json")
+        # certificado/chave carregados uma vez; o do servidor fica guardado entre reconexões
+        self.security = SecurityProfile.from_config(self.ep["security"], BASE_DIR)
         self.opc_client: Client | None = None
-        self.mqtt: MqttClient | None = None
-        self.nodes: dict[str, Node] = {}
-        self.sub: Subscription | None = None
+        # conexão MQTT do worker, compartilhada com os outros endpoints dele;
+        # sem link, o gateway tem o seu e o supervisiona em run()
+        self._own_link = link is None
+        self.link = link if link is not None else MqttLink()
+        self.link.gateways.append(self)
+        self.registry = TagRegistry(self.ep["tags"], TOP_SENS)
+        self.encoders = EncoderMap(ENC_CFG)
+        for tag in self.registry:
+            tag.encoder = self.encoders.for_topic(tag.topic)
+        self.subs: dict[float, Subscription] = {}    # publishing interval (ms) -> subscription
+        self.pipeline = PublishPipeline(self.publish_value, PIPE_MAX, PIPE_POL, PIPE_WRK)
+        self.history: History | None = None
+        if HIST_ON:
+            self.history = History(HIST_CFG.get("depth", 600), HIST_CFG.get("max_points", 5000))
+        self.frames = self.link.frames
+        self.filters = FilterBank(self.emit)
+        self.cyclic = CyclicReader(self.registry, PUB_INT, self.emit)
+        self.writer = WriteCoalescer(lambda: self.opc_client, self.publish_command_status, WR_WIN, WR_MAX)
+        for tag in self.registry:
+            self.filters.attach(tag)
+        self.outbox: Outbox | None = None
+        if OB_ON:
+            self.outbox = Outbox(OB_DIR / self.name,
+                                 segment_bytes=int(OB_CFG.get("segment_mb", 4) * (1 << 20)),
+                                 max_bytes=int(OB_CFG.get("max_mb", 256) * (1 << 20)),
+                                 max_age_s=OB_CFG.get("max_age_s", 24 * 3600))
+            self.outbox.open()
+        self.publish_latency = Histogram()               # source ts -> publish (ms)
+        self.write_latency = self.writer.latency         # comando -> Write (ms)
+        self._opc_lock = asyncio.Lock()                  # setup_opc x apply_tags
+        self._mi_handler: DataChangeHandler | None = None
+        self._mi_batch = 0                               # monitored items por chamada
+        self._read_limit = 0                             # MaxNodesPerRead (modo cíclico)
+        self._session_token: ua.NodeId | None = None     # sessão OPC UA a retomar
+        self._sub_lost: ua.StatusCode | None = None      # subscription encerrada pelo servidor
         self.running = True
 
     # ----- MQTT -----
-    @retry(wait=wait_fixed(5), stop=stop_after_attempt(100))
-    async def connect_mqtt(self):
-        logger.debug("-> connect_mqtt() chamado")
-        self.mqtt = MqttClient(MQTT_HOST, MQTT_PORT)
-        await self.mqtt.connect()
-        logger.success("MQTT conectado.")
-        await self.mqtt.subscribe(f"{TOP_CMD}/#", qos=MQTT_QOS)
-
-        # subscribe commands
-        topic = f"{TOP_CMD}/#"
-        await self.mqtt.subscribe((topic, MQTT_QOS))
-        logger.info(f"Subscrito em {topic}")
-
-    async def publish_value(self, tag_name: str, value, vtype: str):
-        topic = f"{TOP_SENS}/{tags_cfg[tag_name]['topic']}"
+    @property
+    def mqtt(self) -> MqttClient | None:
+        return self.link.mqtt
+
+    @property
+    def mqtt_up(self) -> bool:
+        return self.link.up
+
+    def _topic_roots(self) -> list[str]:
+        return sorted({tag.topic.split("/", 1)[0] for tag in self.registry})
+
+    def command_topics(self) -> list[str]:
+        # só os ramos de comando das tags deste endpoint: com vários
+        # endpoints/processos cada comando chega apenas a quem o atende
+        roots = self._topic_roots()
+        return [f"{TOP_CMD}/{root}/#" for root in roots] or [f"{TOP_CMD}/#"]
+
+    def subscribe_topics(self) -> list[str]:
+        # comandos + pedidos de histórico, pelos mesmos ramos
+        topics = self.command_topics()
+        if self.history is not None:
+            topics += [f"{HIST_REQ}{root}/#" for root in self._topic_roots()] or [f"{HIST_REQ}#"]
+        return topics
+
+    async def emit(self, tag: Tag, value, data=None):
+        # saída dos filtros e do modo cíclico: guarda no histórico e no
+        # próximo quadro (só valores vindos do servidor, não heartbeats) e
+        # enfileira para publicação
+        if self.history is not None and data is not None:
+            self.history.record(tag, value, data_ts_ms(data, self.encoders.timestamp))
+        if self.frames is not None and data is not None:
+            self.frames.update(tag, value)
+        await self.pipeline.put(tag, value, data)
+
+    async def answer_history(self, msg, tag: Tag):
+        topic = msg.topic[len(HIST_REQ):]
+        req: dict = {}
+        try:
+            req = json.loads(msg.payload.decode("utf-8") or "{}")
+            if not isinstance(req, dict):
+                raise ValueError("pedido deve ser um objeto JSON")
+            resp = self.history.query(tag, req)
+        except (ValueError, TypeError, OverflowError) as e:
+            req = req if isinstance(req, dict) else {}
+            resp = {"id": req.get("id"), "tag": tag.name, "error": str(e)}
+        props = getattr(msg, "properties", None)
+        reply = getattr(props, "ResponseTopic", None)
+        if not reply and "reply_to" in req:
+            reply = req["reply_to"]
+            if not (isinstance(reply, str) and reply and "+" not in reply and "#" not in reply
+                    and len(reply.encode("utf-8")) <= 0xFFFF):
+                # tópico inválido derrubaria o publish (e a conexão): responde no padrão
+                resp = {"id": req.get("id"), "tag": tag.name,
+                        "error": "reply_to deve ser um tópico não vazio, sem + ou #"}
+                reply = None
+        reply = reply or f"{HIST_TOP}/resp/{topic}"
+        await self.mqtt.publish(reply, json.dumps(resp, separators=(",", ":")), qos=MQTT_QOS,
+                                retain=False, properties=reply_props(props))
+
+    async def publish_value(self, tag: Tag, value, data=None):
+        ts_ms = data_ts_ms(data, self.encoders.timestamp)
+        payload = tag.encoder.encode(tag, value, ts_ms)
+        if self.outbox is not None and (not self.mqtt_up or self.outbox.pending()):
+            # MQTT fora ou backlog ainda republicando: vai para o disco, em ordem
+            self.outbox.append(tag.sensor_topic, payload, ts_ms)
+            return
+        try:
+            await self.link.publish_sensor(tag.sensor_topic, payload)
+        except MqttError:
+            if self.outbox is None:
+                raise
+            self.link.up = False
+            self.outbox.append(tag.sensor_topic, payload, ts_ms)
+            return
+        tag.published += 1
+        if data is not None:
+            self.publish_latency.observe(time.time_ns() / 1e6 - ts_ms)
+
+    async def replay_outbox(self):
+        # republica o backlog em lotes a cada 100 ms (taxa ~OB_RATE msgs/s);
+        # se o publish falhar, volta o leitor e deixa MqttLink.supervisor() reconectar
+        ob = self.outbox
+        per_tick = max(1, int(OB_RATE / 10))
+        last_sync = time.monotonic()
+        while True:
+            if ob.pending():
+                batch = ob.read(per_tick)
+                try:
+                    for _, topic, payload in batch:
+                        await self.link.publish_sensor(topic, payload)
+                except Exception:
+                    ob.rewind()
+                    raise
+                ob.ack()
+                ob.replayed += len(batch)
+                if not ob.pending():
+                    logger.info(f"Outbox drenado ({ob.replayed} republicadas, {ob.expired} expiradas)")
+            if time.monotonic() - last_sync >= 1.0:
+                ob.sync()
+                last_sync = time.monotonic()
+            await asyncio.sleep(0.1)
+
+    async def publish_status(self):
+        # resumo das métricas (metrics.snapshot) a cada MET_INT segundos
+        topic = f"{MET_TOP}/{self.name}"
+        while True:
+            payload = snapshot(self)
+            payload["ts"] = utc_iso()
+            await self.mqtt.publish(topic, json.dumps(payload), qos=MQTT_QOS, retain=False)
+            await asyncio.sleep(MET_INT)
+
+    async def publish_command_status(self, tag: Tag, value, status: ua.StatusCode, coalesced: int = 1):
         payload = {
             "value": value,
-            "type": vtype,
+            "ok": status.is_good(),
+            "status": status.name,
+            "coalesced": coalesced,
             "ts": utc_iso()
         }
-        await self.mqtt.publish(topic, json.dumps(payload), qos=MQTT_QOS, retain=MQTT_RET)
+        await self.mqtt.publish(f"{TOP_CST}/{tag.topic}", json.dumps(payload), qos=MQTT_QOS, retain=False)
 
-    async def mqtt_listener(self):
-        assert self.mqtt is not None
-        async with self.mqtt.unfiltered_messages() as messages:
-            await self.mqtt.subscribe(f"{TOP_CMD}/#", qos=MQTT_QOS)
-            async for msg in messages:
-                try:
-                    payload = json.loads(msg.payload.decode("utf-8"))
-                except Exception as e:
-                    logger.error(f"JSON inválido em {msg.topic}: {e}")
-                    continue
+    async def on_command(self, tag: Tag, raw_payload: bytes):
+        # comando já roteado pelo MqttLink para a tag deste endpoint
+        try:
+            payload = json.loads(raw_payload.decode("utf-8"))
+        except Exception as e:
+            logger.error(f"JSON inválido no comando para {tag.name}: {e}")
+            return
 
-                # topic = planta/comandos/<topicTag>
-                parts = msg.topic.split("/")
-                tag_topic = "/".join(parts[2:])
-                for tag_name, info in tags_cfg.items():
-                    if info["topic"] == tag_topic:
-                        try:
-                            node = self.nodes[tag_name]
-                            await node.write_value(to_variant(payload["value"], info["type"]))
-                            logger.info(f"WRITE {tag_name}={payload['value']}")
-                        except Exception as ex:
-                            logger.exception(f"Erro write {tag_name}: {ex}")
-                        break
+        # payload que não é {"value": ...} ou valor que não cabe no
+        # tipo da tag: responde BadTypeMismatch e segue escutando
+        raw = payload.get("value") if isinstance(payload, dict) else None
+        try:
+            if not isinstance(payload, dict) or "value" not in payload:
+                raise ValueError('esperado um objeto JSON com "value"')
+            value = tag.coerce(raw)
+        except (TypeError, ValueError, OverflowError) as ex:
+            logger.error(f"Comando inválido para {tag.name}: {ex}")
+            if isinstance(raw, float) and not math.isfinite(raw):
+                raw = None              # sem Infinity/NaN no JSON de status
+            await self.publish_command_status(
+                tag, raw, ua.StatusCode(ua.StatusCodes.BadTypeMismatch))
+            return
+        # agrupa com outros comandos da janela num único Write
+        tag.writes += 1
+        self.writer.submit(tag, value)
 
     # ----- OPC UA -----
-    @retry(wait=wait_fixed(5), stop=stop_after_attempt(100))
     async def connect_opc(self):
         logger.debug("-> connect_opc() chamado")
-        logger.info(f"OPC UA conectando em {OPC_EP}")
-        self.opc_client = Client(OPC_EP)
+        logger.info(f"OPC UA conectando em {self.ep['endpoint']}")
+        self.opc_client = Client(self.ep["endpoint"])
         self.opc_client.application_uri = f"urn:{socket.gethostname()}:gateway-client"
         try:
-            sec = _resolve_sec_string(SEC)
-            if sec:
-                logger.debug(f"Aplicando security: {sec}")
-                await self.opc_client.set_security_string(sec)
+            if self.security:
+                await self.security.apply(self.opc_client)
 
-            if USER and PASS:
-                self.opc_client.set_user(USER)
-                self.opc_client.set_password(PASS)
+            if self.ep["username"] and self.ep["password"]:
+                self.opc_client.set_user(self.ep["username"])
+                self.opc_client.set_password(self.ep["password"])
 
             await self.opc_client.connect()
             logger.success("OPC UA conectado.")
         except Exception as e:
+            if self.security:
+                # servidor com certificado novo não responde ao canal cifrado
+                # com o antigo (só dá timeout): a próxima tentativa busca de novo
+                self.security.forget_server_cert()
             logger.exception(f"Falha ao conectar OPC UA: {e}")
             raise
 
-    # ----- Loop principal -----
-    async def run(self):
-        logger.debug("Entrou em run(), iniciando loop principal")
-        while self.running:
-            try:
-                # 1) MQTT primeiro
-                await self.connect_mqtt()
+    async def disconnect_opc(self):
+        if self.opc_client is None:
+            return
+        try:
+            await self.opc_client.disconnect()
+        except Exception as e:
+            logger.debug(f"disconnect OPC UA: {e}")
+        self.opc_client = None
+        self._session_token = None
+        self._sub_lost = None
+        self.subs = {}
+
+    def opc_connected(self) -> bool:
+        proto = self.opc_client.uaclient.protocol if self.opc_client else None
+        return proto is not None and proto.state == proto.OPEN
 
-                # 2) OPC UA em seguida
-                await self.connect_opc()
+    async def setup_opc(self):
+        # sessão nova: resolve os nodes do tags.yaml e monta subscriptions/leituras
+        async with self._opc_lock:
+            limits = await read_operation_limits(self.opc_client)
+            if self.discovery is not None:
+                await self.discover(limits)
+            self.registry.bind(self.opc_client)
+            self.writer.max_nodes_per_write = limits["MaxNodesPerWrite"]
+            self._read_limit = limits["MaxNodesPerRead"]
+            if PUB_MODE == "cyclic":
+                # Read em lote a cada PUB_INT
+                self.cyclic.prepare(self._read_limit)
+            else:
+                # subscriptions on_change
+                await self.create_subscriptions(limits["MaxMonitoredItemsPerCall"])
 
-                # 3) Subscription on_change
-                handler = DataChangeHandler(self)
-                self.sub = await self.opc_client.create_subscription(100, handler)
-                await self.sub.subscribe_data_change(list(self.nodes.values()))
-                logger.info("Subscription criada (on_change).")
+    async def watch_opc(self):
+        # socket fechado aparece no estado do protocolo na hora; o watchdog do
+        # asyncua só percebe quando a requisição pendente estoura o timeout
+        while True:
+            proto = self.opc_client.uaclient.protocol
+            if proto is None or proto.state == proto.CLOSED:
+                raise ConnectionError("conexão OPC UA fechada")
+            if self._sub_lost is not None:
+                raise ConnectionError(f"subscription encerrada pelo servidor ({self._sub_lost.name})")
+            await self.opc_client.check_connection()
+            await asyncio.sleep(0.2)
 
-                # 4) Fica escutando mensagens MQTT (o subscription chama publish_value internamente)
-                await self.mqtt_listener()
+    def subscription_lost(self, status: ua.StatusCode):
+        # a sessão perdeu a subscription: não serve mais para retomar
+        self._session_token = None
+        self._sub_lost = status
 
+    async def opc_supervisor(self):
+        loop = asyncio.get_running_loop()
+        backoff = Backoff(RC_MIN, RC_MAX)
+        while self.running:
+            started = loop.time()
+            try:
+                resumed = False
+                if self._session_token is not None:
+                    # mesma sessão num canal novo: subscriptions continuam valendo
+                    resumed = await resume_session(self.opc_client, self._session_token)
+                    if resumed:
+                        logger.success("Sessão OPC UA retomada (subscriptions mantidas).")
+                if not resumed:
+                    # cliente anterior que não vai ser retomado (ex.: tags.yaml
+                    # recarregado com a sessão fora) é fechado antes do novo
+                    await self.disconnect_opc()
+                    await self.connect_opc()
+                    await self.setup_opc()
+                    # só depois do setup completo vale retomar esta sessão
+                    self._session_token = self.opc_client.uaclient.protocol.authentication_token
+                tasks = [self.watch_opc()]
+                if PUB_MODE == "cyclic":
+                    tasks.append(self.cyclic.run(self.opc_client))
+                await run_all(*tasks)
             except Exception as e:
-                logger.error(f"Gateway caiu: {e}")
-                # desmonta tudo e tenta de novo
-                if self.mqtt:
-                    await self.mqtt.disconnect()
-                await self.disconnect_opc()
-                await asyncio.sleep(5)
+                logger.error(f"OPC UA caiu: {e!r}")
+                if self._session_token is None:
+                    # conexão/setup não concluídos ou sessão sem volta: fecha
+                    # já, para não deixar sessão viva no servidor (e as tarefas
+                    # de keepalive/publish do cliente) a cada tentativa
+                    await self.disconnect_opc()
+            if loop.time() - started >= RC_OK:
+                backoff.reset()
+            delay = backoff.next()
+            logger.info(f"OPC UA: nova tentativa em {delay:.2f} s")
+            await asyncio.sleep(delay)
 
+    # ----- Loop principal -----
+    async def run(self):
+        logger.debug("Entrou em run(), iniciando supervisores")
+        # MQTT (MqttLink, em geral do worker) e OPC UA reconectam cada um
+        # por si; a fila de publicação e o outbox fazem a ponte enquanto um
+        # dos lados está fora
+        tasks = [self.opc_supervisor()]
+        if self.outbox is not None:
+            # com outbox os publicadores não esperam o MQTT: com o broker fora
+            # já na partida, publish_value() manda tudo para o disco
+            self.pipeline.start()
+        if self._own_link:
+            tasks.append(self.link.supervisor())
+        if TR_ON and self.ep.get("tags_map"):
+            tasks.append(self.watch_tags())
+        await run_all(*tasks)
 
-    async def cyclic_publisher(self):
+    # ----- Recarga do tags.yaml -----
+    async def watch_tags(self):
+        # polling do mtime (sem dependência de watchdog); editores que salvam
+        # em duas etapas podem gerar uma leitura parcial, que falha no parse
+        # e é refeita na próxima mudança
+        path = BASE_DIR / self.ep["tags_map"]
+        last = path.stat().st_mtime_ns if path.exists() else None
         while True:
-            for tag_name, info in tags_cfg.items():
+            await asyncio.sleep(TR_INT)
+            try:
+                mtime = path.stat().st_mtime_ns
+            except OSError:
+                continue
+            if mtime == last:
+                continue
+            last = mtime
+            try:
+                manual = load_tags(self.ep["tags_map"])
+                found = self.discovery.tags if self.discovery is not None else {}
+                await self.apply_tags(merge_tags(manual, found))
+                self._manual = manual
+            except Exception as e:
+                logger.error(f"{self.ep['tags_map']} não aplicado, mantendo o mapa atual: {e!r}")
+
+    async def apply_tags(self, new_cfg: dict):
+        """Aplica um tags.yaml novo sem derrubar sessão, subscriptions nem MQTT.
+
+        Tags alteradas são trocadas (monitored item removido e recriado com
+        handle novo); as demais seguem intocadas.
+        """
+        async with self._opc_lock:
+            diff = self._update_registry(new_cfg)
+            if diff is None:
+                return
+            old, new, (added, removed, changed) = diff
+            if not self.opc_connected():
+                # sessão fora: a próxima conexão faz o setup completo em vez
+                # de retomar subscriptions com o mapa antigo
+                self._session_token = None
+            else:
                 try:
-                    val = await self.nodes[tag_name].read_value()
-                    await self.publish_value(tag_name, val, info["type"])
-                except Exception as e:
-                    logger.exception(f"Leitura falhou ({tag_name}): {e}")
-                    raise  # força reconectar
-            await asyncio.sleep(PUB_INT)
+                    self.registry.bind(self.opc_client, new)
+                    if PUB_MODE == "cyclic":
+                        self.cyclic.prepare(self._read_limit)
+                    else:
+                        await self.unmonitor(old)
+                        await self.monitor(new)
+                        await self.prune_subscriptions()
+                except Exception:
+                    self._session_token = None
+                    raise
+        logger.info(f"{self.ep['tags_map']} recarregado: +{len(added)} -{len(removed)} "
+                    f"~{len(changed)} ({len(self.registry)} tags)")
+        await self.update_command_topics()
+
+    def _update_registry(self, new_cfg: dict):
+        """Troca no registry só as tags que mudaram; None se nada mudou.
+
+        Retorna (tags removidas, tags criadas, (novas, removidas, alteradas)).
+        Não toca no servidor: monitored items ficam por conta de quem chama.
+        """
+        # valida o mapa inteiro (índices e filtros) antes de mexer em qualquer
+        # coisa: uma falha no meio deixaria o registry pela metade
+        TagRegistry(new_cfg, TOP_SENS)
+        for name, info in (new_cfg or {}).items():
+            FilterSpec.from_cfg(name, info)
+        added, removed, changed = self.registry.diff(new_cfg)
+        if not (added or removed or changed):
+            return None
+        old = [self.registry.remove(n) for n in removed + changed]
+        for tag in old:
+            self.filters.cancel(tag)
+        if self.frames is not None:
+            self.frames.forget(old)
+        new = [self.registry.add(n, new_cfg[n]) for n in added + changed]
+        prev = {t.name: t for t in old}
+        for tag in new:
+            tag.encoder = self.encoders.for_topic(tag.topic)
+            self.filters.attach(tag)
+            if tag.name in prev and prev[tag.name].node_id == tag.node_id:
+                tag.history = prev[tag.name].history     # mesma variável: mantém a série
+        self.ep["tags"] = new_cfg
+        return old, new, (added, removed, changed)
+
+    async def discover(self, limits: dict[str, int]):
+        # chamado no setup de uma sessão nova, antes de montar as
+        # subscriptions; falha na descoberta mantém o mapa atual
+        try:
+            found = await self.discovery.run(self.opc_client, limits)
+        except (ValueError, ua.UaStatusCodeError) as e:
+            logger.error(f"Descoberta falhou, mantendo {len(self.registry)} tags: {e!r}")
+            return
+        diff = self._update_registry(merge_tags(self._manual, found))
+        if diff is not None:
+            added, removed, changed = diff[2]
+            logger.info(f"Descoberta aplicada: +{len(added)} -{len(removed)} ~{len(changed)} "
+                        f"({len(self.registry)} tags)")
+            await self.update_command_topics()
+
+    async def update_command_topics(self):
+        await self.link.update_subscriptions()
+
+    async def create_subscriptions(self, max_per_call: int = 0):
+        # uma subscription por publishing interval: tags lentas não pagam
+        # pelo ritmo das rápidas
+        self.subs = {}
+        self._mi_handler = DataChangeHandler(self)
+        caps = [b for b in (max_per_call, SUB_BATCH) if b > 0]
+        self._mi_batch = min(caps) if caps else 0
+        await self.monitor(self.registry)
+
+    async def monitor(self, tags):
+        # cria os monitored items na subscription do intervalo de cada tag,
+        # abrindo a subscription se ainda não existir
+        for ms, group in sorted(group_by_interval(tags, SUB_MS).items()):
+            sub = self.subs.get(ms)
+            created = sub is None
+            if created:
+                sub = await self.opc_client.create_subscription(ms, self._mi_handler)
+                self.subs[ms] = sub
+            for block in chunked(group, self._mi_batch):
+                await self.subscribe_tags(sub, list(block), ms)
+            logger.info(f"Subscription {ms:g} ms {'criada' if created else 'atualizada'} "
+                        f"(on_change, +{len(group)} tags).")
+
+    async def unmonitor(self, tags):
+        by_ms: dict[float, list[int]] = {}
+        for tag in tags:
+            if tag.mi_id is not None and tag.sub_ms in self.subs:
+                by_ms.setdefault(tag.sub_ms, []).append(tag.mi_id)
+            tag.mi_id = tag.sub_ms = None
+        for ms, ids in by_ms.items():
+            for block in chunked(ids, self._mi_batch):
+                await self.subs[ms].unsubscribe(list(block))
+
+    async def prune_subscriptions(self):
+        # grupo sem tags: não vale manter PublishRequests para ele
+        used = {t.sub_ms for t in self.registry}
+        for ms in [ms for ms in self.subs if ms not in used]:
+            sub = self.subs.pop(ms)
+            await sub.delete()
+            logger.info(f"Subscription {ms:g} ms removida (sem tags).")
+
+    @staticmethod
+    def _monitored_item(tag: Tag, group_ms: float, with_filter: bool = True) -> ua.MonitoredItemCreateRequest:
+        # ClientHandle = tag.handle, para o handler resolver a tag direto
+        # pelo handle da notificação
+        rv = ua.ReadValueId()
+        rv.NodeId = tag.node_id
+        rv.AttributeId = ua.AttributeIds.Value
+        mparams = ua.MonitoringParameters()
+        mparams.ClientHandle = tag.handle
+        mparams.SamplingInterval = tag.sampling_ms if tag.sampling_ms is not None else group_ms
+        mparams.QueueSize = tag.queue_size
+        mparams.DiscardOldest = True
+        if with_filter and tag.filter is not None:
+            mfilter = tag.filter.spec.ua_filter()
+            if mfilter is not None:
+                mparams.Filter = mfilter
+        mir = ua.MonitoredItemCreateRequest()
+        mir.ItemToMonitor = rv
+        mir.MonitoringMode = ua.MonitoringMode.Reporting
+        mir.RequestedParameters = mparams
+        return mir
+
+    async def subscribe_tags(self, sub, tags: list[Tag], group_ms: float):
+        results = await sub.create_monitored_items([self._monitored_item(t, group_ms) for t in tags])
+
+        # servidor recusou o DataChangeFilter: recria sem filtro e aplica o
+        # deadband no cliente
+        retry_idx = [i for i, (tag, res) in enumerate(zip(tags, results))
+                     if isinstance(res, ua.StatusCode) and res.value in FILTER_REJECTED
+                     and tag.filter is not None]
+        if retry_idx:
+            logger.warning(f"Servidor recusou deadband em {len(retry_idx)} tags; aplicando no cliente")
+            retried = await sub.create_monitored_items(
+                [self._monitored_item(tags[i], group_ms, with_filter=False) for i in retry_idx])
+            for i, res in zip(retry_idx, retried):
+                results[i] = res
+        retry_set = set(retry_idx)
+
+        for i, (tag, res) in enumerate(zip(tags, results)):
+            if isinstance(res, ua.StatusCode):
+                logger.error(f"Falha ao monitorar {tag.name} ({tag.node_id.to_string()}): {res}")
+                continue
+            tag.mi_id, tag.sub_ms = res, group_ms
+            self.filters.server_result(tag, accepted=i not in retry_set)
+        return results
 
 class DataChangeHandler:
     def __init__(self, gw):
         self.gw = gw
 
     async def datachange_notification(self, node, val, data):
-        for tag_name, n in self.gw.nodes.items():
-            if n == node:
-                await self.gw.publish_value(tag_name, val, tags_cfg[tag_name]["type"])
-                break
+        tag = self.gw.registry.by_handle(data.subscription_data.client_handle) \
+            or self.gw.registry.by_node(node)
+        if tag is None:
+            return
+        tag.notifications += 1
+        # filtros do tags.yaml e depois só enfileira: um broker lento não
+        # segura o callback da subscription (exceto na política "block", que
+        # aplica backpressure de propósito)
+        await self.gw.filters.on_change(tag, val, data)
+
+    async def status_change_notification(self, status: ua.StatusChangeNotification):
+        # BadTimeout, BadShutdown...: a subscription parou no servidor.
+        # watch_opc() derruba a conexão e o opc_supervisor reconecta do zero
+        # (sem retomar a sessão, que ficou sem a subscription)
+        logger.warning(f"Subscription mudou de status: {status.Status.name}")
+        if not status.Status.is_good():
+            self.gw.subscription_lost(status.Status)
 
     async def event_notification(self, event):
         pass
 
-if __name__ == "__main__":
-    # 1) Redireciona logs para console também
+# ----------------- Processos -----------------
+def setup_logging(suffix: str = ""):
+    # Redireciona logs para console também; {extra[ep]} = endpoint da tarefa
     logger.remove()  # limpa handlers padrões
-    logger.add(sys.stdout, format="{time:HH:mm:ss} | {level} | {message}", level="DEBUG")
-    logger.add("gateway.log", rotation="1 MB", retention="7 days", level="DEBUG")
+    logger.configure(extra={"ep": "-"})
+    logger.add(sys.stdout, format="{time:HH:mm:ss} | {level} | {extra[ep]} | {message}", level="DEBUG")
+    logger.add(f"gateway{suffix}.log", rotation="1 MB", retention="7 days", level="DEBUG")
+
 
+async def run_gateways(eps: list[dict], idx: int = 0, workers: int = 1):
+    # uma sessão OPC UA independente por endpoint e uma conexão MQTT para
+    # todos, no mesmo loop; o contexto do loguru é herdado por todas as
+    # tarefas criadas a partir de gw.run() / link.supervisor()
+    link = MqttLink(workers)
+    names = []
+    tasks = []
+    for ep in eps:
+        with logger.contextualize(ep=ep["name"]):
+            gw = OpcUaMqttGateway(ep, link)
+            names.append(f"Gateway {ep['name']}")
+            tasks.append(asyncio.create_task(gw.run(), name=f"gw-{ep['name']}"))
+    with logger.contextualize(ep="mqtt"):
+        names.append("MQTT")
+        tasks.append(asyncio.create_task(link.supervisor(), name="mqtt"))
+    metrics_srv = None
+    if MET_PORT:
+        # um endpoint /metrics por processo, com todos os seus gateways
+        try:
+            metrics_srv = await serve_metrics(link, MET_HOST, MET_PORT + idx, MET_TAGS)
+        except OSError as e:
+            logger.error(f"Endpoint de métricas indisponível em {MET_HOST}:{MET_PORT + idx}: {e}")
+    for name, res in zip(names, await asyncio.gather(*tasks, return_exceptions=True)):
+        if isinstance(res, BaseException):
+            logger.opt(exception=res).error(f"{name} terminou com erro")
+    if metrics_srv is not None:
+        metrics_srv.close()
+
+
+def worker_main(idx: int, eps: list[dict], workers: int):
+    setup_logging(f".w{idx}")
+    logger.info(f"Worker {idx}: {', '.join(ep['name'] for ep in eps)}")
+    try:
+        asyncio.run(run_gateways(eps, idx, workers))
+    except KeyboardInterrupt:
+        pass
+
+
+def check_frame_groups(shards: list[list[dict]]):
+    # cada worker tem a própria conexão e o próprio FrameBuilder: um grupo
+    # com tags em dois workers teria dois keyframes retidos, cada um com
+    # metade do grupo, se sobrescrevendo no broker
+    fb = FrameBuilder(FR_CFG)
+    owners: dict[str, set[int]] = {}
+    for i, shard in enumerate(shards):
+        for ep in shard:
+            for info in ep["tags"].values():
+                group = fb.group_of(str(info.get("topic", "")))
+                if group is not None:
+                    owners.setdefault(group, set()).add(i)
+    split = sorted(g for g, ws in owners.items() if len(ws) > 1)
+    if split:
+        logger.warning(f"Grupos de frames divididos entre processos ({', '.join(split)}): "
+                       f"use frames.groups por endpoint ou processes: 1")
+
+
+def supervise(shards: list[list[dict]]):
+    # um processo por shard; se um morrer (PLC problemático derrubando o
+    # worker), só ele é reiniciado
+    ctx = multiprocessing.get_context("spawn")
+
+    def start(i):
+        p = ctx.Process(target=worker_main, args=(i, shards[i], len(shards)), name=f"gw-worker-{i}", daemon=True)
+        p.start()
+        return p
+
+    procs = [start(i) for i in range(len(shards))]
+    while True:
+        time.sleep(1)
+        for i, p in enumerate(procs):
+            if not p.is_alive():
+                logger.error(f"Worker {i} saiu (exitcode={p.exitcode}); reiniciando em 5 s")
+                time.sleep(5)
+                procs[i] = start(i)
+
+
+if __name__ == "__main__":
+    setup_logging()
     logger.debug("=== INICIANDO GATEWAY OPC UA ⇆ MQTT ===")
-    gw = OpcUaMqttGateway()
     try:
-        asyncio.run(gw.run())
+        eps = load_endpoints()
+        shards = shard_endpoints(eps, max(1, min(PROCS, len(eps))))
+        if len(shards) == 1:
+            asyncio.run(run_gateways(eps))
+        else:
+            logger.info(f"{len(eps)} endpoints em {len(shards)} processos")
+            if FR_ON:
+                check_frame_groups(shards)
+            supervise(shards)
     except KeyboardInterrupt:
         logger.info("Encerrando (Ctrl+C)")
     except Exception as e:
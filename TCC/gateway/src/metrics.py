@@ -0,0 +1,219 @@
+"""
+Métricas do gateway: contadores, profundidade da fila e histogramas de latência.
+
+Expostas em texto no formato do Prometheus num endpoint HTTP local
+(GET /metrics, só stdlib/asyncio) e, opcionalmente, como JSON resumido num
+tópico MQTT de status. Cada componente já mantém seus próprios contadores
+(pipeline, filtros, writer, cíclico, outbox; por tag em Tag.*); aqui eles
+só são lidos na hora da coleta, sem custo extra no caminho quente além dos
+histogramas.
+
+Latências (ms):
+    publish: SourceTimestamp OPC UA (ou o escolhido em encoding.timestamp)
+             -> publish MQTT concluído
+    write:   chegada do comando MQTT -> resposta do Write OPC UA (para
+             comandos coalescidos, conta desde o primeiro da janela)
+"""
+
+from __future__ import annotations
+
+import asyncio
+from bisect import bisect_left
+
+from loguru import logger
+
+LATENCY_BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000)
+
+
+class Histogram:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets=LATENCY_BUCKETS_MS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)    # último = +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, v: float) -> None:
+        self.counts[bisect_left(self.buckets, v)] += 1
+        self.sum += v
+        self.count += 1
+
+    def quantile(self, q: float) -> float | None:
+        """Estimativa pelo limite superior do bucket (como o histogram_quantile).
+
+        No bucket +Inf vale o último limite finito, também como o
+        histogram_quantile, e o JSON de status não leva Infinity.
+        """
+        if not self.count:
+            return None
+        rank = q * self.count
+        acc = 0
+        for i, c in enumerate(self.counts[:-1]):
+            acc += c
+            if acc >= rank:
+                return self.buckets[i]
+        return self.buckets[-1]
+
+    def render(self, name: str, labels: str) -> list[str]:
+        out = []
+        acc = 0
+        for le, c in zip(self.buckets, self.counts):
+            acc += c
+            out.append(f'{name}_bucket{{{labels},le="{le}"}} {acc}')
+        out.append(f'{name}_bucket{{{labels},le="+Inf"}} {self.count}')
+        out.append(f"{name}_sum{{{labels}}} {self.sum:.3f}")
+        out.append(f"{name}_count{{{labels}}} {self.count}")
+        return out
+
+
+def _esc(v: str) -> str:
+    return v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+# nome, tipo, ajuda, função (gateway -> valor)
+_SCALARS = (
+    ("gateway_mqtt_up", "gauge", "1 se o MQTT está conectado", lambda g: int(g.mqtt_up)),
+    ("gateway_opcua_up", "gauge", "1 se a sessão OPC UA está ativa", lambda g: int(g.opc_connected())),
+    ("gateway_tags", "gauge", "Tags configuradas", lambda g: len(g.registry)),
+    ("gateway_notifications_total", "counter", "Notificações OPC UA recebidas",
+     lambda g: sum(t.notifications for t in g.registry)),
+    ("gateway_filter_suppressed_total", "counter", "Valores descartados pelos filtros de tag",
+     lambda g: g.filters.suppressed),
+    ("gateway_filter_heartbeats_total", "counter", "Republicações por max_silence_ms",
+     lambda g: g.filters.heartbeats),
+    ("gateway_queue_depth", "gauge", "Itens na fila de publicação", lambda g: len(g.pipeline)),
+    ("gateway_queue_capacity", "gauge", "Tamanho máximo da fila de publicação", lambda g: g.pipeline.maxsize),
+    ("gateway_enqueued_total", "counter", "Itens enfileirados", lambda g: g.pipeline.enqueued),
+    ("gateway_published_total", "counter", "Mensagens de sensor publicadas", lambda g: g.pipeline.published),
+    ("gateway_dropped_total", "counter", "Itens descartados por overflow da fila", lambda g: g.pipeline.dropped),
+    ("gateway_conflated_total", "counter", "Valores substituídos na fila (conflate)", lambda g: g.pipeline.conflated),
+    ("gateway_publish_failed_total", "counter", "Falhas de publicação", lambda g: g.pipeline.failed),
+    ("gateway_history_queries_total", "counter", "Consultas de histórico respondidas",
+     lambda g: g.history.queries if g.history is not None else 0),
+    ("gateway_history_bytes", "gauge", "Memória dos ring buffers de histórico",
+     lambda g: g.history.nbytes(g.registry) if g.history is not None else 0),
+    ("gateway_write_commands_total", "counter", "Comandos MQTT de escrita recebidos", lambda g: g.writer.commands),
+    ("gateway_write_coalesced_total", "counter", "Comandos absorvidos por coalescência", lambda g: g.writer.coalesced),
+    ("gateway_write_requests_total", "counter", "WriteRequests enviados", lambda g: g.writer.requests),
+    ("gateway_write_failed_total", "counter", "Escritas com status ruim", lambda g: g.writer.failed),
+    ("gateway_cyclic_cycles_total", "counter", "Ciclos de leitura (modo cíclico)", lambda g: g.cyclic.cycles),
+    ("gateway_cyclic_overruns_total", "counter", "Ciclos que estouraram o período", lambda g: g.cyclic.overruns),
+    ("gateway_cyclic_last_cycle_ms", "gauge", "Duração do último ciclo",
+     lambda g: round(g.cyclic.last_cycle_s * 1000, 3)),
+)
+
+# da conexão MQTT do processo (main.MqttLink), compartilhada pelos endpoints:
+# sem label de endpoint
+_LINK = (
+    ("gateway_frames_total", "counter", "Quadros agregados publicados (frames)",
+     lambda l: l.frames.frames if l.frames is not None else 0),
+    ("gateway_frame_values_total", "counter", "Valores enviados em quadros agregados",
+     lambda l: l.frames.values if l.frames is not None else 0),
+    ("gateway_frame_updates_total", "counter", "Mudanças de tag recebidas pelos quadros agregados",
+     lambda l: l.frames.updates if l.frames is not None else 0),
+    ("gateway_mqtt_topic_aliases", "gauge", "Topic aliases MQTT v5 em uso na conexão",
+     lambda l: len(l.aliases) if l.aliases is not None else 0),
+    ("gateway_mqtt_alias_bytes_saved_total", "counter", "Bytes de tópico economizados com topic alias",
+     lambda l: l.aliases.bytes_saved if l.aliases is not None else 0),
+)
+
+_OUTBOX = (
+    ("gateway_outbox_backlog", "gauge", "Mensagens no outbox aguardando republicação", lambda o: o.backlog()),
+    ("gateway_outbox_appended_total", "counter", "Mensagens gravadas no outbox", lambda o: o.appended),
+    ("gateway_outbox_replayed_total", "counter", "Mensagens republicadas do outbox", lambda o: o.replayed),
+    ("gateway_outbox_expired_total", "counter", "Mensagens expiradas no outbox", lambda o: o.expired),
+)
+
+_PER_TAG = (
+    ("gateway_tag_notifications_total", "Notificações OPC UA por tag", "notifications"),
+    ("gateway_tag_published_total", "Publicações MQTT por tag", "published"),
+    ("gateway_tag_dropped_total", "Valores descartados na fila por tag", "dropped"),
+    ("gateway_tag_writes_total", "Comandos de escrita por tag", "writes"),
+)
+
+
+def render(link, per_tag: bool = True) -> str:
+    gateways = link.gateways
+    lines: list[str] = []
+    labels = {gw: f'endpoint="{_esc(gw.name)}"' for gw in gateways}
+
+    def family(name, kind, doc, rows):
+        lines.append(f"# HELP {name} {doc}")
+        lines.append(f"# TYPE {name} {kind}")
+        lines.extend(rows)
+
+    for name, kind, doc, fn in _SCALARS:
+        family(name, kind, doc, [f"{name}{{{labels[gw]}}} {fn(gw)}" for gw in gateways])
+    for name, kind, doc, fn in _LINK:
+        family(name, kind, doc, [f"{name} {fn(link)}"])
+    with_outbox = [gw for gw in gateways if gw.outbox is not None]
+    if with_outbox:
+        for name, kind, doc, fn in _OUTBOX:
+            family(name, kind, doc, [f"{name}{{{labels[gw]}}} {fn(gw.outbox)}" for gw in with_outbox])
+    for name, doc, hist in (("gateway_publish_latency_ms", "OPC UA source timestamp -> publish MQTT", "publish_latency"),
+                            ("gateway_write_latency_ms", "Comando MQTT -> Write OPC UA concluído", "write_latency")):
+        rows = []
+        for gw in gateways:
+            rows.extend(getattr(gw, hist).render(name, labels[gw]))
+        family(name, "histogram", doc, rows)
+    if per_tag:
+        for name, doc, attr in _PER_TAG:
+            family(name, "counter", doc, [
+                f'{name}{{{labels[gw]},tag="{_esc(t.name)}"}} {getattr(t, attr)}'
+                for gw in gateways for t in gw.registry])
+    lines.append("")
+    return "\n".join(lines)
+
+
+def snapshot(gw) -> dict:
+    """Resumo para o tópico MQTT de status."""
+    p = gw.pipeline
+    snap = {
+        "mqtt_up": gw.mqtt_up,
+        "opcua_up": gw.opc_connected(),
+        "tags": len(gw.registry),
+        "notifications": sum(t.notifications for t in gw.registry),
+        "published": p.published,
+        "dropped": p.dropped,
+        "conflated": p.conflated,
+        "failed": p.failed,
+        "queue_depth": len(p),
+        "suppressed": gw.filters.suppressed,
+        "write_commands": gw.writer.commands,
+        "write_failed": gw.writer.failed,
+        "publish_latency_ms": {"p50": gw.publish_latency.quantile(0.5),
+                               "p99": gw.publish_latency.quantile(0.99)},
+        "write_latency_ms": {"p50": gw.write_latency.quantile(0.5),
+                             "p99": gw.write_latency.quantile(0.99)},
+    }
+    if gw.outbox is not None:
+        snap["outbox_backlog"] = gw.outbox.backlog()
+    return snap
+
+
+async def serve_metrics(link, host: str, port: int, per_tag: bool = True) -> asyncio.base_events.Server:
+    """GET /metrics em http://host:port (HTTP/1.0 mínimo, uma resposta por conexão)."""
+
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            request = await asyncio.wait_for(reader.readline(), 5)
+            while (await asyncio.wait_for(reader.readline(), 5)) not in (b"\r\n", b"\n", b""):
+                pass
+            parts = request.decode("latin-1").split()
+            if len(parts) >= 2 and parts[0] == "GET" and parts[1].split("?")[0] == "/metrics":
+                body = render(link, per_tag).encode()
+                head = "HTTP/1.0 200 OK\r\nContent-Type: text/plain; version=0.0.4; charset=utf-8\r\n"
+            else:
+                body = b"not found\n"
+                head = "HTTP/1.0 404 Not Found\r\nContent-Type: text/plain\r\n"
+            writer.write(f"{head}Content-Length: {len(body)}\r\n\r\n".encode() + body)
+            await writer.drain()
+        except (asyncio.TimeoutError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    server = await asyncio.start_server(handle, host, port)
+    logger.info(f"Métricas em http://{host}:{port}/metrics")
+    return server
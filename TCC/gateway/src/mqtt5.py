@@ -0,0 +1,99 @@
+"""
+Modo MQTT v5 do gateway (config.yaml -> mqtt.protocol: 5).
+
+- Topic aliases: na primeira publicação de um tópico de sensor o gateway
+  manda o tópico completo junto com um alias (1..N); daí em diante manda
+  tópico vazio + alias. Para payloads numéricos pequenos o tópico
+  (planta/sensores/PLCData/...) é a maior parte dos bytes. N é o menor entre
+  o configurado e o TopicAliasMaximum do CONNACK (0 se o broker não aceita
+  aliases). Aliases valem por conexão: a tabela recomeça a cada reconexão, e
+  tópicos além do limite seguem com o nome completo.
+- Message expiry: MessageExpiryInterval nos valores de sensor. Um valor
+  retido ou na fila de uma sessão offline expira no broker em vez de ser
+  entregue velho.
+- Shared subscriptions: os comandos são assinados como
+  $share/<grupo>/planta/comandos/...; com várias réplicas do gateway no mesmo
+  grupo, cada comando chega a uma só (sem escrita duplicada no CLP).
+
+Usa só o suporte a v5 do paho-mqtt 1.6 por baixo do asyncio-mqtt.
+"""
+
+from __future__ import annotations
+
+from asyncio_mqtt import Client as MqttClient, ProtocolVersion
+from paho.mqtt.packettypes import PacketTypes
+from paho.mqtt.properties import Properties
+
+
+class MqttV5Client(MqttClient):
+    """asyncio-mqtt em v5, guardando o TopicAliasMaximum do CONNACK."""
+
+    def __init__(self, hostname: str, port: int = 1883, **kwargs):
+        super().__init__(hostname, port, protocol=ProtocolVersion.V5, **kwargs)
+        self.server_alias_max = 0
+
+    def _on_connect(self, client, userdata, flags, rc, properties=None):
+        self.server_alias_max = getattr(properties, "TopicAliasMaximum", 0) or 0
+        super()._on_connect(client, userdata, flags, rc, properties)
+
+
+def _props(alias: int | None = None, expiry_s: int = 0) -> Properties | None:
+    if not alias and not expiry_s:
+        return None
+    props = Properties(PacketTypes.PUBLISH)
+    if alias:
+        props.TopicAlias = alias
+    if expiry_s:
+        props.MessageExpiryInterval = expiry_s
+    return props
+
+
+class TopicAliases:
+    """Tabela tópico -> alias de uma conexão, com as Properties prontas."""
+
+    def __init__(self, limit: int, expiry_s: int = 0):
+        self.limit = limit
+        self.expiry_s = expiry_s
+        self.maximum = 0
+        self._props: dict[str, Properties] = {}
+        self._plain = _props(expiry_s=expiry_s)
+        self.bytes_saved = 0
+
+    def reset(self, server_max: int) -> None:
+        """Conexão nova: aliases anteriores não valem mais."""
+        self.maximum = min(self.limit, server_max)
+        self._props = {}
+
+    def __len__(self) -> int:
+        return len(self._props)
+
+    def resolve(self, topic: str) -> tuple[str, Properties | None]:
+        """(tópico a enviar, Properties) para uma publicação de sensor.
+
+        Deve ser chamado na ordem em que as mensagens são entregues ao paho
+        (o publish dele é síncrono), para o alias chegar ao broker junto com
+        o tópico antes de ser usado sozinho.
+        """
+        props = self._props.get(topic)
+        if props is not None:
+            self.bytes_saved += len(topic)
+            return "", props
+        if len(self._props) >= self.maximum:
+            return topic, self._plain
+        props = _props(len(self._props) + 1, self.expiry_s)
+        self._props[topic] = props
+        return topic, props
+
+
+def reply_props(request_props) -> Properties | None:
+    """Properties da resposta a um pedido v5: devolve a CorrelationData."""
+    corr = getattr(request_props, "CorrelationData", None)
+    if corr is None:
+        return None
+    props = Properties(PacketTypes.PUBLISH)
+    props.CorrelationData = corr
+    return props
+
+
+def shared(topic: str, group: str | None) -> str:
+    return f"$share/{group}/{topic}" if group else topic
@@ -0,0 +1,40 @@
+"""
+Limites de operação do servidor OPC UA (Server.ServerCapabilities.OperationLimits).
+
+Usados para dividir Read/Write/CreateMonitoredItems/Browse em blocos que o servidor
+aceite. 0 significa "sem limite" (padrão da especificação).
+"""
+
+from __future__ import annotations
+
+from typing import Iterator, Sequence
+
+from asyncua import Client, ua
+from loguru import logger
+
+LIMITS = ("MaxNodesPerRead", "MaxNodesPerWrite", "MaxMonitoredItemsPerCall", "MaxNodesPerBrowse")
+
+
+async def read_operation_limits(client: Client) -> dict[str, int]:
+    nodeids = [ua.NodeId(getattr(ua.ObjectIds, f"Server_ServerCapabilities_OperationLimits_{n}"))
+               for n in LIMITS]
+    limits = dict.fromkeys(LIMITS, 0)
+    try:
+        results = await client.uaclient.read_attributes(nodeids, ua.AttributeIds.Value)
+    except Exception as e:
+        logger.warning(f"Não foi possível ler OperationLimits: {e}")
+        return limits
+    for name, dv in zip(LIMITS, results):
+        if dv.StatusCode.is_good() and dv.Value is not None and dv.Value.Value:
+            limits[name] = int(dv.Value.Value)
+    logger.debug(f"OperationLimits do servidor: {limits}")
+    return limits
+
+
+def chunked(seq: Sequence, size: int) -> Iterator[Sequence]:
+    """Fatias de no máximo `size` itens (size <= 0: tudo de uma vez)."""
+    if size <= 0 or len(seq) <= size:
+        yield seq
+        return
+    for i in range(0, len(seq), size):
+        yield seq[i:i + size]
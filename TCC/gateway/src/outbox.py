@@ -0,0 +1,253 @@
+"""
+Outbox em disco (store-and-forward) para mensagens de sensor.
+
+Enquanto o MQTT está fora, as mensagens já codificadas são anexadas a
+segmentos de tamanho fixo, pré-alocados e mapeados em memória (mmap). Na
+reconexão são republicadas em ordem, com taxa limitada; enquanto houver
+backlog, as mensagens novas também passam pelo outbox, para não furarem a
+fila.
+
+Formato do segmento (<n>.seg):
+    16 bytes de cabeçalho: MAGIC (8) + q primeiro seq do segmento
+    registros:
+        I  tamanho do corpo (0 = fim dos dados)
+        I  crc32 do corpo
+        corpo: q seq | q ts_ms | H len(tópico) | tópico | payload
+
+Cada registro tem um `seq` crescente. O arquivo `cursor` guarda o último seq
+já republicado (marcador de deduplicação): após um restart a republicação
+continua depois dele, sem reenviar o que já saiu.
+
+Limites: `max_bytes` descarta os segmentos mais antigos; `max_age_s`
+descarta na republicação registros velhos demais para ainda interessarem.
+"""
+
+from __future__ import annotations
+
+import mmap
+import os
+import struct
+import time
+import zlib
+from pathlib import Path
+
+from loguru import logger
+
+MAGIC = b"GWOUTB01"
+_SEG = struct.Struct("<8sq")
+_HDR = struct.Struct("<II")
+_BODY = struct.Struct("<qqH")
+_END = b"\0" * _HDR.size
+
+
+class Outbox:
+    def __init__(self, path: Path, segment_bytes: int = 4 << 20,
+                 max_bytes: int = 256 << 20, max_age_s: float = 24 * 3600):
+        self.path = Path(path)
+        self.segment_bytes = segment_bytes
+        self.max_bytes = max(max_bytes, 2 * segment_bytes)
+        self.max_age_ms = int(max_age_s * 1000)
+
+        self._segs: list[int] = []          # números dos segmentos, em ordem
+        self._wfile = None
+        self._wmap: mmap.mmap | None = None
+        self._woff = _SEG.size
+        self._rmaps: dict[int, mmap.mmap] = {}
+        self._seq = 0                        # último seq escrito
+        self._acked = 0                      # último seq republicado
+        self._read = (0, _SEG.size)          # (segmento, offset) do próximo registro
+        self._read_seq = 0                   # maior seq já percorrido pelo leitor
+        self._commit = self._read
+        self._acked_dirty = False
+
+        # contadores
+        self.appended = 0
+        self.replayed = 0
+        self.expired = 0
+        self.dropped_segments = 0
+
+    # ----- abertura / recuperação -----
+    def open(self) -> None:
+        self.path.mkdir(parents=True, exist_ok=True)
+        cur = self.path / "cursor"
+        if cur.exists():
+            try:
+                self._acked = int(cur.read_text().strip() or 0)
+            except ValueError:
+                logger.warning(f"Cursor do outbox inválido em {cur}; republicando tudo")
+        self._segs = sorted(int(p.stem) for p in self.path.glob("*.seg"))
+        if self._segs:
+            self._open_writer(self._segs[-1])
+        else:
+            self._new_segment(1)
+        # cursor à frente do que existe (outbox apagado à mão): recomeça
+        self._acked = min(self._acked, self._seq)
+        self._read = self._commit = (self._segs[0], _SEG.size)
+        if self.pending():
+            logger.warning(f"Outbox {self.path}: backlog anterior ao restart "
+                           f"(seq {self._acked + 1}..{self._seq})")
+
+    def _seg_path(self, n: int) -> Path:
+        return self.path / f"{n:010d}.seg"
+
+    def _new_segment(self, n: int) -> None:
+        with open(self._seg_path(n), "wb") as f:
+            f.truncate(self.segment_bytes)
+            f.write(_SEG.pack(MAGIC, self._seq + 1))
+        self._segs.append(n)
+        self._open_writer(n)
+        self._enforce_size()
+
+    def _open_writer(self, n: int) -> None:
+        self._close_writer()
+        self._wfile = open(self._seg_path(n), "r+b")
+        self._wmap = mmap.mmap(self._wfile.fileno(), self.segment_bytes)
+        magic, first_seq = _SEG.unpack_from(self._wmap, 0)
+        if magic != MAGIC:
+            raise ValueError(f"Segmento de outbox inválido: {self._seg_path(n)}")
+        self._seq = max(self._seq, first_seq - 1)
+        # acha o fim dos dados válidos (após crash pode haver cauda corrompida)
+        off = _SEG.size
+        for seq, _, _, _, nxt in self._scan(self._wmap, off):
+            self._seq = seq
+            off = nxt
+        self._woff = off
+        self._wmap[off:off + _HDR.size] = _END
+
+    def _close_writer(self) -> None:
+        if self._wmap is not None:
+            self._wmap.flush()
+            self._wmap.close()
+            self._wfile.close()
+        self._wmap = self._wfile = None
+
+    @staticmethod
+    def _scan(buf, off: int):
+        """Itera registros válidos: (seq, ts_ms, tópico, payload, próximo offset)."""
+        end = len(buf)
+        while off + _HDR.size <= end:
+            size, crc = _HDR.unpack_from(buf, off)
+            body_at = off + _HDR.size
+            if size < _BODY.size or body_at + size > end:
+                return
+            body = buf[body_at:body_at + size]
+            if zlib.crc32(body) != crc:
+                return
+            seq, ts_ms, tlen = _BODY.unpack_from(body, 0)
+            topic = body[_BODY.size:_BODY.size + tlen].decode()
+            yield seq, ts_ms, topic, body[_BODY.size + tlen:], body_at + size
+            off = body_at + size
+
+    # ----- escrita -----
+    def append(self, topic: str, payload: bytes, ts_ms: int | None = None) -> int:
+        traw = topic.encode()
+        size = _BODY.size + len(traw) + len(payload)
+        need = _HDR.size + size
+        if _SEG.size + need + _HDR.size > self.segment_bytes:
+            raise ValueError(f"Mensagem maior que o segmento do outbox ({need} bytes)")
+        if self._woff + need + _HDR.size > self.segment_bytes:
+            self._new_segment(self._segs[-1] + 1)
+        self._seq += 1
+        if ts_ms is None:
+            ts_ms = time.time_ns() // 1_000_000
+        body = _BODY.pack(self._seq, ts_ms, len(traw)) + traw + payload
+        off = self._woff
+        self._wmap[off + _HDR.size:off + need] = body
+        self._wmap[off + need:off + need + _HDR.size] = _END
+        # cabeçalho por último: o leitor nunca vê um registro pela metade
+        self._wmap[off:off + _HDR.size] = _HDR.pack(size, zlib.crc32(body))
+        self._woff = off + need
+        self.appended += 1
+        return self._seq
+
+    def _enforce_size(self) -> None:
+        while len(self._segs) * self.segment_bytes > self.max_bytes and len(self._segs) > 1:
+            n = self._segs.pop(0)
+            self._drop_reader(n)
+            self._seg_path(n).unlink(missing_ok=True)
+            self.dropped_segments += 1
+            logger.warning(f"Outbox cheio ({self.max_bytes} bytes): segmento {n} descartado")
+            if self._read[0] == n or self._commit[0] == n:
+                self._read = self._commit = (self._segs[0], _SEG.size)
+
+    # ----- leitura / republicação -----
+    def pending(self) -> bool:
+        return self._seq > self._acked
+
+    def backlog(self) -> int:
+        """Mensagens ainda não republicadas (inclui as que vão expirar)."""
+        return self._seq - self._acked
+
+    def _rmap(self, n: int):
+        if n == self._segs[-1]:
+            return self._wmap
+        m = self._rmaps.get(n)
+        if m is None:
+            with open(self._seg_path(n), "rb") as f:
+                m = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self._rmaps[n] = m
+        return m
+
+    def _drop_reader(self, n: int) -> None:
+        m = self._rmaps.pop(n, None)
+        if m is not None:
+            m.close()
+
+    def read(self, limit: int) -> list[tuple[int, str, bytes]]:
+        """Próximos registros não republicados; confirme com ack() ou volte com rewind().
+
+        Registros expirados são pulados, mas também ficam confirmados no ack().
+        """
+        out: list[tuple[int, str, bytes]] = []
+        now_ms = time.time_ns() // 1_000_000
+        n, off = self._read
+        while len(out) < limit and n in self._segs:
+            for seq, ts_ms, topic, payload, nxt in self._scan(self._rmap(n), off):
+                off = nxt
+                if seq <= self._acked:
+                    continue
+                self._read_seq = seq
+                if self.max_age_ms and now_ms - ts_ms > self.max_age_ms:
+                    self.expired += 1
+                    continue
+                out.append((seq, topic, bytes(payload)))
+                if len(out) >= limit:
+                    break
+            if len(out) >= limit or n == self._segs[-1]:
+                break
+            # fim de um segmento já fechado: segue para o próximo
+            n, off = self._segs[self._segs.index(n) + 1], _SEG.size
+        self._read = (n, off)
+        return out
+
+    def rewind(self) -> None:
+        self._read = self._commit
+        self._read_seq = self._acked
+
+    def ack(self) -> None:
+        """Confirma tudo o que read() já entregou."""
+        self._acked = max(self._acked, self._read_seq)
+        self._commit = self._read
+        self._acked_dirty = True
+        # segmentos anteriores ao do leitor já foram consumidos por completo
+        while len(self._segs) > 1 and self._segs[0] != self._commit[0]:
+            n = self._segs.pop(0)
+            self._drop_reader(n)
+            self._seg_path(n).unlink(missing_ok=True)
+        if not self.pending():
+            self.sync()
+
+    def sync(self) -> None:
+        if self._wmap is not None:
+            self._wmap.flush()
+        if self._acked_dirty:
+            tmp = self.path / "cursor.tmp"
+            tmp.write_text(str(self._acked))
+            os.replace(tmp, self.path / "cursor")
+            self._acked_dirty = False
+
+    def close(self) -> None:
+        self.sync()
+        for n in list(self._rmaps):
+            self._drop_reader(n)
+        self._close_writer()
@@ -0,0 +1,133 @@
+"""
+Estágio limitado (bounded) entre as notificações OPC UA e o cliente MQTT.
+
+A subscription só enfileira; um pool de tarefas publicadoras consome a fila.
+Quando a fila enche, a política de overflow decide o que acontece:
+
+- block:       put() aguarda espaço (backpressure até a subscription)
+- drop_oldest: descarta o item mais antigo da fila
+- conflate:    mantém só o valor mais recente por tag (last-value-wins);
+               se ainda assim encher, descarta a tag mais antiga
+"""
+
+from __future__ import annotations
+
+import asyncio
+from collections import deque
+from typing import Awaitable, Callable
+
+from loguru import logger
+
+POLICIES = ("block", "drop_oldest", "conflate")
+
+
+class PublishPipeline:
+    def __init__(
+        self,
+        publish: Callable[..., Awaitable[None]],
+        maxsize: int = 10000,
+        policy: str = "conflate",
+        workers: int = 4,
+    ):
+        if policy not in POLICIES:
+            raise ValueError(f"Política de overflow inválida: {policy} (use {', '.join(POLICIES)})")
+        if maxsize < 1 or workers < 1:
+            raise ValueError("maxsize e workers devem ser >= 1")
+        self.publish = publish
+        self.maxsize = maxsize
+        self.policy = policy
+        self.n_workers = workers
+
+        self._queue: deque = deque()
+        self._pending: dict[str, tuple] = {}   # conflate: tag.name -> último item
+        self._not_empty = asyncio.Event()
+        self._not_full = asyncio.Event()
+        self._not_full.set()
+        self._tasks: list[asyncio.Task] = []
+
+        # contadores
+        self.enqueued = 0
+        self.published = 0
+        self.dropped = 0
+        self.conflated = 0
+        self.failed = 0
+
+    def __len__(self) -> int:
+        return len(self._queue)
+
+    # ----- produtor -----
+    def offer(self, tag, value, data=None) -> bool:
+        """Enfileira sem bloquear (drop_oldest/conflate). Retorna False se descartou algo."""
+        self.enqueued += 1
+        ok = True
+        if self.policy == "conflate":
+            key = tag.name
+            if key in self._pending:
+                self._pending[key] = (tag, value, data)
+                self.conflated += 1
+                tag.dropped += 1
+                return True
+            if len(self._queue) >= self.maxsize:
+                self._pending.pop(self._queue.popleft())[0].dropped += 1
+                self.dropped += 1
+                ok = False
+            self._pending[key] = (tag, value, data)
+            self._queue.append(key)
+        else:
+            if len(self._queue) >= self.maxsize:
+                self._queue.popleft()[0].dropped += 1
+                self.dropped += 1
+                ok = False
+            self._queue.append((tag, value, data))
+        self._not_empty.set()
+        return ok
+
+    async def put(self, tag, value, data=None) -> None:
+        if self.policy != "block":
+            self.offer(tag, value, data)
+            return
+        while len(self._queue) >= self.maxsize:
+            self._not_full.clear()
+            await self._not_full.wait()
+        self.enqueued += 1
+        self._queue.append((tag, value, data))
+        self._not_empty.set()
+
+    # ----- consumidores -----
+    async def _get(self) -> tuple:
+        while not self._queue:
+            self._not_empty.clear()
+            await self._not_empty.wait()
+        item = self._queue.popleft()
+        if self.policy == "conflate":
+            item = self._pending.pop(item)
+        self._not_full.set()
+        return item
+
+    async def _worker(self, idx: int) -> None:
+        # publish() do paho só enfileira no socket na ordem das chamadas,
+        # então a ordem de retirada da fila é a ordem no fio
+        while True:
+            tag, value, data = await self._get()
+            try:
+                await self.publish(tag, value, data)
+                self.published += 1
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.failed += 1
+                logger.error(f"[pipeline/{idx}] Falha ao publicar {tag.name}: {e}")
+
+    def start(self) -> None:
+        if self._tasks:
+            return
+        self._tasks = [asyncio.create_task(self._worker(i), name=f"publisher-{i}")
+                       for i in range(self.n_workers)]
+        logger.info(f"Pipeline de publicação: {self.n_workers} workers, "
+                    f"maxsize={self.maxsize}, política={self.policy}")
+
+    async def stop(self) -> None:
+        for t in self._tasks:
+            t.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
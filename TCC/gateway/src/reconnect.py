@@ -0,0 +1,100 @@
+"""
+Reconexão: backoff exponencial com jitter e retomada de sessão OPC UA.
+
+Cada conexão (MQTT e OPC UA) tem seu próprio supervisor em main.py; a queda
+de uma não derruba a outra. Depois de uma perda de canal (rede, restart do
+switch...) o servidor OPC UA costuma manter a sessão viva até o
+SessionTimeout, junto com as subscriptions e as notificações enfileiradas.
+resume_session() tenta reaproveitá-la: abre um canal seguro novo e reativa a
+sessão antiga (ActivateSession com o mesmo AuthenticationToken, Part 4
+5.6.3), sem refazer a subscription nem perder dados. Se o servidor não
+reconhece mais a sessão, o supervisor cai para a conexão completa.
+
+TransferSubscriptions não é implementado pelo asyncua 1.1.2, então não há
+como migrar subscriptions para uma sessão nova; elas são recriadas.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import random
+
+from asyncua import Client, ua
+from loguru import logger
+
+
+class Backoff:
+    """Atraso exponencial com jitter ("equal jitter"): entre d/2 e d."""
+
+    def __init__(self, initial: float = 0.1, maximum: float = 10.0, factor: float = 2.0):
+        self.initial = initial
+        self.maximum = maximum
+        self.factor = factor
+        self.attempt = 0
+
+    def next(self) -> float:
+        d = min(self.maximum, self.initial * self.factor ** self.attempt)
+        self.attempt += 1
+        return random.uniform(d / 2, d)
+
+    def reset(self) -> None:
+        self.attempt = 0
+
+
+async def _drop_client_tasks(client: Client) -> None:
+    # tarefas internas do canal morto (watchdog, renovação, publish); se
+    # ficassem "done com erro", o pre_request_hook as relevantaria em toda
+    # requisição do canal novo
+    uac = client.uaclient
+    for owner, attr in ((client, "_monitor_server_task"), (client, "_renew_channel_task"),
+                        (uac, "_publish_task")):
+        task = getattr(owner, attr)
+        if task is not None:
+            task.cancel()
+            try:
+                await task
+            except (asyncio.CancelledError, Exception):
+                pass
+        setattr(owner, attr, None)
+
+
+async def resume_session(client: Client, token: ua.NodeId) -> bool:
+    """Reativa a sessão de `client` (AuthenticationToken `token`) num canal novo.
+
+    Retorna False se o servidor recusou a sessão (expirou, foi fechada ou o
+    servidor não suporta reativação em outro canal). Levanta a exceção de
+    rede se o servidor ainda está inacessível: a sessão pode continuar viva
+    e vale tentar de novo.
+
+    Usa internals do asyncua 1.1.2 (versão fixada no requirements.txt).
+    """
+    await _drop_client_tasks(client)
+    client.disconnect_socket()
+    await client.connect_socket()
+    try:
+        await client.send_hello()
+        await client.open_secure_channel()
+        client.uaclient.protocol.authentication_token = token
+        try:
+            res = await client.activate_session(
+                username=client._username, password=client._password,
+                certificate=client.user_certificate)
+        except ua.UaStatusCodeError as e:
+            logger.info(f"Sessão OPC UA não pôde ser retomada: {e}")
+            client.disconnect_socket()
+            return False
+    except Exception:
+        client.disconnect_socket()
+        raise
+
+    # nonce novo: assina a próxima ativação
+    client._server_nonce = res.ServerNonce
+    client._closing = False
+    client._renew_channel_task = asyncio.create_task(client._renew_channel_loop())
+    client._monitor_server_task = asyncio.create_task(client._monitor_server_loop())
+    uac = client.uaclient
+    if uac._subscription_callbacks:
+        # volta a mandar PublishRequests; o servidor entrega o que ficou
+        # enfileirado nas subscriptions durante a queda
+        uac._publish_task = asyncio.create_task(uac._publish_loop())
+    return True
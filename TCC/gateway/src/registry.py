@@ -0,0 +1,228 @@
+"""
+Registro indexado das tags do gateway.
+
+Resolve cada `nodeId` do tags.yaml uma única vez na partida e mantém
+índices em dicionário (client handle, NodeId e tópico MQTT -> tag), de modo
+que os caminhos quentes (notificação OPC UA e comando MQTT) sejam O(1).
+Com o tags.yaml recarregado em execução, diff() aponta as tags novas,
+removidas e alteradas para o gateway atualizar só os monitored items afetados.
+"""
+
+from __future__ import annotations
+
+import math
+from dataclasses import dataclass, field
+from typing import Iterator
+
+from asyncua import Client, ua
+from asyncua.common.node import Node
+
+UA_TYPES = {
+    "Int32": ua.VariantType.Int32,
+    "Float": ua.VariantType.Float,
+    "Boolean": ua.VariantType.Boolean,
+    "String": ua.VariantType.String,
+    # demais escalares built-in (INT, WORD, LREAL... do CODESYS; discovery.py)
+    "SByte": ua.VariantType.SByte,
+    "Byte": ua.VariantType.Byte,
+    "Int16": ua.VariantType.Int16,
+    "UInt16": ua.VariantType.UInt16,
+    "UInt32": ua.VariantType.UInt32,
+    "Int64": ua.VariantType.Int64,
+    "UInt64": ua.VariantType.UInt64,
+    "Double": ua.VariantType.Double,
+}
+
+def _to_bool(v) -> bool:
+    if isinstance(v, str):
+        return v.strip().lower() in ("1", "true", "on", "yes")
+    return bool(v)
+
+
+def _to_int(v) -> int:
+    # int(1.7) == 1: um comando fracionário seria escrito truncado, em silêncio
+    if isinstance(v, float) and not v.is_integer():
+        raise ValueError(f"{v} não é inteiro")
+    return int(v)
+
+
+# conversão do valor vindo do JSON para o tipo Python esperado pelo Variant
+COERCE = {
+    "Int32": _to_int,
+    "Float": float,
+    "Boolean": _to_bool,
+    "String": str,
+    "SByte": _to_int,
+    "Byte": _to_int,
+    "Int16": _to_int,
+    "UInt16": _to_int,
+    "UInt32": _to_int,
+    "Int64": _to_int,
+    "UInt64": _to_int,
+    "Double": float,
+}
+
+# faixa dos inteiros: fora dela o Write em lote falharia na serialização,
+# levando junto os outros comandos do mesmo WriteRequest
+INT_RANGES = {
+    "SByte": (-2**7, 2**7 - 1),
+    "Byte": (0, 2**8 - 1),
+    "Int16": (-2**15, 2**15 - 1),
+    "UInt16": (0, 2**16 - 1),
+    "Int32": (-2**31, 2**31 - 1),
+    "UInt32": (0, 2**32 - 1),
+    "Int64": (-2**63, 2**63 - 1),
+    "UInt64": (0, 2**64 - 1),
+}
+FLOAT_MAX = 3.4028234663852886e38     # maior float32 finito
+
+# client handles dos monitored items começam aqui (o asyncua usa 201+ nos
+# seus próprios subscribe_data_change, então evitamos essa faixa)
+HANDLE_BASE = 1_000_000
+
+
+@dataclass(slots=True, eq=False)
+class Tag:
+    name: str
+    node_id: ua.NodeId
+    vtype: str
+    variant_type: ua.VariantType
+    topic: str            # relativo, ex.: PLCData/MyTag
+    sensor_topic: str     # completo, ex.: planta/sensores/PLCData/MyTag
+    handle: int           # ClientHandle usado nos monitored items
+    sampling_ms: float | None = None      # None: usa o publishing interval do grupo
+    publishing_ms: float | None = None    # None: sampling_ms ou o padrão do config
+    queue_size: int = 0
+    cfg: dict = field(default_factory=dict)
+    node: Node | None = None
+    filter: object | None = None    # filters.ChangeFilter
+    encoder: object | None = None   # encoding.*Encoder
+    history: object | None = None   # history.Ring (alocado na primeira amostra)
+    # monitored item atual: id no servidor e publishing interval do grupo
+    mi_id: int | None = None
+    sub_ms: float | None = None
+    # contadores por tag (metrics.py)
+    notifications: int = 0
+    published: int = 0
+    dropped: int = 0
+    writes: int = 0
+
+    def variant(self, value) -> ua.Variant:
+        return ua.Variant(value, self.variant_type)
+
+    def coerce(self, value):
+        """Converte o valor do comando; ValueError/TypeError/OverflowError se
+        incompatível (ex.: 1.7 numa tag inteira) ou fora da faixa do tipo."""
+        v = COERCE.get(self.vtype, str)(value)
+        if self.vtype in INT_RANGES:
+            lo, hi = INT_RANGES[self.vtype]
+            if not lo <= v <= hi:
+                raise ValueError(f"{v} fora da faixa de {self.vtype} [{lo}, {hi}]")
+        elif self.vtype in ("Float", "Double"):
+            if not math.isfinite(v) or (self.vtype == "Float" and abs(v) > FLOAT_MAX):
+                raise ValueError(f"{v} fora da faixa de {self.vtype}")
+        return v
+
+    def interval(self, default_ms: float) -> float:
+        """Publishing interval da subscription onde a tag é monitorada."""
+        return self.publishing_ms or self.sampling_ms or default_ms
+
+
+def _opt_float(v) -> float | None:
+    return None if v is None else float(v)
+
+
+class TagRegistry:
+    def __init__(self, tags_cfg: dict, sensors_base: str):
+        self.sensors_base = sensors_base
+        self._tags: dict[str, Tag] = {}
+        self._by_handle: dict[int, Tag] = {}
+        self._by_nodeid: dict[ua.NodeId, Tag] = {}
+        self._by_topic: dict[str, Tag] = {}
+        self._next_handle = HANDLE_BASE
+        for name, info in (tags_cfg or {}).items():
+            self.add(name, info)
+
+    # ----- construção -----
+    def add(self, name: str, info: dict) -> Tag:
+        if name in self._tags:
+            raise ValueError(f"Tag duplicada: {name}")
+        topic = info["topic"].strip("/")
+        if topic in self._by_topic:
+            raise ValueError(f"Tópico duplicado em {name}: {topic}")
+        node_id = ua.NodeId.from_string(info["nodeId"])
+        if node_id in self._by_nodeid:
+            raise ValueError(f"nodeId duplicado em {name}: {info['nodeId']}")
+        vtype = info.get("type", "String")
+        self._next_handle += 1
+        tag = Tag(
+            name=name,
+            node_id=node_id,
+            vtype=vtype,
+            variant_type=UA_TYPES.get(vtype, ua.VariantType.String),
+            topic=topic,
+            sensor_topic=f"{self.sensors_base}/{topic}",
+            handle=self._next_handle,
+            sampling_ms=_opt_float(info.get("sampling_ms")),
+            publishing_ms=_opt_float(info.get("publishing_ms")),
+            queue_size=int(info.get("queue_size", 0) or 0),
+            cfg=info,
+        )
+        self._tags[name] = tag
+        self._by_handle[tag.handle] = tag
+        self._by_nodeid[node_id] = tag
+        self._by_topic[topic] = tag
+        return tag
+
+    def remove(self, name: str) -> Tag:
+        tag = self._tags.pop(name)
+        del self._by_handle[tag.handle]
+        del self._by_nodeid[tag.node_id]
+        del self._by_topic[tag.topic]
+        return tag
+
+    def diff(self, tags_cfg: dict) -> tuple[list[str], list[str], list[str]]:
+        """(novas, removidas, alteradas) em relação a um tags.yaml recarregado."""
+        tags_cfg = tags_cfg or {}
+        added = [n for n in tags_cfg if n not in self._tags]
+        removed = [n for n in self._tags if n not in tags_cfg]
+        changed = [n for n, info in tags_cfg.items()
+                   if n in self._tags and self._tags[n].cfg != info]
+        return added, removed, changed
+
+    def bind(self, client: Client, tags=None) -> None:
+        """Cria os objetos Node para a sessão atual (sem round trip)."""
+        for tag in self._tags.values() if tags is None else tags:
+            tag.node = client.get_node(tag.node_id)
+
+    # ----- lookups O(1) -----
+    def by_handle(self, handle: int) -> Tag | None:
+        return self._by_handle.get(handle)
+
+    def by_nodeid(self, node_id: ua.NodeId) -> Tag | None:
+        return self._by_nodeid.get(node_id)
+
+    def by_node(self, node: Node) -> Tag | None:
+        return self._by_nodeid.get(node.nodeid)
+
+    def by_topic(self, topic: str) -> Tag | None:
+        return self._by_topic.get(topic)
+
+    def __getitem__(self, name: str) -> Tag:
+        return self._tags[name]
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._tags
+
+    def __iter__(self) -> Iterator[Tag]:
+        return iter(self._tags.values())
+
+    def __len__(self) -> int:
+        return len(self._tags)
+
+
+def group_by_interval(tags, default_ms: float) -> dict[float, list[Tag]]:
+    out: dict[float, list[Tag]] = {}
+    for tag in tags:
+        out.setdefault(tag.interval(default_ms), []).append(tag)
+    return out
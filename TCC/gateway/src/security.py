@@ -0,0 +1,106 @@
+"""
+Segurança OPC UA do gateway com o material criptográfico em memória.
+
+Client.set_security_string() relê certificado e chave do disco a cada
+conexão e, sem o certificado do servidor na string, abre uma conexão extra
+só para buscá-lo (GetEndpoints) antes da conexão de verdade. Aqui tudo é
+carregado uma vez por endpoint: certificado/chave do cliente na partida e o
+certificado do servidor no primeiro GetEndpoints (ou do 5º campo da string).
+Nas reconexões resta só o handshake do canal seguro. Depois de uma conexão
+que falhou (ex.: o servidor trocou de certificado), forget_server_cert()
+faz a próxima tentativa buscá-lo de novo.
+
+Formato de `security` no config: "Policy,Mode,cert,key[::senha][,server_cert]"
+(caminhos relativos a src/), ou "None". A política é procurada entre as
+SecurityPolicy<Policy> do asyncua instalado; o 1.1.2 só tem as RSA
+(Basic256Sha256, Aes128Sha256RsaOaep, Aes256Sha256RsaPss...). ECC_nistP256
+(na partida) e uma chave ECC com política RSA (na primeira conexão) falham
+com mensagem clara, e não no handshake.
+"""
+
+from __future__ import annotations
+
+import socket
+from pathlib import Path
+
+from asyncua import Client, ua
+from asyncua.crypto import security_policies, uacrypto
+from cryptography.hazmat.primitives.asymmetric import ec
+from loguru import logger
+
+
+def available_policies() -> list[str]:
+    return sorted(n[len("SecurityPolicy"):] for n in dir(security_policies)
+                  if n.startswith("SecurityPolicy") and n != "SecurityPolicy")
+
+
+def _path(raw: str, base_dir: Path) -> Path:
+    p = Path(raw)
+    return p if p.is_absolute() else (base_dir / p).resolve()
+
+
+class SecurityProfile:
+    def __init__(self, raw: str, base_dir: Path):
+        parts = [p.strip() for p in raw.split(",")]
+        if len(parts) < 4:
+            raise ValueError(f"SEC inválido: {raw}")
+        self.policy_name, mode, cert, key = parts[:4]
+        self.policy = getattr(security_policies, f"SecurityPolicy{self.policy_name}", None)
+        if self.policy is None:
+            raise ValueError(f"Política {self.policy_name} não suportada pelo asyncua instalado "
+                             f"(disponíveis: {', '.join(available_policies())})")
+        self.mode = getattr(ua.MessageSecurityMode, mode)
+        key, _, password = key.partition("::")
+        self.password = password or None
+        self.cert_path = _path(cert, base_dir)
+        self.key_path = _path(key, base_dir)
+        self.server_cert_path = _path(parts[4], base_dir) if len(parts) > 4 and parts[4] else None
+        for what, p in (("Certificado do cliente", self.cert_path), ("Chave do cliente", self.key_path),
+                        ("Certificado do servidor", self.server_cert_path)):
+            if p is not None and not p.exists():
+                logger.error(f"{what} não encontrado: {p}")
+                raise FileNotFoundError(p)
+        self._cert = None
+        self._key = None
+        self._server_cert = None
+
+    @classmethod
+    def from_config(cls, raw: str | None, base_dir: Path) -> SecurityProfile | None:
+        if not raw or raw == "None":
+            return None
+        return cls(raw, base_dir)
+
+    async def _load_own(self, client: Client) -> None:
+        self._cert = await uacrypto.load_certificate(self.cert_path)
+        self._key = await uacrypto.load_private_key(self.key_path, self.password)
+        if isinstance(self._key, ec.EllipticCurvePrivateKey) and not self.policy_name.startswith("ECC"):
+            raise ValueError(f"Chave ECC ({self.key_path.name}) não serve para a política {self.policy_name}")
+        uacrypto.check_certificate(self._cert, client.application_uri, socket.gethostname())
+        logger.debug(f"Certificado/chave do cliente carregados ({self.policy_name}, {self.mode.name})")
+
+    async def _fetch_server_cert(self, client: Client):
+        if self.server_cert_path is not None:
+            return await uacrypto.load_certificate(self.server_cert_path)
+        # mesmo caminho do Client.set_security(): canal sem segurança só para
+        # listar os endpoints
+        none = ua.SecurityPolicy()
+        client.security_policy = none
+        client.uaclient.set_security(none)
+        endpoints = await client.connect_and_get_server_endpoints()
+        endpoint = Client.find_endpoint(endpoints, self.mode, self.policy.URI)
+        # cadeia de certificados: fica só o do servidor
+        cert_len = int.from_bytes(endpoint.ServerCertificate[2:4], byteorder="big") + 4
+        logger.debug("Certificado do servidor obtido via GetEndpoints")
+        return uacrypto.x509_from_der(endpoint.ServerCertificate[:cert_len])
+
+    async def apply(self, client: Client) -> None:
+        """Configura a segurança de `client` (antes do connect), sem reler nada já em memória."""
+        if self._cert is None:
+            await self._load_own(client)
+        if self._server_cert is None:
+            self._server_cert = await self._fetch_server_cert(client)
+        client.security_policy = self.policy(self._server_cert, self._cert, self._key, self.mode)
+        client.uaclient.set_security(client.security_policy)
+
+    def forget_server_cert(self) -> None:
+        self._server_cert = None
@@ -0,0 +1,32 @@
+import numpy as np
+
+from history import lttb, minmax
+
+
+def test_minmax_points():
+    ts = np.arange(100, dtype=np.int64)
+    val = np.sin(ts / 7.0)
+    for points in (1, 2, 3, 4, 5, 99):
+        rts, rval = minmax(ts, val, points)
+        assert len(rts) == len(rval) <= points, (points, len(rts))
+        assert np.all(np.diff(rts) > 0)
+    rts, rval = minmax(ts, val, 1)
+    assert rts.tolist() == [99] and rval[0] == val[-1]
+    rts, rval = minmax(ts, val, 3)
+    assert len(rts) == 2 and rval.min() == val.min() and rval.max() == val.max()
+
+
+def test_lttb_points():
+    ts = np.arange(100, dtype=np.int64)
+    val = np.sin(ts / 7.0)
+    for points in (1, 2, 3, 50):
+        rts, _ = lttb(ts, val, points)
+        assert len(rts) == points, (points, len(rts))
+    assert lttb(ts, val, 1)[0].tolist() == [99]
+    assert lttb(ts, val, 2)[0].tolist() == [0, 99]
+
+
+if __name__ == "__main__":
+    test_minmax_points()
+    test_lttb_points()
+    print("✅ minmax/lttb ok")
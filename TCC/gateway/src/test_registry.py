@@ -0,0 +1,37 @@
+from registry import TagRegistry
+
+
+def make_tag(vtype):
+    reg = TagRegistry({"T": {"nodeId": "ns=2;s=T", "type": vtype, "topic": "PLCData/T"}},
+                      "planta/sensores")
+    return reg["T"]
+
+
+def test_coerce_inteiro():
+    tag = make_tag("Int32")
+    assert tag.coerce(7) == 7
+    assert tag.coerce(7.0) == 7
+    assert tag.coerce("7") == 7
+    for bad in (1.7, -0.5, float("nan"), float("inf"), 2**31):
+        try:
+            tag.coerce(bad)
+        except ValueError:
+            continue
+        raise AssertionError(f"{bad!r} aceito numa tag Int32")
+
+
+def test_coerce_float():
+    tag = make_tag("Float")
+    assert tag.coerce(1.7) == 1.7
+    for bad in (float("inf"), 1e39):
+        try:
+            tag.coerce(bad)
+        except ValueError:
+            continue
+        raise AssertionError(f"{bad!r} aceito numa tag Float")
+
+
+if __name__ == "__main__":
+    test_coerce_inteiro()
+    test_coerce_float()
+    print("✅ Tag.coerce ok")
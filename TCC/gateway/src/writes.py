@@ -0,0 +1,114 @@
+"""
+Escritas coalescidas para os comandos MQTT.
+
+Comandos que chegam dentro de uma janela curta (writes.window_ms) são
+agrupados com last-write-wins por tag e enviados num único WriteRequest
+(dividido por MaxNodesPerWrite). O status de cada escrita volta por MQTT
+via callback `report`. Só um WriteRequest fica em voo por vez: sob carga os
+comandos se acumulam enquanto o anterior não responde, o que aumenta a
+coalescência naturalmente e preserva a ordem por tag.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import time
+from typing import Awaitable, Callable
+
+from asyncua import Client, ua
+from loguru import logger
+
+from metrics import Histogram
+from oplimits import chunked
+
+
+class WriteCoalescer:
+    def __init__(
+        self,
+        get_client: Callable[[], Client | None],
+        report: Callable[..., Awaitable[None]],
+        window: float = 0.02,
+        max_batch: int = 500,
+    ):
+        self.get_client = get_client
+        self.report = report
+        self.window = window
+        self.max_batch = max_batch
+        self.max_nodes_per_write = 0
+
+        self._pending: dict[str, list] = {}    # tag.name -> [tag, value, n_coalescidos, t0]
+        self._timer: asyncio.TimerHandle | None = None
+        self._lock = asyncio.Lock()
+        self._bg: set[asyncio.Task] = set()
+
+        # contadores; latência chegada do comando -> resposta do Write (ms)
+        self.latency = Histogram()
+        self.commands = 0
+        self.coalesced = 0
+        self.requests = 0
+        self.failed = 0
+
+    def submit(self, tag, value) -> None:
+        self.commands += 1
+        item = self._pending.get(tag.name)
+        if item is not None:
+            item[1] = value
+            item[2] += 1
+            self.coalesced += 1
+            return
+        self._pending[tag.name] = [tag, value, 1, time.perf_counter()]
+        if len(self._pending) >= self.max_batch:
+            self._schedule(0)
+        elif self._timer is None:
+            self._schedule(self.window)
+
+    def _schedule(self, delay: float) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+        self._timer = asyncio.get_running_loop().call_later(delay, self._spawn_flush)
+
+    def _spawn_flush(self) -> None:
+        self._timer = None
+        task = asyncio.get_running_loop().create_task(self.flush())
+        self._bg.add(task)
+        task.add_done_callback(self._bg.discard)
+
+    async def flush(self) -> None:
+        async with self._lock:
+            if not self._pending:
+                return
+            batch = list(self._pending.values())
+            self._pending = {}
+            for block in chunked(batch, self.max_nodes_per_write):
+                await self._write_block(block)
+
+    async def _write_block(self, block) -> None:
+        client = self.get_client()
+        params = ua.WriteParameters()
+        for tag, value, _, _ in block:
+            wv = ua.WriteValue()
+            wv.NodeId = tag.node_id
+            wv.AttributeId = ua.AttributeIds.Value
+            wv.Value = ua.DataValue(tag.variant(value))
+            params.NodesToWrite.append(wv)
+        try:
+            if client is None:
+                raise ConnectionError("OPC UA desconectado")
+            self.requests += 1
+            results = await client.uaclient.write(params)
+        except Exception as e:
+            logger.error(f"Write em lote falhou ({len(block)} tags): {e}")
+            results = [ua.StatusCode(ua.StatusCodes.BadCommunicationError)] * len(block)
+
+        done = time.perf_counter()
+        for (tag, value, n, t0), status in zip(block, results):
+            self.latency.observe((done - t0) * 1000)
+            if status.is_good():
+                logger.info(f"WRITE {tag.name}={value}" + (f" ({n} coalescidos)" if n > 1 else ""))
+            else:
+                self.failed += 1
+                logger.error(f"Erro write {tag.name}: {status.name}")
+            try:
+                await self.report(tag, value, status, n)
+            except Exception as e:
+                logger.error(f"Falha ao reportar status de {tag.name}: {e}")
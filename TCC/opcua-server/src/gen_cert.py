@@ -1,13 +1,29 @@
 #!/usr/bin/env python3
 """
-Gera chaves RSA e certificados X.509 autoassinados com SAN
+Gera chaves e certificados X.509 com SAN
 para o servidor OPC UA (pasta opcua-server/certs)
 e para o cliente-gateway (pasta gateway/certs), usando 'cryptography'.
 Inclui ApplicationURI e hostname nos SANs para evitar avisos de OPC UA.
+
+Modos:
+    gen_cert.py                       # servidor + gateway autoassinados (RSA-2048)
+    gen_cert.py --key ecc             # idem com chaves nistP256 (ECDSA-SHA256)
+    gen_cert.py --ca --gateways 50    # CA local + servidor + gw1..gw50 assinados pela CA,
+                                      # emitidos em paralelo (--workers processos)
+    gen_cert.py --ca --hosts a,b,c    # um certificado de gateway por hostname
+
+No modo CA a chave da CA fica em opcua-server/certs/ca (reaproveitada nas
+execuções seguintes) e os certificados de frota em gateway/certs/fleet.
+Chaves ECC servem às políticas ECC_nistP256; os stacks Python deste projeto
+(asyncua 1.1.2, python-opcua) só implementam as políticas RSA, por isso RSA
+continua o padrão.
 """
 
+import argparse
+import os
 import socket
 import ipaddress
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 from datetime import datetime, timedelta, timezone
 
@@ -15,7 +31,7 @@ from cryptography import x509
 from cryptography.x509.oid import NameOID, ExtendedKeyUsageOID
 from cryptography.x509 import UniformResourceIdentifier
 from cryptography.hazmat.primitives import hashes, serialization
-from cryptography.hazmat.primitives.asymmetric import rsa
+from cryptography.hazmat.primitives.asymmetric import ec, rsa
 
 # === CONFIGURAÇÃO ===
 C  = "BR"
@@ -26,27 +42,48 @@ OU = "TCC"
 
 CN_SERVER = "opcua-server"
 CN_CLIENT = "gateway-client"
+CN_CA     = "TCC OPC UA CA"
 
 HOST = socket.gethostname()  # ex.: gabriel-pc
 DNS_LIST = [CN_SERVER, "localhost", HOST]
 IP_LIST  = ["127.0.0.1", "192.168.0.10"]
 VALID_DAYS = 365
+CA_VALID_DAYS = 3650
 
 # Script está em opcua-server/src/
 BASE_DIR = Path(__file__).resolve().parent.parent           # opcua-server/
 SERVER_CERT_DIR = BASE_DIR / "certs"                        # opcua-server/certs
 CLIENT_CERT_DIR = BASE_DIR.parent / "gateway" / "certs"     # gateway/certs
+CA_DIR = SERVER_CERT_DIR / "ca"
+FLEET_DIR = CLIENT_CERT_DIR / "fleet"
 
 SERVER_KEY = SERVER_CERT_DIR / "server_key.pem"
 SERVER_CRT = SERVER_CERT_DIR / "server_cert.pem"
 CLIENT_KEY = CLIENT_CERT_DIR / "gw_key.pem"
 CLIENT_CRT = CLIENT_CERT_DIR / "gw_cert.pem"
+CA_KEY = CA_DIR / "ca_key.pem"
+CA_CRT = CA_DIR / "ca_cert.pem"
 
 SERVER_URI = f"urn:{HOST}:opcua-server"
 CLIENT_URI = f"urn:{HOST}:gateway-client"
 # =====================
 
-def _save_pem(key, cert, key_path: Path, crt_path: Path):
+def _new_key(kind: str):
+    if kind == "ecc":
+        return ec.generate_private_key(ec.SECP256R1())      # nistP256
+    return rsa.generate_private_key(public_exponent=65537, key_size=2048)
+
+def _name(cn: str) -> x509.Name:
+    return x509.Name([
+        x509.NameAttribute(NameOID.COUNTRY_NAME, C),
+        x509.NameAttribute(NameOID.STATE_OR_PROVINCE_NAME, ST),
+        x509.NameAttribute(NameOID.LOCALITY_NAME, L),
+        x509.NameAttribute(NameOID.ORGANIZATION_NAME, O),
+        x509.NameAttribute(NameOID.ORGANIZATIONAL_UNIT_NAME, OU),
+        x509.NameAttribute(NameOID.COMMON_NAME, cn),
+    ])
+
+def _save_pem(key, cert, key_path: Path, crt_path: Path, quiet: bool = False):
     key_path.parent.mkdir(parents=True, exist_ok=True)
     crt_path.parent.mkdir(parents=True, exist_ok=True)
     key_path.write_bytes(
@@ -57,25 +94,21 @@ def _save_pem(key, cert, key_path: Path, crt_path: Path):
         )
     )
     crt_path.write_bytes(cert.public_bytes(serialization.Encoding.PEM))
-    print(f"Gerado → chave: {key_path}\n          cert.: {crt_path}\n")
+    if not quiet:
+        print(f"Gerado → chave: {key_path}\n          cert.: {crt_path}\n")
 
-def make_server_cert():
-    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
-    subject = x509.Name([
-        x509.NameAttribute(NameOID.COUNTRY_NAME, C),
-        x509.NameAttribute(NameOID.STATE_OR_PROVINCE_NAME, ST),
-        x509.NameAttribute(NameOID.LOCALITY_NAME, L),
-        x509.NameAttribute(NameOID.ORGANIZATION_NAME, O),
-        x509.NameAttribute(NameOID.ORGANIZATIONAL_UNIT_NAME, OU),
-        x509.NameAttribute(NameOID.COMMON_NAME, CN_SERVER),
-    ])
-    alt_names = [x509.DNSName(d) for d in DNS_LIST] + \
-                [x509.IPAddress(ipaddress.ip_address(ip)) for ip in IP_LIST] + \
-                [UniformResourceIdentifier(SERVER_URI)]
-    cert = (
+def _leaf_cert(key, cn: str, uri: str, dns: list[str], ips: list[str], eku, issuer=None):
+    """Certificado de aplicação OPC UA; autoassinado se issuer=None, senão (ca_key, ca_cert)."""
+    subject = _name(cn)
+    alt_names = [x509.DNSName(d) for d in dns] + \
+                [x509.IPAddress(ipaddress.ip_address(ip)) for ip in ips] + \
+                [UniformResourceIdentifier(uri)]
+    is_ecc = isinstance(key, ec.EllipticCurvePrivateKey)
+    sign_key, issuer_name = (key, subject) if issuer is None else (issuer[0], issuer[1].subject)
+    builder = (
         x509.CertificateBuilder()
         .subject_name(subject)
-        .issuer_name(subject)  # autoassinado
+        .issuer_name(issuer_name)
         .public_key(key.public_key())
         .serial_number(x509.random_serial_number())
         .not_valid_before(datetime.now(timezone.utc))
@@ -85,10 +118,10 @@ def make_server_cert():
         .add_extension(
             x509.KeyUsage(
                 digital_signature=True,
-                key_encipherment=True,
+                key_encipherment=not is_ecc,        # RSA cifra a chave; ECC faz ECDH
                 content_commitment=False,
                 data_encipherment=False,
-                key_agreement=False,
+                key_agreement=is_ecc,
                 key_cert_sign=False,
                 crl_sign=False,
                 encipher_only=False,
@@ -96,62 +129,110 @@ def make_server_cert():
             ),
             critical=True
         )
-        .add_extension(x509.ExtendedKeyUsage([ExtendedKeyUsageOID.SERVER_AUTH]), critical=False)
-        .sign(private_key=key, algorithm=hashes.SHA256())
+        .add_extension(x509.ExtendedKeyUsage([eku]), critical=False)
+        .add_extension(x509.SubjectKeyIdentifier.from_public_key(key.public_key()), critical=False)
     )
-    _save_pem(key, cert, SERVER_KEY, SERVER_CRT)
+    if issuer is not None:
+        builder = builder.add_extension(
+            x509.AuthorityKeyIdentifier.from_issuer_public_key(issuer[0].public_key()), critical=False)
+    return builder.sign(private_key=sign_key, algorithm=hashes.SHA256())
 
-def make_client_cert():
-    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
-    subject = x509.Name([
-        x509.NameAttribute(NameOID.COUNTRY_NAME, C),
-        x509.NameAttribute(NameOID.STATE_OR_PROVINCE_NAME, ST),
-        x509.NameAttribute(NameOID.LOCALITY_NAME, L),
-        x509.NameAttribute(NameOID.ORGANIZATION_NAME, O),
-        x509.NameAttribute(NameOID.ORGANIZATIONAL_UNIT_NAME, OU),
-        x509.NameAttribute(NameOID.COMMON_NAME, CN_CLIENT),
-    ])
-    # para cliente, incluímos hostname e ApplicationURI do cliente
-    client_dns = [CN_CLIENT, "localhost", HOST]
-    client_ips = ["127.0.0.1"]  # suficiente p/ cliente local
-    alt_names = [x509.DNSName(d) for d in client_dns] + \
-                [x509.IPAddress(ipaddress.ip_address(ip)) for ip in client_ips] + \
-                [UniformResourceIdentifier(CLIENT_URI)]
+# ----- CA local -----
+def load_or_make_ca(kind: str):
+    if CA_KEY.exists() and CA_CRT.exists():
+        key = serialization.load_pem_private_key(CA_KEY.read_bytes(), password=None)
+        cert = x509.load_pem_x509_certificate(CA_CRT.read_bytes())
+        print(f"CA existente: {CA_CRT}")
+        return key, cert
+    key = _new_key(kind)
+    subject = _name(CN_CA)
     cert = (
         x509.CertificateBuilder()
         .subject_name(subject)
-        .issuer_name(subject)  # autoassinado
+        .issuer_name(subject)
         .public_key(key.public_key())
         .serial_number(x509.random_serial_number())
         .not_valid_before(datetime.now(timezone.utc))
-        .not_valid_after(datetime.now(timezone.utc) + timedelta(days=VALID_DAYS))
-        .add_extension(x509.SubjectAlternativeName(alt_names), critical=False)
-        .add_extension(x509.BasicConstraints(ca=False, path_length=None), critical=True)
+        .not_valid_after(datetime.now(timezone.utc) + timedelta(days=CA_VALID_DAYS))
+        .add_extension(x509.BasicConstraints(ca=True, path_length=0), critical=True)
         .add_extension(
             x509.KeyUsage(
-                digital_signature=True,
-                key_encipherment=True,
-                content_commitment=False,
-                data_encipherment=False,
-                key_agreement=False,
-                key_cert_sign=False,
-                crl_sign=False,
-                encipher_only=False,
-                decipher_only=False
+                digital_signature=False, key_encipherment=False, content_commitment=False,
+                data_encipherment=False, key_agreement=False, key_cert_sign=True, crl_sign=True,
+                encipher_only=False, decipher_only=False
             ),
             critical=True
         )
-        .add_extension(x509.ExtendedKeyUsage([ExtendedKeyUsageOID.CLIENT_AUTH]), critical=False)
+        .add_extension(x509.SubjectKeyIdentifier.from_public_key(key.public_key()), critical=False)
         .sign(private_key=key, algorithm=hashes.SHA256())
     )
+    _save_pem(key, cert, CA_KEY, CA_CRT)
+    return key, cert
+
+def _issue_gateway(job):
+    # roda num processo do pool: gerar a chave é o que custa (RSA)
+    host, kind, ca_key_pem, ca_crt_pem = job
+    ca = (serialization.load_pem_private_key(ca_key_pem, password=None),
+          x509.load_pem_x509_certificate(ca_crt_pem))
+    key = _new_key(kind)
+    cert = _leaf_cert(key, f"{CN_CLIENT}-{host}", f"urn:{host}:gateway-client", [host, "localhost"],
+                      ["127.0.0.1"], ExtendedKeyUsageOID.CLIENT_AUTH, issuer=ca)
+    _save_pem(key, cert, FLEET_DIR / f"{host}_key.pem", FLEET_DIR / f"{host}_cert.pem", quiet=True)
+    return host
+
+def issue_fleet(hosts: list[str], kind: str, ca, workers: int):
+    ca_key_pem = ca[0].private_bytes(serialization.Encoding.PEM,
+                                     serialization.PrivateFormat.PKCS8,
+                                     serialization.NoEncryption())
+    ca_crt_pem = ca[1].public_bytes(serialization.Encoding.PEM)
+    jobs = [(h, kind, ca_key_pem, ca_crt_pem) for h in hosts]
+    t0 = datetime.now()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for host in pool.map(_issue_gateway, jobs, chunksize=max(1, len(jobs) // (workers * 4))):
+            pass
+    dt = (datetime.now() - t0).total_seconds()
+    print(f"{len(hosts)} certificados de gateway em {FLEET_DIR} ({dt:.1f} s, {workers} processos)")
+
+# ----- servidor / gateway únicos -----
+def make_server_cert(kind: str = "rsa", ca=None):
+    key = _new_key(kind)
+    cert = _leaf_cert(key, CN_SERVER, SERVER_URI, DNS_LIST, IP_LIST, ExtendedKeyUsageOID.SERVER_AUTH, issuer=ca)
+    _save_pem(key, cert, SERVER_KEY, SERVER_CRT)
+
+def make_client_cert(kind: str = "rsa", ca=None):
+    key = _new_key(kind)
+    # para cliente, incluímos hostname e ApplicationURI do cliente
+    client_dns = [CN_CLIENT, "localhost", HOST]
+    client_ips = ["127.0.0.1"]  # suficiente p/ cliente local
+    cert = _leaf_cert(key, CN_CLIENT, CLIENT_URI, client_dns, client_ips, ExtendedKeyUsageOID.CLIENT_AUTH, issuer=ca)
     _save_pem(key, cert, CLIENT_KEY, CLIENT_CRT)
 
 def main():
-    print("=== Gerando certificados separados (com ApplicationURI & hostname) ===")
-    make_server_cert()
-    make_client_cert()
+    parser = argparse.ArgumentParser(description="Certificados OPC UA do servidor e dos gateways")
+    parser.add_argument("--key", choices=("rsa", "ecc"), default="rsa",
+                        help="rsa (RSA-2048, padrão) ou ecc (nistP256)")
+    parser.add_argument("--ca", action="store_true", help="assina com uma CA local em vez de autoassinar")
+    parser.add_argument("--gateways", type=int, default=0, metavar="N",
+                        help="com --ca, emite gw1..gwN em gateway/certs/fleet")
+    parser.add_argument("--hosts", default="", help="com --ca, hostnames dos gateways (separados por vírgula)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="processos na emissão em lote")
+    args = parser.parse_args()
+
+    hosts = [h.strip() for h in args.hosts.split(",") if h.strip()] + \
+            [f"gw{i}" for i in range(1, args.gateways + 1)]
+    if hosts and not args.ca:
+        parser.error("--gateways/--hosts exigem --ca")
+
+    ca = load_or_make_ca(args.key) if args.ca else None
+    print(f"=== Gerando certificados ({args.key.upper()}, {'CA local' if ca else 'autoassinados'}) ===")
+    make_server_cert(args.key, ca)
+    make_client_cert(args.key, ca)
+    if hosts:
+        issue_fleet(hosts, args.key, ca, max(1, args.workers))
     print("=== OK ===")
     print(f"Servidor → {SERVER_CRT}\nGateway  → {CLIENT_CRT}")
+    if ca:
+        print(f"CA       → {CA_CRT} (confiar nela no servidor/clientes)")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -1,15 +1,24 @@
 from opcua import Server, ua
+import argparse
 import time
 from pathlib import Path
 import signal
 import sys
 import socket
 
+from simulator import Simulator, load_spec
+
 # ==== Configurações ====
 ENDPOINT  = "opc.tcp://localhost:1217"
 URI       = "http://ifsc.org/ua"
 UPDATE_S  = 1.0  # segundos
 
+parser = argparse.ArgumentParser(description="Servidor OPC UA de testes")
+parser.add_argument("--sim", metavar="SPEC", help="modo simulador: spec YAML com as tags (ver sim.example.yaml)")
+parser.add_argument("--export-tags", metavar="ARQ", help="com --sim, grava um tags.yaml para o gateway")
+args = parser.parse_args()
+spec = load_spec(args.sim) if args.sim else None
+
 # ==== Instancia servidor ====
 server = Server()
 server.set_endpoint(ENDPOINT)
@@ -28,7 +37,11 @@ SERVER_KEY = CERT_DIR / "server_key.pem"
 # === Segurança OPC UA ===
 server.load_certificate(str(SERVER_CRT))
 server.load_private_key(str(SERVER_KEY))
-server.set_security_policy([ua.SecurityPolicyType.Basic256Sha256_SignAndEncrypt])
+policies = [ua.SecurityPolicyType.Basic256Sha256_SignAndEncrypt]
+if spec and spec.get("allow_none"):
+    # carga de teste sem o custo de criptografia
+    policies.append(ua.SecurityPolicyType.NoSecurity)
+server.set_security_policy(policies)
 
 # Namespace e variável
 idx      = server.register_namespace(URI)
@@ -37,12 +50,22 @@ plc_obj  = objects.add_object(idx, "PLCData")
 my_var   = plc_obj.add_variable(idx, "MyTag", 0)
 my_var.set_writable(True)
 
+sim = None
+if spec:
+    sim = Simulator(server, spec)
+    sim_idx = sim.build()
+    if args.export_tags:
+        sim.export_tags(args.export_tags, sim_idx)
+        print(f"tags.yaml do gateway gravado em {args.export_tags}")
+
 def graceful_exit(*_):
+    # só sai do loop; o finally lá embaixo para o servidor uma única vez
+    # (parar duas vezes, ou um 2º sinal no meio do stop, deixava a thread
+    # do python-opcua presa)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
     print("\nEncerrando servidor...")
-    try:
-        server.stop()
-    finally:
-        sys.exit(0)
+    sys.exit(0)
 
 signal.signal(signal.SIGINT, graceful_exit)
 signal.signal(signal.SIGTERM, graceful_exit)
@@ -53,12 +76,23 @@ print(f"Servidor OPC UA seguro rodando em {ENDPOINT}")
 print(f"ApplicationURI: {server._application_uri}")
 print(f"NodeId da variável MyTag: {my_var.nodeid.to_string()}")
 
+if sim:
+    sim.start()
+    print(f"Simulador: {len(sim)} tags em {len(sim.groups)} grupos, tick de {sim.period * 1000:.0f} ms")
+
 try:
     while True:
+        if sim:
+            time.sleep(5)
+            print(f"ticks={sim.ticks} escritas={sim.writes} overruns={sim.overruns} "
+                  f"último tick={sim.last_tick_s * 1000:.1f} ms")
+            continue
         valor = int(time.time() % 100)
         my_var.set_value(ua.Variant(valor, ua.VariantType.Int32))
         time.sleep(UPDATE_S)
 except KeyboardInterrupt:
     graceful_exit()
 finally:
+    if sim:
+        sim.stop()
     server.stop()
\ No newline at end of file
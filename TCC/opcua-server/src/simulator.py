@@ -0,0 +1,224 @@
+"""
+Modo simulador do servidor OPC UA de testes (main.py --sim spec.yaml).
+
+Cria milhares de variáveis a partir de uma especificação YAML (pastas ->
+grupos de tags de mesmo tipo e forma de onda) e, a cada tick, calcula os
+valores de cada grupo de uma vez com NumPy. Só as tags cujo valor mudou são
+escritas, e todas num único lote: um lock do address space por tick em vez
+de um por variável.
+
+Formato do spec (ver sim.example.yaml):
+
+    period_ms: 100                 # tick, mínimo 10
+    namespace: http://ifsc.org/ua/sim
+    allow_none: false              # também expõe endpoint sem segurança
+    folders:
+      - name: Linha1               # objeto sob Objects
+        groups:
+          - prefix: Temp           # Temp000..Temp999  (NodeId s=Linha1.Temp000)
+            count: 1000
+            type: Float            # Int32 | Float | Boolean | String
+            wave: sine             # ramp | sine | noise | step
+            amplitude: 10
+            offset: 20
+            period_s: 5            # período de ramp/sine/step
+            phase_spread: 1.0      # defasagem entre tags do grupo (0..1 do período)
+            writable: false
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import yaml
+from opcua import ua
+
+TYPES = {
+    "Int32": ua.VariantType.Int32,
+    "Float": ua.VariantType.Float,
+    "Boolean": ua.VariantType.Boolean,
+    "String": ua.VariantType.String,
+}
+WAVES = ("ramp", "sine", "noise", "step")
+MIN_PERIOD_MS = 10
+
+
+def load_spec(path: Path) -> dict:
+    spec = yaml.safe_load(Path(path).read_text(encoding="utf-8")) or {}
+    if spec.get("period_ms", 100) < MIN_PERIOD_MS:
+        raise ValueError(f"period_ms mínimo é {MIN_PERIOD_MS}")
+    for folder in spec.get("folders", []):
+        for g in folder.get("groups", []):
+            if g.get("type", "Float") not in TYPES:
+                raise ValueError(f"Tipo inválido em {folder['name']}.{g['prefix']}: {g.get('type')}")
+            if g.get("wave", "sine") not in WAVES:
+                raise ValueError(f"Forma de onda inválida em {folder['name']}.{g['prefix']}: {g.get('wave')}")
+    return spec
+
+
+class TagGroup:
+    """Um grupo de tags com o mesmo tipo e forma de onda, calculado em bloco."""
+
+    def __init__(self, folder: str, cfg: dict, rng: np.random.Generator):
+        self.folder = folder
+        self.prefix = cfg["prefix"]
+        self.count = int(cfg.get("count", 1))
+        self.vtype = cfg.get("type", "Float")
+        self.variant_type = TYPES[self.vtype]
+        self.wave = cfg.get("wave", "sine")
+        self.amplitude = float(cfg.get("amplitude", 1.0))
+        self.offset = float(cfg.get("offset", 0.0))
+        self.period_s = float(cfg.get("period_s", 10.0))
+        self.writable = bool(cfg.get("writable", False))
+        self.rng = rng
+        spread = float(cfg.get("phase_spread", 1.0))
+        self.phase = np.arange(self.count) * (spread / max(self.count, 1))
+        width = len(str(self.count - 1))
+        self.names = [f"{self.prefix}{i:0{width}d}" for i in range(self.count)]
+        self.attrs: list = []        # AttributeValue de cada variável (address space)
+        self.last = None             # últimos valores escritos
+
+    def node_ids(self, idx: int) -> list[ua.NodeId]:
+        return [ua.NodeId(f"{self.folder}.{n}", idx) for n in self.names]
+
+    def initial(self):
+        return {"Int32": 0, "Float": 0.0, "Boolean": False, "String": ""}[self.vtype]
+
+    def compute(self, t: float) -> np.ndarray:
+        x = t / self.period_s + self.phase
+        if self.wave == "ramp":
+            v = self.offset + self.amplitude * (x % 1.0)
+        elif self.wave == "sine":
+            v = self.offset + self.amplitude * np.sin(2 * np.pi * x)
+        elif self.wave == "noise":
+            v = self.offset + self.amplitude * self.rng.standard_normal(self.count)
+        else:  # step
+            v = self.offset + self.amplitude * (np.floor(x) % 2)
+
+        if self.vtype == "Int32":
+            return np.rint(v).astype(np.int32)
+        if self.vtype == "Float":
+            return v.astype(np.float32)
+        if self.vtype == "Boolean":
+            return v > self.offset
+        return np.char.mod("%.2f", v)
+
+    def changed(self, values: np.ndarray) -> np.ndarray:
+        """Índices cujo valor mudou desde o último tick."""
+        if self.last is None:
+            idx = np.arange(self.count)
+        else:
+            idx = np.flatnonzero(values != self.last)
+        self.last = values
+        return idx
+
+
+class Simulator:
+    def __init__(self, server, spec: dict):
+        self.server = server
+        self.spec = spec
+        self.period = spec.get("period_ms", 100) / 1000
+        self.groups: list[TagGroup] = []
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        seed = spec.get("seed")
+        self._rng = np.random.default_rng(seed)
+
+        # estatísticas
+        self.ticks = 0
+        self.writes = 0
+        self.overruns = 0
+        self.last_tick_s = 0.0
+
+    # ----- espaço de endereçamento -----
+    def build(self) -> int:
+        """Cria pastas e variáveis; retorna o índice do namespace."""
+        idx = self.server.register_namespace(self.spec.get("namespace", "http://ifsc.org/ua/sim"))
+        objects = self.server.get_objects_node()
+        aspace = self.server.iserver.aspace
+        for folder in self.spec.get("folders", []):
+            obj = objects.add_object(ua.NodeId(folder["name"], idx), folder["name"])
+            for cfg in folder.get("groups", []):
+                g = TagGroup(folder["name"], cfg, self._rng)
+                init = ua.Variant(g.initial(), g.variant_type)
+                for nid, name in zip(g.node_ids(idx), g.names):
+                    var = obj.add_variable(nid, name, init)
+                    if g.writable:
+                        var.set_writable(True)
+                    # acesso direto ao valor: o lote do tick não passa pelo Node
+                    g.attrs.append(aspace._nodes[nid].attributes[ua.AttributeIds.Value])
+                self.groups.append(g)
+        return idx
+
+    def export_tags(self, path: Path, idx: int) -> None:
+        """Gera um tags.yaml para o gateway com todas as variáveis simuladas."""
+        tags = {}
+        for g in self.groups:
+            for nid, name in zip(g.node_ids(idx), g.names):
+                tags[f"{g.folder}.{name}"] = {
+                    "nodeId": nid.to_string(), "type": g.vtype, "topic": f"{g.folder}/{name}"}
+        Path(path).write_text(yaml.safe_dump(tags, sort_keys=False), encoding="utf-8")
+
+    def __len__(self) -> int:
+        return sum(g.count for g in self.groups)
+
+    # ----- atualização -----
+    def tick(self, t: float) -> int:
+        """Calcula todos os grupos e aplica as mudanças num único lote."""
+        now = datetime.utcnow()
+        batch = []
+        for g in self.groups:
+            values = g.compute(t)
+            changed = g.changed(values)
+            if not len(changed):
+                continue
+            vt = g.variant_type
+            py = values[changed].tolist()      # escalares Python para o Variant
+            attrs = g.attrs
+            for i, v in zip(changed.tolist(), py):
+                batch.append((attrs[i], ua.DataValue(ua.Variant(v, vt), sourceTimestamp=now, serverTimestamp=now)))
+
+        # mesmo efeito de aspace.set_attribute_value, com um lock por tick
+        callbacks = []
+        with self.server.iserver.aspace._lock:
+            for attval, dv in batch:
+                attval.value = dv
+                if attval.datachange_callbacks:
+                    callbacks.extend((k, cb, dv) for k, cb in attval.datachange_callbacks.items())
+        for k, cb, dv in callbacks:
+            try:
+                cb(k, dv)
+            except Exception as ex:
+                print(f"Erro no callback de datachange: {ex}")
+        self.writes += len(batch)
+        return len(batch)
+
+    def _loop(self) -> None:
+        # deadlines absolutos: o período não acumula deriva; ticks perdidos
+        # são pulados em vez de executados em rajada
+        t0 = time.perf_counter()
+        deadline = t0
+        while not self._stop.is_set():
+            start = time.perf_counter()
+            self.tick(start - t0)
+            self.ticks += 1
+            now = time.perf_counter()
+            self.last_tick_s = now - start
+            deadline += self.period
+            if now > deadline:
+                self.overruns += 1
+                deadline += ((now - deadline) // self.period + 1) * self.period
+            self._stop.wait(deadline - now)
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._loop, name="simulator", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
@@ -16,6 +16,18 @@ public struct SensorPayload
     public float value;   // use float; se for int, mude
 }
 
+// Quadro agregado do gateway (frames.enabled): valores que mudaram no grupo
+// desde o quadro anterior; key = quadro completo
+[Serializable]
+public class SnapshotFrame
+{
+    public long seq;
+    public long ts;       // ms desde a epoch
+    public bool key;
+    public string[] tags; // tópico da tag relativo ao grupo ("" = o próprio grupo)
+    public float[] values;
+}
+
 [Serializable]
 public struct CommandPayload
 {
@@ -35,6 +47,11 @@ public class MqttUnityClient : MonoBehaviour
     [SerializeField] private string sensorsBase = "planta/sensores/#";
     [SerializeField] private string commandsBase = "planta/comandos/";
 
+    [Header("Frames")]
+    [Tooltip("Assina os quadros agregados do gateway em vez de uma mensagem por tag")]
+    [SerializeField] private bool useFrames = false;
+    [SerializeField] private string framesBase = "planta/twin/";
+
     [Header("Debug")]
     [SerializeField] private bool logIncoming = true;
     [SerializeField] private bool logOutgoing = true;
@@ -85,8 +102,9 @@ public class MqttUnityClient : MonoBehaviour
         await client.ConnectAsync(options, cts.Token);
         Debug.Log("MQTT conectado.");
 
-        await client.SubscribeAsync(sensorsBase);
-        Debug.Log($"Subscribed: {sensorsBase}");
+        string topics = useFrames ? framesBase + "#" : sensorsBase;
+        await client.SubscribeAsync(topics);
+        Debug.Log($"Subscribed: {topics}");
     }
 
     void Update()
@@ -95,6 +113,12 @@ public class MqttUnityClient : MonoBehaviour
         {
             if (logIncoming) Debug.Log($"[MQTT IN] {msg.topic} -> {msg.payload}");
 
+            if (useFrames && msg.topic.StartsWith(framesBase))
+            {
+                HandleFrame(msg.topic.Substring(framesBase.Length), msg.payload);
+                continue;
+            }
+
             // "planta/sensores/<tagTopic>"
             var parts = msg.topic.Split('/', 3);
             if (parts.Length < 3) continue;
@@ -115,6 +139,31 @@ public class MqttUnityClient : MonoBehaviour
         }
     }
 
+    // "planta/twin/<grupo>": um parse por quadro, um OnTagValue por tag
+    private void HandleFrame(string group, string payload)
+    {
+        SnapshotFrame frame;
+        try
+        {
+            frame = JsonUtility.FromJson<SnapshotFrame>(payload);
+        }
+        catch (Exception ex)
+        {
+            Debug.LogError($"JSON parse error [frame {group}]: {ex}");
+            return;
+        }
+        if (frame?.tags == null || frame.values == null) return;
+
+        string ts = DateTimeOffset.FromUnixTimeMilliseconds(frame.ts).UtcDateTime.ToString("yyyy-MM-ddTHH:mm:ss.fffZ");
+        int n = Math.Min(frame.tags.Length, frame.values.Length);
+        for (int i = 0; i < n; i++)
+        {
+            var pl = new SensorPayload { type = "Float", ts = ts, value = frame.values[i] };
+            string tag = frame.tags[i];
+            OnTagValue?.Invoke(string.IsNullOrEmpty(tag) ? group : group + "/" + tag, pl);
+        }
+    }
+
     public async Task PublishCommandAsync(string tagTopic, object value, string type = "Int32", string source = "unity")
     {
         var cmd = new CommandPayload { value = value, type = type, source = source };